@@ -1,9 +1,14 @@
 import os
+from datetime import date, datetime
 from flask import Flask, send_from_directory, Response
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 
 from app.config import Config
 from app.db import init_pool
+from app.services.cache import init_cache
+from app.services.change_bus import init_change_bus
+from app.services.realtime import register_realtime
 from app.logging_config import configure_logging
 from app.middleware import register_middleware
 
@@ -14,6 +19,8 @@ from app.routes.schools import bp as schools_bp
 from app.routes.students import bp as students_bp
 from app.routes.health import bp as health_bp
 from app.routes.admin import bp as admin_bp
+from app.routes.sync import bp as sync_bp
+from app.routes.metrics import bp as metrics_bp
 
 import logging
 logger = logging.getLogger('aiims.app')
@@ -28,17 +35,30 @@ except ImportError:
 
 socketio = None
 
+
+class JSONProvider(DefaultJSONProvider):
+    """Serialise DATE columns as yyyy-mm-dd instead of Flask's HTTP-date format."""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, date) and not isinstance(o, datetime):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+
 def create_app():
     # Configure JSON logging first
     configure_logging()
     
     app = Flask(__name__, static_folder=None)
+    app.json = JSONProvider(app)
     app.config.from_object(Config)
     app.config["JSON_SORT_KEYS"] = False
     CORS(app)
     
     # Initialize DB connection pool
     init_pool(app.config["DATABASE_URL"])
+    init_cache()
     
     # Setup session
     try:
@@ -59,13 +79,12 @@ def create_app():
         # Attach to app context so blueprints can use current_app.extensions
         app.extensions['socketio'] = socketio
 
-        @socketio.on("connect")
-        def handle_connect():
-            logger.info("[socket.io] Client connected")
+        # Per-event / per-student rooms (replaces global broadcasts)
+        register_realtime(socketio)
 
-        @socketio.on("disconnect")
-        def handle_disconnect():
-            logger.info("[socket.io] Client disconnected")
+    # Cross-worker cache invalidation via LISTEN/NOTIFY; without a Redis
+    # message queue it also relays other workers' changes to this worker's clients
+    init_change_bus(app, relay_events=socketio is not None and not os.environ.get("REDIS_URL"))
 
     # Register all middleware & error handlers
     register_middleware(app)
@@ -78,6 +97,8 @@ def create_app():
     app.register_blueprint(students_bp)
     app.register_blueprint(health_bp)
     app.register_blueprint(admin_bp)
+    app.register_blueprint(sync_bp)
+    app.register_blueprint(metrics_bp)
 
     # Setup SPA routing
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -1,21 +1,332 @@
 import psycopg2
 import psycopg2.pool
+import psycopg2.extensions
 import psycopg2.extras
 import os
+import time
+import socket
 import logging
+import threading
+from collections import deque
 from contextlib import contextmanager
+from flask import has_request_context, request
 
 logger = logging.getLogger('aiims.db')
 _pool = None
+_replica = None
 
-def init_pool(database_url_val=None, minconn=2, maxconn=10):
-    global _pool
+# Connections inherited across a fork. Their sockets are shared with the
+# parent, and letting psycopg2 deallocate them would send a Terminate over
+# those sockets (PQfinish) and end the parent's sessions, so the child keeps
+# them referenced for its whole life and never uses or closes them.
+_inherited_conns = []
+
+
+def origin_id():
+    """This process's tag on its database connections (application_name).
+
+    The change-notify triggers copy it into their payloads, so the change
+    bus can tell this worker's writes from other workers'.
+    """
+    return f"aiims-{socket.gethostname()[:40]}-{os.getpid()}"
+
+
+class PoolTimeout(psycopg2.pool.PoolError):
+    """No connection became free within the pool's checkout timeout."""
+
+
+class BlockingConnectionPool:
+    """Thread-safe connection pool that waits for a free connection.
+
+    Connections are opened lazily in the process that uses them: after a fork
+    the child parks the parent's connections in ``_inherited_conns`` (never
+    closing or freeing the shared sockets) and starts with an empty pool. Connections idle for longer than
+    ``ping_interval`` are pinged on checkout, and connections older than
+    ``max_lifetime`` are replaced, so a database restart costs one failed ping
+    instead of a failed request.
+    """
+
+    def __init__(self, dsn, minconn=2, maxconn=10, timeout=10.0,
+                 max_lifetime=1800.0, ping_interval=30.0, readonly=False):
+        self.dsn = dsn
+        self.readonly = readonly
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_interval = ping_interval
+        self._reset()
+
+    def _reset(self):
+        if getattr(self, "_pid", None) is not None:
+            _inherited_conns.extend(conn for conn, _, _ in self._idle)
+            _inherited_conns.extend(conn for conn, _ in self._created.values())
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+        self._idle = deque()        # (conn, created_at, returned_at)
+        self._created = {}          # id(conn) -> (conn, created_at), for checked-out conns
+        self._size = 0
+        self._warmed = False
+        self._waiters = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.discarded = 0
+
+    def _check_pid(self):
+        # After fork the inherited sockets belong to the parent: park them.
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, application_name=origin_id())
+        if self.readonly:
+            conn.set_session(readonly=True)
+        return conn, time.monotonic()
+
+    def _usable(self, conn, created_at, returned_at):
+        now = time.monotonic()
+        if conn.closed or now - created_at > self.max_lifetime:
+            return False
+        if now - returned_at > self.ping_interval:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            except psycopg2.Error:
+                return False
+        return True
+
+    def _discard(self, conn):
+        self.discarded += 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def getconn(self):
+        self._check_pid()
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._cond:
+            if not self._warmed:
+                self._warmed = True
+                self._warm()
+            while not self._idle and self._size >= self.maxconn:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f"No database connection free after {self.timeout:.1f}s "
+                        f"({self._size} in use)"
+                    )
+                self._waiters += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiters -= 1
+            entry = self._idle.popleft() if self._idle else None
+            self._size += entry is None  # reserve a slot for a new connection
+            waited = time.monotonic() - start
+            self.checkouts += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+        # Ping / connect outside the lock so slow I/O never blocks other threads.
+        try:
+            if entry is not None:
+                conn, created_at, returned_at = entry
+                if not self._usable(conn, created_at, returned_at):
+                    self._discard(conn)
+                    conn, created_at = self._connect()
+            else:
+                conn, created_at = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        self._created[id(conn)] = (conn, created_at)
+        return conn
+
+    def _warm(self):
+        # Called with the lock held, once, on the first checkout in this process.
+        for _ in range(self.minconn):
+            try:
+                conn, created_at = self._connect()
+            except psycopg2.Error:
+                logger.exception("Could not open initial pool connection")
+                break
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._size += 1
+
+    def putconn(self, conn):
+        if self._pid != os.getpid():
+            return  # checked out before a fork; the parent still owns it
+        _, created_at = self._created.pop(id(conn), (conn, time.monotonic()))
+        keep = not conn.closed
+        if keep:
+            status = conn.info.transaction_status
+            if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                keep = False
+            elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    keep = False
+        if not keep:
+            self._discard(conn)
+        with self._cond:
+            if keep:
+                self._idle.append((conn, created_at, time.monotonic()))
+            else:
+                self._size -= 1
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.popleft()[0])
+                self._size -= 1
+
+    def stats(self):
+        """Counters for the metrics layer."""
+        self._check_pid()
+        with self._cond:
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "waiters": self._waiters,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "discarded": self.discarded,
+                "wait_seconds_total": self.wait_seconds,
+                "wait_seconds_max": self.max_wait_seconds,
+            }
+
+
+class ReplicaRouter:
+    """Health-checked read replica in front of its own connection pool.
+
+    The replica is checked at most every ``check_interval`` seconds (on use);
+    it is skipped while unreachable or lagging more than ``max_lag`` seconds,
+    and whenever a checkout fails, so reads fail over to the primary.
+    """
+
+    # Replay lag in seconds; 0 when fully replayed or not a standby at all
+    # (e.g. a second standalone instance in local testing).
+    LAG_SQL = """
+        SELECT CASE
+            WHEN NOT pg_is_in_recovery() THEN 0
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END
+    """
+
+    def __init__(self, pool, max_lag=5.0, check_interval=10.0):
+        self.pool = pool
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.healthy = True
+        self.lag = 0.0
+        self.reads = 0
+        self.failovers = 0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _check(self):
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(self.LAG_SQL)
+                self.lag = float(cur.fetchone()[0])
+            conn.rollback()
+        finally:
+            self.pool.putconn(conn)
+        return self.lag <= self.max_lag
+
+    def is_healthy(self):
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval and self._lock.acquire(blocking=False):
+            try:
+                was_healthy = self.healthy
+                try:
+                    self.healthy = self._check()
+                except Exception:
+                    self.healthy = False
+                if was_healthy != self.healthy:
+                    logger.warning(f"Read replica {'healthy' if self.healthy else 'unhealthy'} (lag={self.lag:.1f}s)")
+                self._checked_at = now
+            finally:
+                self._lock.release()
+        return self.healthy
+
+    def mark_unhealthy(self, exc):
+        logger.warning(f"Read replica checkout failed, using primary: {exc}")
+        self.healthy = False
+        self._checked_at = time.monotonic()
+        self.failovers += 1
+
+    def stats(self):
+        return {"healthy": self.healthy, "lag_seconds": self.lag,
+                "reads": self.reads, "failovers": self.failovers,
+                "pool": self.pool.stats()}
+
+
+def _pool_from_env(db_url, minconn, maxconn, timeout, readonly=False):
+    return BlockingConnectionPool(
+        db_url, minconn, maxconn, timeout,
+        max_lifetime=float(os.environ.get("DB_POOL_MAX_LIFETIME", 1800)),
+        ping_interval=float(os.environ.get("DB_POOL_PING_INTERVAL", 30)),
+        readonly=readonly,
+    )
+
+
+def init_pool(database_url_val=None, minconn=None, maxconn=None, timeout=None,
+              replica_url=None):
+    """Configure the pool (and the read-replica pool if a replica DSN is set).
+    No connection is opened until first use, so the pools are safe to create
+    in a pre-forking master process."""
+    global _pool, _replica
     db_url = database_url_val or os.environ.get("DATABASE_URL")
     if not db_url:
         logger.warning("DATABASE_URL not set. DB Pool not initialized.")
         return
-    _pool = psycopg2.pool.ThreadedConnectionPool(minconn, maxconn, db_url)
-    logger.info(f"DB connection pool initialized (min={minconn}, max={maxconn}).")
+    minconn = minconn if minconn is not None else int(os.environ.get("DB_POOL_MIN", 2))
+    maxconn = maxconn if maxconn is not None else int(os.environ.get("DB_POOL_MAX", 10))
+    timeout = timeout if timeout is not None else float(os.environ.get("DB_POOL_TIMEOUT", 10))
+    _pool = _pool_from_env(db_url, minconn, maxconn, timeout)
+    logger.info(f"DB connection pool initialized (min={minconn}, max={maxconn}, timeout={timeout}s).")
+
+    replica_url = replica_url or os.environ.get("DATABASE_REPLICA_URL")
+    if replica_url:
+        # Short checkout timeout: falling back to the primary beats queueing.
+        _replica = ReplicaRouter(
+            _pool_from_env(replica_url, minconn, maxconn, min(timeout, 1.0), readonly=True),
+            max_lag=float(os.environ.get("DB_REPLICA_MAX_LAG", 5)),
+            check_interval=float(os.environ.get("DB_REPLICA_CHECK_INTERVAL", 10)),
+        )
+        logger.info("Read replica pool initialized.")
+
+def pool_stats():
+    """Pool counters (in-use, waiters, wait time, checkouts), or {} if not initialized."""
+    if not _pool:
+        return {}
+    stats = _pool.stats()
+    if _replica:
+        stats["replica"] = _replica.stats()
+    return stats
+
+def replica_enabled():
+    return _replica is not None
+
+def read_your_writes_seconds():
+    """How long after a write the same client keeps reading from the primary."""
+    return float(os.environ.get("DB_REPLICA_RYW_SECONDS", 5))
 
 def get_conn():
     if not _pool:
@@ -35,6 +346,42 @@ def get_db_conn():
     finally:
         put_conn(conn)
 
+def _read_from_primary():
+    """True for write requests and inside the client's read-your-writes window."""
+    if not has_request_context():
+        return False
+    if request.method not in ("GET", "HEAD"):
+        return True
+    try:
+        until = float(request.cookies.get("db_ryw_until", 0))
+    except ValueError:
+        until = 0
+    return until > time.time()
+
+@contextmanager
+def get_db_read_conn():
+    """Read-only connection: the replica when configured, healthy and outside
+    the client's read-your-writes window, otherwise the primary.
+
+    Opt-in per endpoint for heavy reads; never write through it.
+    """
+    if not _replica or _read_from_primary() or not _replica.is_healthy():
+        with get_db_conn() as conn:
+            yield conn
+        return
+    try:
+        conn = _replica.pool.getconn()
+    except Exception as exc:
+        _replica.mark_unhealthy(exc)
+        with get_db_conn() as conn:
+            yield conn
+        return
+    _replica.reads += 1
+    try:
+        yield conn
+    finally:
+        _replica.pool.putconn(conn)
+
 @contextmanager
 def get_db_cursor(commit=False):
     """Provides a RealDictCursor. Optionally commits on successful exit."""
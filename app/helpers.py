@@ -36,6 +36,17 @@ def rows_to_list(rows):
     return [dict(r) for r in rows]
 
 
+def to_json_text(value) -> str:
+    """Serialise a value for a JSONB column; strings that are not JSON are stored as JSON strings."""
+    if isinstance(value, str):
+        try:
+            json.loads(value)
+            return value
+        except ValueError:
+            return json.dumps(value)
+    return json.dumps(value if value is not None else {})
+
+
 def generate_username(name: str) -> str:
     """Generate a username from a name: 'Dr. Anil Kumar' → 'anil.kum.x7k' (max 15 chars)."""
     # Strip titles
@@ -70,7 +81,9 @@ def user_public(u: dict) -> dict:
 
 def normalize_date(raw: str) -> str:
     """Convert dd-mm-yyyy or mm-dd-yyyy to yyyy-mm-dd; pass through if already iso."""
-    raw = raw.strip()
+    if isinstance(raw, date):
+        return raw.isoformat()
+    raw = (raw or '').strip()
     if not raw:
         return raw
     for sep in ('-', '/'):
@@ -123,16 +136,23 @@ def compute_event_status(start_date_str: str, end_date_str: str) -> str:
     return 'Ongoing'
 
 
-def enrich_events_with_status(events: list) -> list:
-    """Add 'computed_status' to each event dict based on date logic."""
-    for ev in events:
-        raw_tag = ev.get('tag', '')
-        # If event was manually cancelled, keep that
-        if raw_tag == 'Cancelled':
-            ev['computed_status'] = 'Cancelled'
-        else:
-            ev['computed_status'] = compute_event_status(
-                ev.get('start_date', ''),
-                ev.get('end_date', ''),
-            )
-    return events
+def to_date_param(raw):
+    """Normalise a user-supplied date for a DATE column.
+
+    Returns None for blank input and an ISO yyyy-mm-dd string otherwise;
+    raises ValueError if the value is not a recognisable date.
+    """
+    iso = normalize_date(raw)
+    if not iso:
+        return None
+    return date.fromisoformat(iso).isoformat()
+
+
+# SQL equivalent of compute_event_status() for an Events row aliased as ``e``;
+# manually cancelled events keep 'Cancelled'.
+EVENT_STATUS_SQL = """
+    CASE WHEN e.tag = 'Cancelled' THEN 'Cancelled'
+         WHEN e.start_date > CURRENT_DATE THEN 'Upcoming'
+         WHEN e.end_date < CURRENT_DATE THEN 'Completed'
+         ELSE 'Ongoing' END
+"""
@@ -3,6 +3,9 @@ import time
 import logging
 from flask import g, request, jsonify
 
+from app.db import PoolTimeout, replica_enabled, read_your_writes_seconds
+from app.services.metrics import observe_request
+
 logger = logging.getLogger('aiims.http')
 
 def register_middleware(app):
@@ -14,13 +17,30 @@ def register_middleware(app):
     @app.after_request
     def _log_request_end(response):
         duration = time.time() - getattr(request, '_start_time', time.time())
+        # Labelled by view endpoint (not path) so ids don't explode the series
+        observe_request(request.endpoint or "unmatched", request.method,
+                        response.status_code, duration)
         if request.path.startswith('/api/'):
             logger.info(
                 f"{request.method} {request.path} → {response.status_code} "
                 f"({duration * 1000:.0f}ms)"
             )
+        # Read-your-writes: after a successful write this client reads from
+        # the primary until the replica has had time to catch up.
+        if (replica_enabled() and request.method not in ("GET", "HEAD", "OPTIONS")
+                and response.status_code < 400):
+            window = read_your_writes_seconds()
+            response.set_cookie("db_ryw_until", f"{time.time() + window:.3f}",
+                                max_age=int(window) + 1, httponly=True, samesite="Lax")
         return response
 
+    @app.errorhandler(PoolTimeout)
+    def handle_pool_timeout(e):
+        logger.warning(f"{request.method} {request.path}: {e}")
+        response = jsonify({"success": False, "message": "Server is busy, please retry"})
+        response.headers["Retry-After"] = "1"
+        return response, 503
+
     @app.errorhandler(Exception)
     def handle_exception(e):
         # pass through HTTP errors
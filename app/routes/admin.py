@@ -3,9 +3,13 @@ from flask import Blueprint, request, jsonify, session
 import psycopg2
 import psycopg2.extras
 
-from app.db import get_db_conn
+from app.db import get_db_conn, get_db_read_conn
 from app.helpers import rows_to_list
 from app.services.audit import log_audit
+from app.services.user_roles import invalidate_user_role
+from app.services.event_stats import refresh_volunteer_counts
+from app.services.versions import bump_versions
+from app.services.cache import invalidate
 
 logger = logging.getLogger('aiims.admin')
 bp = Blueprint('admin', __name__)
@@ -39,14 +43,20 @@ def api_admin_delete_user(username):
         with get_db_conn() as conn:
             cur = conn.cursor()
             
-            cur.execute("DELETE FROM Event_Volunteers WHERE username = %s", (username,))
+            cur.execute(
+                "DELETE FROM Event_Volunteers WHERE username = %s RETURNING event_id", (username,)
+            )
+            refresh_volunteer_counts(cur, [r[0] for r in cur.fetchall()])
             cur.execute("UPDATE Schools SET poc_username = NULL WHERE poc_username = %s", (username,))
+            bump_versions(cur, "schools", "events")
             cur.execute("UPDATE Events SET created_by = NULL WHERE created_by = %s", (username,))
             cur.execute("UPDATE Health_Records SET doctor_id = NULL WHERE doctor_id = %s", (username,))
             cur.execute("UPDATE Audit_Logs SET user_id = NULL WHERE user_id = %s", (username,))
             
             cur.execute("DELETE FROM Users WHERE username = %s", (username,))
             conn.commit()
+            invalidate_user_role(username)
+            invalidate("schools", "events")
             
             log_audit(sess_user['username'], "DELETE_USER", f"Deleted user {username}")
             
@@ -90,7 +100,7 @@ def api_admin_logs():
     where_clause = ("WHERE " + " AND ".join(conditions)) if conditions else ""
     params.append(limit)
 
-    with get_db_conn() as conn:
+    with get_db_read_conn() as conn:
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
         cur.execute(
             f"SELECT log_id, timestamp, user_id, action, details "
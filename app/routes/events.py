@@ -1,40 +1,54 @@
 import logging
 import json
-from flask import Blueprint, request, jsonify, current_app
+import base64
+from flask import Blueprint, request, jsonify
 from datetime import datetime
 import psycopg2
 import psycopg2.extras
 
-from app.db import get_db_conn
-from app.helpers import row_to_dict, rows_to_list, enrich_events_with_status
+from app.db import get_db_conn, get_db_read_conn
+from app.helpers import row_to_dict, rows_to_list, to_date_param, EVENT_STATUS_SQL
+from app.services import realtime
 from app.services.audit import log_audit
+from app.services.event_stats import read_event_stats, refresh_volunteer_counts
+from app.services.versions import bump_versions, versioned
+from app.services.cache import cached, invalidate
 
 logger = logging.getLogger('aiims.events')
 bp = Blueprint('events', __name__)
 
 
 @bp.route("/api/events", methods=["GET"])
+@versioned("events", "event:*", daily=True)
 def api_list_events():
+    """List all events; ``?status=Upcoming|Ongoing|Completed|Cancelled`` filters in SQL."""
+    status = request.args.get("status", "").strip()
+    where = ""
+    params = []
+    if status:
+        where = f"WHERE ({EVENT_STATUS_SQL}) = %s"
+        params.append(status)
+
     with get_db_conn() as conn:
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        cur.execute("""
+        cur.execute(f"""
             SELECT e.*,
-                   (SELECT COUNT(*) FROM Event_Volunteers ev
-                    WHERE ev.event_id = e.event_id AND ev.active = 1) AS staff_count,
-                   (SELECT COUNT(*) FROM Students s WHERE s.event_id = e.event_id) AS student_count,
-                   (SELECT COUNT(DISTINCT hr.student_id) FROM Health_Records hr
-                    WHERE hr.event_id = e.event_id) AS screened_count
+                   COALESCE(ec.volunteer_count, 0) AS staff_count,
+                   COALESCE(ec.student_count, 0) AS student_count,
+                   COALESCE(ec.screened_count, 0) AS screened_count,
+                   {EVENT_STATUS_SQL} AS computed_status
             FROM Events e
-            ORDER BY e.start_date DESC
-        """)
+            LEFT JOIN Event_Counters ec ON ec.event_id = e.event_id
+            {where}
+            ORDER BY e.start_date DESC NULLS LAST
+        """, params)
         events = cur.fetchall()
-        
-    result = rows_to_list(events)
-    enrich_events_with_status(result)
-    return jsonify(result)
+
+    return jsonify(rows_to_list(events))
 
 
 @bp.route("/api/events/<int:event_id>", methods=["GET"])
+@cached("events", "event:{event_id}")
 def api_get_event(event_id):
     with get_db_conn() as conn:
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
@@ -70,6 +84,13 @@ def api_create_event():
     poc_designation = data.get("poc_designation", "")
     poc_phone = data.get("poc_phone", "")
     poc_email = data.get("poc_email", "")
+    try:
+        start_date = to_date_param(data.get("start_date", ""))
+        end_date = to_date_param(data.get("end_date", ""))
+    except ValueError:
+        return jsonify({"success": False, "message": "Invalid date (use DD-MM-YYYY or YYYY-MM-DD)"}), 400
+    if not start_date:
+        return jsonify({"success": False, "message": "Start date is required"}), 400
 
     with get_db_conn() as conn:
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
@@ -94,12 +115,13 @@ def api_create_event():
         """, (
             school_name, school_address, poc_name, poc_designation,
             poc_phone, poc_email, school_id,
-            data.get("start_date", ""), data.get("end_date", ""),
+            start_date, end_date,
             data.get("operational_hours", ""),
             data.get("tag", "Upcoming"), now,
             data.get("created_by", "admin"),
         ))
         new_id = cur.fetchone()["event_id"]
+        bump_versions(cur, "events")
         conn.commit()
         
     log_audit(data.get("created_by", "admin"), "CREATE_EVENT",
@@ -119,8 +141,14 @@ def api_update_event(event_id):
                
     for field in allowed:
         if field in data:
+            value = data[field]
+            if field in ("start_date", "end_date"):
+                try:
+                    value = to_date_param(value)
+                except ValueError:
+                    return jsonify({"success": False, "message": "Invalid date (use DD-MM-YYYY or YYYY-MM-DD)"}), 400
             fields.append(f"{field} = %s")
-            params.append(data[field])
+            params.append(value)
             
     if not fields:
         return jsonify({"success": False, "message": "No fields to update"}), 400
@@ -130,7 +158,9 @@ def api_update_event(event_id):
     with get_db_conn() as conn:
         cur = conn.cursor()
         cur.execute(f"UPDATE Events SET {', '.join(fields)} WHERE event_id = %s", params)
+        bump_versions(cur, "events")
         conn.commit()
+    invalidate(f"event:{event_id}")
         
     log_audit(data.get("user_id", "admin"), "UPDATE_EVENT",
               f"Updated event {event_id}")
@@ -138,30 +168,26 @@ def api_update_event(event_id):
 
 
 @bp.route("/api/events/active")
+@versioned("events", "event:*", daily=True)
 def api_active_events():
     """Return events that are Upcoming or Ongoing (not Completed or Cancelled)."""
     with get_db_conn() as conn:
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        cur.execute("""
+        cur.execute(f"""
             SELECT e.*,
-                   (SELECT COUNT(*) FROM Event_Volunteers ev
-                    WHERE ev.event_id = e.event_id AND ev.active = 1) AS volunteer_count,
-                   (SELECT COUNT(*) FROM Students s
-                    WHERE s.event_id = e.event_id) AS student_count,
-                   (SELECT COUNT(DISTINCT hr.student_id) FROM Health_Records hr
-                    WHERE hr.event_id = e.event_id) AS screened_count
+                   COALESCE(ec.volunteer_count, 0) AS volunteer_count,
+                   COALESCE(ec.student_count, 0) AS student_count,
+                   COALESCE(ec.screened_count, 0) AS screened_count,
+                   {EVENT_STATUS_SQL} AS computed_status
             FROM Events e
+            LEFT JOIN Event_Counters ec ON ec.event_id = e.event_id
             WHERE (e.tag IS NULL OR e.tag != 'Cancelled')
-            ORDER BY e.start_date DESC
+              AND (e.start_date > CURRENT_DATE OR e.end_date IS NULL OR e.end_date >= CURRENT_DATE)
+            ORDER BY e.start_date DESC NULLS LAST
         """)
         events = cur.fetchall()
 
-    result = rows_to_list(events)
-    enrich_events_with_status(result)
-
-    # Only return active camps (Upcoming or Ongoing)
-    active = [e for e in result if e.get('computed_status') in ('Upcoming', 'Ongoing')]
-    return jsonify(active)
+    return jsonify(rows_to_list(events))
 
 
 @bp.route("/api/events/<int:event_id>/volunteer", methods=["POST"])
@@ -193,20 +219,20 @@ def api_volunteer_join(event_id):
                     "VALUES (%s,%s,%s,%s,1)",
                     (event_id, username, category, now),
                 )
+            refresh_volunteer_counts(cur, [event_id])
             conn.commit()
         except psycopg2.IntegrityError:
             conn.rollback()
             return jsonify({"success": False, "message": "Already volunteering"}), 409
+    invalidate(f"event:{event_id}")
             
     log_audit(username, "VOLUNTEER_JOIN",
               f"Volunteered for event {event_id} as {category}")
 
     # Real-time notification
-    socketio = current_app.extensions.get('socketio')
-    if socketio:
-        socketio.emit("volunteer_joined", {
-            "event_id": event_id, "username": username, "category": category
-        })
+    realtime.emit("volunteer_joined", {
+        "event_id": event_id, "username": username, "category": category
+    }, event_id=event_id, key=username)
 
     return jsonify({"success": True})
 
@@ -223,20 +249,21 @@ def api_volunteer_leave(event_id):
             "WHERE event_id = %s AND username = %s",
             (event_id, username),
         )
+        refresh_volunteer_counts(cur, [event_id])
         conn.commit()
+    invalidate(f"event:{event_id}")
 
     log_audit(username, "VOLUNTEER_LEAVE", f"Left event {event_id}")
 
-    socketio = current_app.extensions.get('socketio')
-    if socketio:
-        socketio.emit("volunteer_left", {
-            "event_id": event_id, "username": username
-        })
+    realtime.emit("volunteer_left", {
+        "event_id": event_id, "username": username
+    }, event_id=event_id, key=username)
 
     return jsonify({"success": True})
 
 
 @bp.route("/api/events/<int:event_id>/volunteers")
+@cached("events", "event:{event_id}")
 def api_event_volunteers(event_id):
     with get_db_conn() as conn:
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
@@ -253,94 +280,22 @@ def api_event_volunteers(event_id):
 
 
 @bp.route("/api/events/<int:event_id>/stats")
+@versioned("event:{event_id}")
 def api_event_stats(event_id):
-    # Optional filters
+    """Screening summary for an event, read from the maintained Event_Stat_Counters.
+
+    Individual health records are served by /api/events/<id>/records.
+    """
     student_class = request.args.get("student_class", "").strip()
     section = request.args.get("section", "").strip()
     gender = request.args.get("gender", "").strip()
 
-    student_conditions = ["s.event_id = %s"]
-    student_params = [event_id]
-    if student_class:
-        student_conditions.append("s.student_class = %s")
-        student_params.append(student_class)
-    if section:
-        student_conditions.append("s.section = %s")
-        student_params.append(section)
-    if gender:
-        student_conditions.append("s.gender = %s")
-        student_params.append(gender)
-
-    student_where = " AND ".join(student_conditions)
-
+    # Primary, not the replica: the ETag comes from the primary's versions, and
+    # a lagging body cached under it would be served as current until the
+    # next write.
     with get_db_conn() as conn:
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        cur.execute(
-            f"SELECT COUNT(*) AS c FROM Students s WHERE {student_where}",
-            student_params,
-        )
-        total_students = cur.fetchone()["c"]
-
-        cur.execute(
-            f"SELECT COUNT(*) AS c FROM Students s WHERE {student_where} AND s.status = 'Absent'",
-            student_params,
-        )
-        absent = cur.fetchone()["c"]
-
-        # Count distinct students with ANY health record (filtered)
-        hr_join_where = student_where.replace("s.", "st.")
-        cur.execute(
-            f"SELECT COUNT(DISTINCT hr.student_id) AS c FROM Health_Records hr "
-            f"JOIN Students st ON hr.student_id = st.student_id "
-            f"WHERE hr.event_id = %s AND {hr_join_where}",
-            [event_id] + student_params,
-        )
-        screened = cur.fetchone()["c"]
-
-        # Count assessments + per-department breakdown
-        normal = 0
-        observation = 0
-        referred = 0
-        dept_breakdown = {}  
-
-        cur.execute(
-            f"SELECT hr.json_data, hr.category FROM Health_Records hr "
-            f"JOIN Students st ON hr.student_id = st.student_id "
-            f"WHERE hr.event_id = %s AND {hr_join_where}",
-            [event_id] + student_params,
-        )
-        records = cur.fetchall()
-        
-        for r in records:
-            try:
-                d = json.loads(r["json_data"])
-                a = d.get("status", d.get("assessment", ""))
-                cat = r["category"] or "Other"
-                if cat not in dept_breakdown:
-                    dept_breakdown[cat] = {"N": 0, "O": 0, "R": 0}
-                if a == "N":
-                    normal += 1
-                    dept_breakdown[cat]["N"] += 1
-                elif a == "O":
-                    observation += 1
-                    dept_breakdown[cat]["O"] += 1
-                elif a == "R":
-                    referred += 1
-                    dept_breakdown[cat]["R"] += 1
-            except Exception:
-                pass
-
-        # Get individual health records (filtered)
-        cur.execute(f"""
-            SELECT hr.record_id, hr.student_id, st.name AS student_name,
-                   hr.doctor_id, hr.category, hr.json_data, hr.timestamp
-            FROM Health_Records hr
-            JOIN Students st ON hr.student_id = st.student_id
-            WHERE hr.event_id = %s AND {hr_join_where}
-            ORDER BY hr.timestamp DESC
-        """, [event_id] + student_params)
-        hr_rows = cur.fetchall()
+        stats = read_event_stats(cur, event_id, student_class, section, gender)
 
         # Get active volunteers
         cur.execute("""
@@ -351,17 +306,72 @@ def api_event_stats(event_id):
         """, (event_id,))
         volunteers = cur.fetchall()
 
-    return jsonify({
-        "total_students": total_students,
-        "screened": screened,
-        "normal": normal,
-        "observation": observation,
-        "referred": referred,
-        "absent": absent,
-        "dept_breakdown": dept_breakdown,
-        "records": rows_to_list(hr_rows),
-        "staff": rows_to_list(volunteers),
-    })
+    stats["staff"] = rows_to_list(volunteers)
+    return jsonify(stats)
+
+
+EVENT_RECORDS_PAGE_DEFAULT = 200
+EVENT_RECORDS_PAGE_MAX = 1000
+
+
+@bp.route("/api/events/<int:event_id>/records")
+def api_event_records(event_id):
+    """Paginated health records for an event, newest first.
+
+    Filters: student_class, section, gender. Pages are keyset-based on
+    (timestamp, record_id); pass back ``next_cursor`` as ``cursor``.
+    """
+    student_class = request.args.get("student_class", "").strip()
+    section = request.args.get("section", "").strip()
+    gender = request.args.get("gender", "").strip()
+    cursor = request.args.get("cursor", "").strip()
+    try:
+        limit = min(max(int(request.args.get("limit", EVENT_RECORDS_PAGE_DEFAULT)), 1),
+                    EVENT_RECORDS_PAGE_MAX)
+    except ValueError:
+        return jsonify({"success": False, "message": "limit must be a number"}), 400
+
+    conditions = ["hr.event_id = %s", "st.event_id = %s"]
+    params = [event_id, event_id]
+    if student_class:
+        conditions.append("st.student_class = %s")
+        params.append(student_class)
+    if section:
+        conditions.append("st.section = %s")
+        params.append(section)
+    if gender:
+        conditions.append("st.gender = %s")
+        params.append(gender)
+    if cursor:
+        try:
+            after_ts, after_id = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        except Exception:
+            return jsonify({"success": False, "message": "Invalid cursor"}), 400
+        conditions.append("(hr.timestamp, hr.record_id) < (%s, %s)")
+        params.extend([after_ts, int(after_id)])
+    params.append(limit + 1)
+
+    with get_db_read_conn() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute(f"""
+            SELECT hr.record_id, hr.student_id, st.name AS student_name,
+                   hr.doctor_id, hr.category, hr.json_data::text AS json_data, hr.timestamp
+            FROM Health_Records hr
+            JOIN Students st ON hr.student_id = st.student_id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY hr.timestamp DESC, hr.record_id DESC
+            LIMIT %s
+        """, params)
+        rows = rows_to_list(cur.fetchall())
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = base64.urlsafe_b64encode(
+            json.dumps([last["timestamp"], last["record_id"]]).encode()
+        ).decode()
+    return jsonify({"records": rows, "next_cursor": next_cursor})
 
 
 @bp.route("/api/events/my")
@@ -374,7 +384,7 @@ def api_my_events():
             FROM Events e
             JOIN Event_Volunteers ev ON e.event_id = ev.event_id
             WHERE ev.username = %s AND ev.active = 1
-            ORDER BY e.start_date DESC
+            ORDER BY e.start_date DESC NULLS LAST
         """, (username,))
         events = cur.fetchall()
         
@@ -382,6 +392,7 @@ def api_my_events():
 
 
 @bp.route("/api/events/school")
+@versioned("events", "event:*", "schools", daily=True)
 def api_school_events():
     username = request.args.get("username", "")
     with get_db_conn() as conn:
@@ -396,18 +407,16 @@ def api_school_events():
             return jsonify([])
             
         school_id = school["school_id"]
-        cur.execute("""
+        cur.execute(f"""
             SELECT e.*,
-                   (SELECT COUNT(*) FROM Students s
-                    WHERE s.event_id = e.event_id) AS student_count,
-                   (SELECT COUNT(DISTINCT hr.student_id) FROM Health_Records hr
-                    WHERE hr.event_id = e.event_id) AS screened_count
+                   COALESCE(ec.student_count, 0) AS student_count,
+                   COALESCE(ec.screened_count, 0) AS screened_count,
+                   {EVENT_STATUS_SQL} AS computed_status
             FROM Events e
+            LEFT JOIN Event_Counters ec ON ec.event_id = e.event_id
             WHERE e.school_id = %s
-            ORDER BY e.start_date DESC
+            ORDER BY e.start_date DESC NULLS LAST
         """, (school_id,))
         events = cur.fetchall()
-        
-    result = rows_to_list(events)
-    enrich_events_with_status(result)
-    return jsonify(result)
+
+    return jsonify(rows_to_list(events))
@@ -1,13 +1,16 @@
 import logging
-import json
 from datetime import datetime
 import psycopg2
 import psycopg2.extras
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify
 
 from app.db import get_db_conn
-from app.helpers import rows_to_list
+from app.helpers import rows_to_list, to_json_text
+from app.services import realtime
 from app.services.audit import log_audit
+from app.services.exam_summary import refresh_exam_summary
+from app.services.event_stats import refresh_student_counters
+from app.services.student_writes import check_exam_access, save_exam, StaleExamError
 
 logger = logging.getLogger('aiims.health')
 bp = Blueprint('health', __name__)
@@ -19,7 +22,7 @@ def api_create_health_record():
     event_id = data.get("event_id", data.get("camp_id", 1))
     doctor_id = data.get("doctor_id")
     category = data.get("category")
-    json_data = data.get("json_data")
+    json_data = to_json_text(data.get("json_data"))
     ts = datetime.utcnow().isoformat()
     
     with get_db_conn() as conn:
@@ -27,9 +30,14 @@ def api_create_health_record():
         cur.execute(
             "INSERT INTO Health_Records "
             "(student_id, event_id, doctor_id, category, json_data, timestamp) "
-            "VALUES (%s,%s,%s,%s,%s,%s)",
+            "VALUES (%s,%s,%s,%s,%s,%s) "
+            "ON CONFLICT (student_id, event_id, category) DO UPDATE SET "
+            "json_data = EXCLUDED.json_data, timestamp = EXCLUDED.timestamp, "
+            "doctor_id = EXCLUDED.doctor_id",
             (student_id, event_id, doctor_id, category, json_data, ts),
         )
+        refresh_exam_summary(cur, student_id, event_id)
+        refresh_student_counters(cur, [student_id])
         conn.commit()
         
     log_audit(doctor_id, f"INSERT_{category.upper()}",
@@ -49,89 +57,45 @@ def api_save_full_exam():
     specialist_category = data.get("specialist_category", "FullExam")
     exam_data = data.get("exam_data", {})
     ts = datetime.utcnow().isoformat()
-    json_str = json.dumps(exam_data) if isinstance(exam_data, dict) else str(exam_data)
+    json_str = to_json_text(exam_data)
+
+    try:
+        check_exam_access(doctor_id, specialist_category)
+    except PermissionError as exc:
+        return jsonify({"success": False, "message": str(exc)}), 403
 
     with get_db_conn() as conn:
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        cur.execute(
-            "SELECT role FROM Users WHERE username = %s", (doctor_id,)
-        )
-        user_row = cur.fetchone()
-        
-        if user_row and specialist_category != "FullExam":
-            user_role = user_row["role"]
-            if user_role != specialist_category and user_role != "Admin":
-                return jsonify({
-                    "success": False,
-                    "message": f"Access denied: your role ({user_role}) cannot "
-                               f"save {specialist_category} records."
-                }), 403
-
         try:
-            cur.execute(
-                "SELECT record_id FROM Health_Records "
-                "WHERE student_id = %s AND event_id = %s AND category = %s",
-                (student_id, event_id, specialist_category),
-            )
-            existing = cur.fetchone()
-
-            if existing:
-                cur.execute(
-                    "UPDATE Health_Records SET json_data = %s, timestamp = %s, doctor_id = %s "
-                    "WHERE record_id = %s",
-                    (json_str, ts, doctor_id, existing["record_id"]),
-                )
-                record_id = existing["record_id"]
-            else:
-                cur.execute(
-                    "INSERT INTO Health_Records "
-                    "(student_id, event_id, doctor_id, category, json_data, timestamp) "
-                    "VALUES (%s,%s,%s,%s,%s,%s) RETURNING record_id",
-                    (student_id, event_id, doctor_id, specialist_category, json_str, ts),
-                )
-                record_id = cur.fetchone()["record_id"]
-
+            record_id = save_exam(cur, student_id, event_id, doctor_id,
+                                  specialist_category, json_str, ts)
             conn.commit()
+        except StaleExamError as exc:
+            conn.rollback()
+            return jsonify({"success": False, "message": str(exc),
+                            "record_id": exc.record_id}), 409
         except Exception as exc:
             conn.rollback()
-            logger.warning(
-                f"Exam save conflict for student={student_id}, "
+            logger.error(
+                f"Exam save failed for student={student_id}, "
                 f"event={event_id}, category={specialist_category}: {exc}"
             )
-            try:
-                cur.execute(
-                    "SELECT record_id FROM Health_Records "
-                    "WHERE student_id = %s AND event_id = %s AND category = %s",
-                    (student_id, event_id, specialist_category),
-                )
-                existing = cur.fetchone()
-                if existing:
-                    cur.execute(
-                        "UPDATE Health_Records SET json_data = %s, timestamp = %s, doctor_id = %s "
-                        "WHERE record_id = %s",
-                        (json_str, ts, doctor_id, existing["record_id"]),
-                    )
-                    record_id = existing["record_id"]
-                    conn.commit()
-                else:
-                    logger.error(f"Exam save failed after retry for student {student_id}")
-                    return jsonify({"success": False, "message": "Save failed, please retry"}), 500
-            except Exception as retry_exc:
-                logger.error(f"Exam save retry failed: {retry_exc}")
-                return jsonify({"success": False, "message": "Save failed, please retry"}), 500
-
-    log_audit(doctor_id, "SAVE_EXAM",
-              f"Saved {specialist_category} exam for student {student_id}")
+            return jsonify({"success": False, "message": "Save failed, please retry"}), 500
 
-    socketio = current_app.extensions.get('socketio')
-    if socketio:
-        socketio.emit("exam_saved", {
-            "student_id": student_id,
-            "event_id": event_id,
-            "category": specialist_category,
-            "doctor_id": doctor_id,
-        })
+    # Ship the saved record (in the /all-records row shape) so open views
+    # can apply it without refetching.
+    realtime.emit("exam_saved", {
+        "student_id": student_id,
+        "event_id": event_id,
+        "category": specialist_category,
+        "doctor_id": doctor_id,
+        "record": {
+            "record_id": record_id, "category": specialist_category,
+            "json_data": json_str,
+            "parsed_data": exam_data if isinstance(exam_data, dict) else {},
+            "timestamp": ts, "doctor_id": doctor_id,
+        },
+    }, event_id=event_id, student_id=student_id, key=specialist_category)
 
     return jsonify({"success": True, "record_id": record_id})
 
@@ -141,7 +105,7 @@ def api_get_health_records(student_id):
     with get_db_conn() as conn:
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
         cur.execute(
-            "SELECT category, json_data, timestamp, doctor_id "
+            "SELECT category, json_data::text AS json_data, timestamp, doctor_id "
             "FROM Health_Records WHERE student_id = %s ORDER BY timestamp DESC",
             (student_id,),
         )
@@ -0,0 +1,21 @@
+import os
+import hmac
+import logging
+from flask import Blueprint, request, Response
+
+from app.services.metrics import render
+
+logger = logging.getLogger('aiims.metrics')
+bp = Blueprint('metrics', __name__)
+
+
+@bp.route("/metrics")
+def metrics():
+    """Prometheus scrape endpoint, merged across all gunicorn workers.
+
+    When METRICS_TOKEN is set, scrapers must send it as a bearer token.
+    """
+    token = os.environ.get("METRICS_TOKEN")
+    if token and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return Response("Unauthorized\n", status=401, mimetype="text/plain")
+    return Response(render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
@@ -5,14 +5,18 @@ import psycopg2
 import psycopg2.extras
 
 from app.db import get_db_conn
-from app.helpers import row_to_dict, rows_to_list, normalize_date, compute_event_status
+from app.helpers import row_to_dict, rows_to_list, normalize_date, compute_event_status, to_date_param
 from app.services.audit import log_audit
 from app.services.email import send_email_async
+from app.services.versions import bump_versions, versioned
+from app.services.cache import cached, invalidate
 
 logger = logging.getLogger('aiims.schools')
 bp = Blueprint('schools', __name__)
 
 @bp.route("/api/schools")
+@versioned("schools")
+@cached("schools")
 def api_list_schools():
     with get_db_conn() as conn:
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
@@ -43,7 +47,10 @@ def api_create_camp_request():
     """School POC submits a camp request."""
     data = request.get_json(force=True)
     username = data.get("username", "").strip()
-    preferred_date = data.get("preferred_date", "").strip()
+    try:
+        preferred_date = to_date_param(data.get("preferred_date", ""))
+    except ValueError:
+        return jsonify({"success": False, "message": "Invalid preferred date (use DD-MM-YYYY or YYYY-MM-DD)"}), 400
     if not preferred_date:
         return jsonify({"success": False, "message": "Preferred date is required"}), 400
     student_count = data.get("student_count", 0)
@@ -82,7 +89,9 @@ def api_create_camp_request():
             ),
         )
         new_id = cur.fetchone()["request_id"]
+        bump_versions(cur, "camp_requests")
         conn.commit()
+    invalidate("camp_requests")
 
     log_audit(username, "CREATE_CAMP_REQUEST",
               f"Camp request {new_id} submitted for {s['school_name']}")
@@ -90,6 +99,7 @@ def api_create_camp_request():
 
 
 @bp.route("/api/camp-requests", methods=["GET"])
+@versioned("camp_requests")
 def api_list_camp_requests():
     """Admin: list all camp requests (optionally filter by status)."""
     status_filter = request.args.get("status", "").strip()
@@ -107,6 +117,7 @@ def api_list_camp_requests():
 
 
 @bp.route("/api/camp-requests/school")
+@versioned("camp_requests")
 def api_school_camp_requests():
     """School POC: list their own camp requests."""
     username = request.args.get("username", "").strip()
@@ -129,6 +140,8 @@ def api_school_camp_requests():
 
 
 @bp.route("/api/camp-requests/count")
+@versioned("camp_requests")
+@cached("camp_requests")
 def api_camp_requests_count():
     """Return count of pending camp requests (for admin badge)."""
     with get_db_conn() as conn:
@@ -195,7 +208,7 @@ def api_approve_camp_request(request_id):
             (
                 school_name, school_address, poc_name, poc_designation,
                 poc_phone, poc_email, school_id,
-                r["preferred_date"], "",
+                r["preferred_date"], None,
                 data.get("operational_hours", ""),
                 computed_tag, now, reviewer,
             ),
@@ -207,7 +220,9 @@ def api_approve_camp_request(request_id):
             "UPDATE Camp_Requests SET status='Approved', reviewed_at=%s, reviewed_by=%s WHERE request_id=%s",
             (now, reviewer, request_id),
         )
+        bump_versions(cur, "camp_requests", "events")
         conn.commit()
+    invalidate("camp_requests")
 
     log_audit(reviewer, "APPROVE_CAMP_REQUEST",
               f"Approved request {request_id} -> Event {new_event_id}: {school_name}")
@@ -263,7 +278,9 @@ def api_reject_camp_request(request_id):
             "UPDATE Camp_Requests SET status='Rejected', reviewed_at=%s, reviewed_by=%s WHERE request_id=%s",
             (now, reviewer, request_id),
         )
+        bump_versions(cur, "camp_requests")
         conn.commit()
+    invalidate("camp_requests")
 
     log_audit(reviewer, "REJECT_CAMP_REQUEST", f"Rejected camp request {request_id}")
     return jsonify({"success": True})
@@ -5,15 +5,20 @@ import io
 import string
 import random
 import re
+import base64
 from datetime import datetime, date
 
-from flask import Blueprint, request, jsonify, Response, current_app
+from flask import Blueprint, request, jsonify, Response, current_app, stream_with_context
 import psycopg2
 import psycopg2.extras
 
-from app.db import get_db_conn
+from app.db import get_db_conn, get_db_read_conn
 from app.helpers import row_to_dict, rows_to_list, normalize_date
+from app.services import realtime
 from app.services.audit import log_audit
+from app.services.event_stats import refresh_student_counters
+from app.services.student_identity import assign_student_identities
+from app.services.student_writes import create_student, update_student, update_student_status, upsert_general_info
 
 logger = logging.getLogger('aiims.students')
 bp = Blueprint('students', __name__)
@@ -23,197 +28,380 @@ bp = Blueprint('students', __name__)
 def api_create_student():
     """Create a single student (used by doctor workflow and school dashboard)."""
     data = request.get_json(force=True)
-    name = data.get("name", "").strip()
-    age = data.get("age")
-    dob = data.get("dob", "")
-    gender = data.get("gender", "")
-    student_class = data.get("student_class", "")
-    section = data.get("section", "")
-    blood_group = data.get("blood_group", "")
-    father_name = data.get("father_name", "")
-    phone = data.get("phone", "")
     user_id = data.get("user_id", "")
     event_id = data.get("event_id", 1)
-    added_by = data.get("added_by", user_id or "")
-    status = data.get("status", "Pending Examination")
-    mother_name = data.get("mother_name", "")
-    mother_occupation = data.get("mother_occupation", "")
-    father_occupation = data.get("father_occupation", "")
-    address = data.get("address", "")
-    pincode = data.get("pincode", "")
-    registration_number = data.get("registration_number", "").strip()
 
-    if not name:
-        return jsonify({"success": False, "message": "Name is required"}), 400
-
-    qr_hash = "".join(random.choices(string.ascii_lowercase + string.digits, k=13))
-    
     with get_db_conn() as conn:
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        cur.execute(
-            """INSERT INTO Students
-               (event_id, name, age, dob, gender, student_class, section,
-                blood_group, father_name, phone, qr_code_hash, added_by, status,
-                mother_name, mother_occupation, father_occupation, address, pincode,
-                registration_number)
-               VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s) RETURNING student_id""",
-            (event_id, name, age, dob, gender, student_class, section,
-             blood_group, father_name, phone, qr_hash, added_by, status,
-             mother_name, mother_occupation, father_occupation, address, pincode,
-             registration_number),
-        )
-        new_id = cur.fetchone()["student_id"]
+        try:
+            student = create_student(cur, data)
+        except ValueError as exc:
+            return jsonify({"success": False, "message": str(exc)}), 400
         conn.commit()
-
-        cur.execute("SELECT * FROM Students WHERE student_id = %s", (new_id,))
-        student = cur.fetchone()
+    new_id = student["student_id"]
+    name = student["name"]
 
     log_audit(user_id or "doctor", "CREATE_STUDENT",
               f"Created student {name} (ID {new_id})")
 
-    socketio = current_app.extensions.get('socketio')
-    if socketio:
-        socketio.emit("student_created", {
-            "student_id": new_id, "event_id": event_id, "name": name,
-        })
+    realtime.emit("student_created", {
+        "student_id": new_id, "event_id": event_id, "name": name,
+        "student": row_to_dict(student),
+    }, event_id=event_id, key=new_id)
 
     return jsonify({"success": True, "student": row_to_dict(student)})
 
 
+SYMPTOM_KEYS = [
+    "symptom_rubs_eyes", "symptom_cannot_see_board", "symptom_pokes_ear",
+    "symptom_breathes_mouth", "symptom_black_teeth", "symptom_bad_breath",
+    "symptom_cracks_mouth", "symptom_scratches_head", "symptom_white_patches",
+    "symptom_bites_nails", "symptom_headaches", "symptom_fainting",
+    "symptom_breathlessness", "symptom_limping", "symptom_stammers",
+    "symptom_urination", "symptom_diarrhea", "symptom_vomiting",
+    "symptom_blood_stools"
+]
+
+STUDENT_BULK_COLUMNS = (
+    "event_id", "name", "age", "dob", "gender", "student_class", "section",
+    "blood_group", "father_name", "mother_name", "father_occupation",
+    "mother_occupation", "address", "pincode", "phone", "qr_code_hash",
+    "added_by", "status", "registration_number",
+)
+
+
+def _validate_bulk_row(row, event_id, added_by):
+    """Validate and normalise one uploaded row.
+
+    Returns (record, errors). record holds the Students column values plus the
+    vitals/symptoms destined for Student_General_Info; errors is a list of
+    {"column", "reason"} dicts and is empty when the row is valid.
+    """
+    row_errors = []
+
+    name = str(row.get("name", "")).strip()
+    if not name:
+        row_errors.append({"column": "name", "reason": "Name is required"})
+
+    gender = str(row.get("gender", "")).strip().upper()
+    if gender and gender not in ("M", "F"):
+        row_errors.append({"column": "gender", "reason": "Must be M or F"})
+
+    dob = str(row.get("dob", "")).strip()
+    age = None
+    if dob:
+        dob = normalize_date(dob)
+        try:
+            dt = date.fromisoformat(dob)
+            today = date.today()
+            age = today.year - dt.year - ((today.month, today.day) < (dt.month, dt.day))
+        except (ValueError, TypeError):
+            row_errors.append({"column": "dob", "reason": "Invalid date format (use DD-MM-YYYY or YYYY-MM-DD)"})
+
+    phone = str(row.get("phone", "")).strip()
+    if phone and not re.match(r'^[+]?[\d\s\-()]{7,15}$', phone):
+        row_errors.append({"column": "phone", "reason": "Invalid phone number"})
+
+    height = str(row.get("height", "")).strip()
+    weight = str(row.get("weight", "")).strip()
+    bmi = ""
+    if height and weight:
+        try:
+            h = float(height)
+            w = float(weight)
+            if h > 0:
+                bmi_val = w / ((h / 100) ** 2)
+                bmi = f"{bmi_val:.1f}"
+        except ValueError:
+            row_errors.append({"column": "vitals", "reason": "Height/Weight must be numbers"})
+
+    if row_errors:
+        return None, row_errors
+
+    symptoms_checked = []
+    for sym_key in SYMPTOM_KEYS:
+        val = str(row.get(sym_key, "")).strip().lower()
+        if val in ("yes", "y", "true", "1"):
+            readable = sym_key.replace("symptom_", "").replace("_", " ").capitalize()
+            symptoms_checked.append(readable)
+
+    record = {
+        "event_id": event_id,
+        "name": name,
+        "age": age,
+        "dob": dob,
+        "gender": gender,
+        "student_class": str(row.get("student_class", "")).strip(),
+        "section": str(row.get("section", "")).strip(),
+        "blood_group": str(row.get("blood_group", "")).strip(),
+        "father_name": str(row.get("father_name", "")).strip(),
+        "mother_name": str(row.get("mother_name", "")).strip(),
+        "father_occupation": str(row.get("father_occupation", "")).strip(),
+        "mother_occupation": str(row.get("mother_occupation", "")).strip(),
+        "address": str(row.get("address", "")).strip(),
+        "pincode": str(row.get("pincode", "")).strip(),
+        "phone": phone,
+        "qr_code_hash": "".join(random.choices(string.ascii_lowercase + string.digits, k=13)),
+        "added_by": added_by,
+        "status": "Pending Examination",
+        "registration_number": str(row.get("registration_number", "")).strip(),
+        "height": height,
+        "weight": weight,
+        "bmi": bmi,
+        "symptoms_json": json.dumps(symptoms_checked),
+    }
+    return record, []
+
+
+def _insert_students_batch(cur, event_id, added_by, valid):
+    """Insert pre-validated rows with one multi-row INSERT per table.
+
+    ``valid`` is a list of (row_num, raw_row, record) tuples. Returns a dict
+    mapping row_num -> student_id. Rows are matched back to their generated ids
+    through their random qr_code_hash, so the RETURNING order does not matter.
+    """
+    if not valid:
+        return {}
+
+    ts = datetime.utcnow().isoformat()
+    returned = psycopg2.extras.execute_values(
+        cur,
+        f"INSERT INTO Students ({', '.join(STUDENT_BULK_COLUMNS)}) VALUES %s "
+        "RETURNING student_id, qr_code_hash",
+        [tuple(rec[c] for c in STUDENT_BULK_COLUMNS) for _, _, rec in valid],
+        page_size=len(valid),
+        fetch=True,
+    )
+    id_by_hash = {r["qr_code_hash"]: r["student_id"] for r in returned}
+
+    ids = {}
+    general_rows = []
+    for row_num, _, rec in valid:
+        student_id = id_by_hash[rec["qr_code_hash"]]
+        ids[row_num] = student_id
+        general_rows.append((student_id, event_id, rec["height"], rec["weight"],
+                             rec["bmi"], rec["symptoms_json"], added_by, ts))
+
+    psycopg2.extras.execute_values(
+        cur,
+        "INSERT INTO Student_General_Info "
+        "(student_id, event_id, height, weight, bmi, symptoms_json, filled_by, updated_at) "
+        "VALUES %s",
+        general_rows,
+        page_size=len(general_rows),
+    )
+    assign_student_identities(cur, list(ids.values()))
+    refresh_student_counters(cur, list(ids.values()))
+    return ids
+
+
+def _bulk_insert_students(conn, event_id, added_by, valid):
+    """Write validated rows and return (success_list, error_list).
+
+    The whole batch goes in as one set-based INSERT per table. If the database
+    rejects the batch, each row is retried under its own savepoint so the
+    offending rows are reported individually and the rest still land.
+    """
+    success_list = []
+    error_list = []
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+    try:
+        ids = _insert_students_batch(cur, event_id, added_by, valid)
+        conn.commit()
+        for row_num, _, rec in valid:
+            success_list.append({"row": row_num, "student_id": ids[row_num], "name": rec["name"]})
+        return success_list, error_list
+    except Exception as exc:
+        conn.rollback()
+        logger.warning(f"Bulk insert batch failed, retrying row by row: {exc}")
+
+    for item in valid:
+        row_num, raw, rec = item
+        cur.execute("SAVEPOINT bulk_row")
+        try:
+            ids = _insert_students_batch(cur, event_id, added_by, [item])
+            cur.execute("RELEASE SAVEPOINT bulk_row")
+            success_list.append({"row": row_num, "student_id": ids[row_num], "name": rec["name"]})
+        except Exception as exc:
+            cur.execute("ROLLBACK TO SAVEPOINT bulk_row")
+            error_list.append({"row": row_num, "data": raw, "errors": [{"column": "db", "reason": str(exc)}]})
+    conn.commit()
+    return success_list, error_list
+
+
 @bp.route("/api/students/bulk", methods=["POST"])
 def api_bulk_create_students():
-    """Bulk create students from a list. Returns success/error arrays."""
+    """Bulk create students from a list. Returns success/error arrays.
+
+    All rows are validated up front; valid rows are then written with one
+    multi-row INSERT per table and a single commit.
+    """
     data = request.get_json(force=True)
     students_data = data.get("students", [])
     event_id = data.get("event_id", 1)
     added_by = data.get("added_by", "")
 
-    success_list = []
     error_list = []
-
-    SYMPTOM_KEYS = [
-        "symptom_rubs_eyes", "symptom_cannot_see_board", "symptom_pokes_ear",
-        "symptom_breathes_mouth", "symptom_black_teeth", "symptom_bad_breath",
-        "symptom_cracks_mouth", "symptom_scratches_head", "symptom_white_patches",
-        "symptom_bites_nails", "symptom_headaches", "symptom_fainting",
-        "symptom_breathlessness", "symptom_limping", "symptom_stammers",
-        "symptom_urination", "symptom_diarrhea", "symptom_vomiting",
-        "symptom_blood_stools"
-    ]
+    valid = []
+    for idx, row in enumerate(students_data):
+        row_num = idx + 1
+        record, row_errors = _validate_bulk_row(row, event_id, added_by)
+        if row_errors:
+            error_list.append({"row": row_num, "data": row, "errors": row_errors})
+        else:
+            valid.append((row_num, row, record))
 
     with get_db_conn() as conn:
-        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-        for idx, row in enumerate(students_data):
-            row_num = idx + 1
-            row_errors = []
-
-            name = str(row.get("name", "")).strip()
-            if not name:
-                row_errors.append({"column": "name", "reason": "Name is required"})
-
-            gender = str(row.get("gender", "")).strip().upper()
-            if gender and gender not in ("M", "F"):
-                row_errors.append({"column": "gender", "reason": "Must be M or F"})
-
-            dob = str(row.get("dob", "")).strip()
-            age = None
-            if dob:
-                dob = normalize_date(dob)
-                try:
-                    dt = date.fromisoformat(dob)
-                    today = date.today()
-                    age = today.year - dt.year - ((today.month, today.day) < (dt.month, dt.day))
-                except (ValueError, TypeError):
-                    row_errors.append({"column": "dob", "reason": "Invalid date format (use DD-MM-YYYY or YYYY-MM-DD)"})
-
-            phone = str(row.get("phone", "")).strip()
-            if phone and not re.match(r'^[+]?[\d\s\-()]{7,15}$', phone):
-                row_errors.append({"column": "phone", "reason": "Invalid phone number"})
-
-            height = str(row.get("height", "")).strip()
-            weight = str(row.get("weight", "")).strip()
-            bmi = ""
-            if height and weight:
-                try:
-                    h = float(height)
-                    w = float(weight)
-                    if h > 0:
-                        bmi_val = w / ((h / 100) ** 2)
-                        bmi = f"{bmi_val:.1f}"
-                except ValueError:
-                    row_errors.append({"column": "vitals", "reason": "Height/Weight must be numbers"})
-
-            if row_errors:
-                error_list.append({"row": row_num, "data": row, "errors": row_errors})
-                continue
+        success_list, db_errors = _bulk_insert_students(conn, event_id, added_by, valid)
 
-            reg_num = str(row.get("registration_number", "")).strip()
-
-            qr_hash = "".join(random.choices(string.ascii_lowercase + string.digits, k=13))
-            
-            symptoms_checked = []
-            for sym_key in SYMPTOM_KEYS:
-                val = str(row.get(sym_key, "")).strip().lower()
-                if val in ("yes", "y", "true", "1"):
-                    readable = sym_key.replace("symptom_", "").replace("_", " ").capitalize()
-                    symptoms_checked.append(readable)
-
-            try:
-                cur.execute(
-                    """INSERT INTO Students
-                       (event_id, name, age, dob, gender, student_class, section,
-                        blood_group, father_name, mother_name, father_occupation,
-                        mother_occupation, address, pincode, phone, qr_code_hash,
-                        added_by, status, registration_number)
-                       VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s) RETURNING student_id""",
-                    (
-                        event_id, name, age, dob, gender,
-                        str(row.get("student_class", "")).strip(),
-                        str(row.get("section", "")).strip(),
-                        str(row.get("blood_group", "")).strip(),
-                        str(row.get("father_name", "")).strip(),
-                        str(row.get("mother_name", "")).strip(),
-                        str(row.get("father_occupation", "")).strip(),
-                        str(row.get("mother_occupation", "")).strip(),
-                        str(row.get("address", "")).strip(),
-                        str(row.get("pincode", "")).strip(),
-                        phone, qr_hash, added_by, "Pending Examination",
-                        reg_num,
-                    ),
-                )
-                student_id = cur.fetchone()["student_id"]
-                
-                ts = datetime.utcnow().isoformat()
-                symptoms_json = json.dumps(symptoms_checked)
-                cur.execute(
-                    """INSERT INTO Student_General_Info
-                       (student_id, event_id, height, weight, bmi, symptoms_json, filled_by, updated_at)
-                       VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-                    """,
-                    (student_id, event_id, height, weight, bmi, symptoms_json, added_by, ts)
-                )
-
-                success_list.append({"row": row_num, "student_id": student_id, "name": name})
-                conn.commit()
-            except Exception as exc:
-                conn.rollback()
-                error_list.append({"row": row_num, "data": row, "errors": [{"column": "db", "reason": str(exc)}]})
+    error_list = sorted(error_list + db_errors, key=lambda e: e["row"])
 
     log_audit(added_by or "school", "BULK_CREATE_STUDENTS",
               f"Bulk uploaded {len(success_list)} students for event {event_id}")
 
-    socketio = current_app.extensions.get('socketio')
-    if socketio and success_list:
-        socketio.emit("students_bulk_created", {
+    if success_list:
+        realtime.emit("students_bulk_created", {
             "event_id": event_id, "count": len(success_list),
-        })
+        }, event_id=event_id, accumulate=("count",))
 
     return jsonify({
         "success": True, "inserted": success_list, "errors": error_list
     })
 
 
+BULK_STREAM_CHUNK_SIZE = 500
+
+
+def _iter_upload_rows(stream, is_ndjson):
+    """Lazily parse an uploaded CSV or NDJSON body into (row, errors) pairs.
+
+    Lines are pulled from the request stream one at a time, so memory use does
+    not depend on the size of the upload.
+    """
+    def text_lines():
+        first = True
+        for raw in stream:
+            line = raw.decode("utf-8", errors="replace")
+            if first:
+                line = line.lstrip("\ufeff")
+                first = False
+            yield line
+
+    if is_ndjson:
+        for line in text_lines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield {"raw": line}, [{"column": "json", "reason": "Invalid JSON line"}]
+                continue
+            if not isinstance(row, dict):
+                yield {"raw": line}, [{"column": "json", "reason": "Each line must be a JSON object"}]
+                continue
+            yield row, []
+    else:
+        reader = csv.reader(text_lines())
+        header = None
+        for values in reader:
+            if not any(v.strip() for v in values):
+                continue
+            if header is None:
+                header = [h.strip().lower() for h in values]
+                continue
+            yield dict(zip(header, values)), []
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+@bp.route("/api/students/bulk/stream", methods=["POST"])
+def api_bulk_stream_students():
+    """Stream a raw CSV or NDJSON body into Students in fixed-size chunks.
+
+    Query params: event_id (required), added_by, chunk_size (optional). The
+    response is NDJSON: one progress line per chunk with that chunk's
+    inserted/errors, then a final summary line. Progress is also emitted over
+    Socket.IO as ``students_bulk_progress``.
+    """
+    try:
+        event_id = int(request.args["event_id"])
+        chunk_size = min(max(int(request.args.get("chunk_size", BULK_STREAM_CHUNK_SIZE)), 1), 5000)
+    except (KeyError, ValueError):
+        return jsonify({"success": False,
+                        "message": "event_id (and chunk_size, if given) must be integers"}), 400
+    added_by = request.args.get("added_by", "")
+    content_type = (request.content_type or "").lower()
+    is_ndjson = "ndjson" in content_type or "jsonlines" in content_type
+    def generate():
+        processed = 0
+        total_inserted = 0
+        total_errors = 0
+        rows = _iter_upload_rows(request.stream, is_ndjson)
+
+        # Each chunk is read from the (possibly slow) client first; a pool
+        # connection is only held for that chunk's insert and commit.
+        for chunk_no, chunk in enumerate(_chunked(rows, chunk_size), start=1):
+            error_list = []
+            valid = []
+            for offset, (row, parse_errors) in enumerate(chunk):
+                row_num = processed + offset + 1
+                if parse_errors:
+                    error_list.append({"row": row_num, "data": row, "errors": parse_errors})
+                    continue
+                record, row_errors = _validate_bulk_row(row, event_id, added_by)
+                if row_errors:
+                    error_list.append({"row": row_num, "data": row, "errors": row_errors})
+                else:
+                    valid.append((row_num, row, record))
+
+            success_list, db_errors = [], []
+            if valid:
+                with get_db_conn() as conn:
+                    success_list, db_errors = _bulk_insert_students(conn, event_id, added_by, valid)
+            error_list = sorted(error_list + db_errors, key=lambda e: e["row"])
+
+            processed += len(chunk)
+            total_inserted += len(success_list)
+            total_errors += len(error_list)
+
+            realtime.emit("students_bulk_progress", {
+                "event_id": event_id, "chunk": chunk_no,
+                "processed": processed, "inserted": total_inserted,
+                "errors": total_errors,
+            }, event_id=event_id)
+
+            yield json.dumps({
+                "chunk": chunk_no, "processed": processed,
+                "inserted": success_list, "errors": error_list,
+            }) + "\n"
+
+        log_audit(added_by or "school", "BULK_CREATE_STUDENTS",
+                  f"Stream uploaded {total_inserted} students for event {event_id}")
+
+        if total_inserted:
+            realtime.emit("students_bulk_created", {
+                "event_id": event_id, "count": total_inserted,
+            }, event_id=event_id, accumulate=("count",))
+
+        yield json.dumps({
+            "done": True, "processed": processed,
+            "inserted_count": total_inserted, "error_count": total_errors,
+        }) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
 @bp.route("/api/students/csv-template")
 def api_csv_template():
     """Return a CSV template for bulk student upload."""
@@ -248,8 +436,69 @@ def api_csv_template():
     )
 
 
+SEARCH_PAGE_DEFAULT = 100
+SEARCH_PAGE_MAX = 500
+SEARCH_SIMILARITY_THRESHOLD = 0.4
+
+# Normalised text matched by the free-text search. Must stay identical to the
+# expression of idx_students_search_trgm so the trigram index is used.
+STUDENT_SEARCH_TEXT_SQL = (
+    "lower(coalesce(s.name, '') || ' ' || coalesce(s.registration_number, '') || ' ' || "
+    "coalesce(s.phone, '') || ' ' || coalesce(s.student_class, '') || ' ' || "
+    "coalesce(s.section, ''))"
+)
+
+# Projectable columns for /api/students/search?fields=...
+SEARCH_FIELDS = {
+    "student_id": "s.student_id",
+    "event_id": "s.event_id",
+    "name": "s.name",
+    "age": "s.age",
+    "dob": "s.dob",
+    "gender": "s.gender",
+    "student_class": "s.student_class",
+    "section": "s.section",
+    "blood_group": "s.blood_group",
+    "father_name": "s.father_name",
+    "phone": "s.phone",
+    "qr_code_hash": "s.qr_code_hash",
+    "added_by": "s.added_by",
+    "status": "s.status",
+    "mother_name": "s.mother_name",
+    "mother_occupation": "s.mother_occupation",
+    "father_occupation": "s.father_occupation",
+    "address": "s.address",
+    "pincode": "s.pincode",
+    "registration_number": "s.registration_number",
+    "is_examined": "CASE WHEN ses.record_count > 0 THEN 1 ELSE 0 END",
+    "examined_categories": "ses.examined_categories",
+    "assessment": "COALESCE(ses.latest_status, '')",
+    "latest_record_json": "hr.json_data::text",
+}
+
+
+def _encode_search_cursor(row):
+    raw = json.dumps([row["name"], row["student_id"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_search_cursor(cursor):
+    name, student_id = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    return str(name), int(student_id)
+
+
 @bp.route("/api/students/search")
 def api_students_search():
+    """Search students in an event.
+
+    Without ``limit``/``cursor`` the full match list is returned as an array
+    (legacy behaviour). With either, results are keyset-paginated on
+    (name, student_id) and returned as ``{"students": [...], "next_cursor": ...}``.
+    A text ``query`` is matched with pg_trgm and ranked by similarity; ranked
+    results are returned as a single page (no cursor).
+    ``fields`` restricts the returned columns; student_id and name are always
+    included.
+    """
     query = request.args.get("query", "").strip()
     student_class = request.args.get("class", "").strip()
     section = request.args.get("section", "").strip()
@@ -258,6 +507,10 @@ def api_students_search():
     referred = request.args.get("referred", "")   # '1'
     assessment = request.args.get("assessment", "") # 'N', 'O', 'R'
     event_id = request.args.get("event_id", "").strip()
+    fields = request.args.get("fields", "").strip()
+    limit = request.args.get("limit", "").strip()
+    cursor = request.args.get("cursor", "").strip()
+    paged = bool(limit or cursor)
 
     conditions = []
     params = []
@@ -266,23 +519,6 @@ def api_students_search():
         conditions.append("s.event_id = %s")
         params.append(int(event_id))
 
-    if query:
-        try:
-            sid_val = int(query)
-            conditions.append(
-                "(s.name ILIKE %s OR s.student_id = %s OR s.phone ILIKE %s "
-                "OR s.student_class ILIKE %s OR s.section ILIKE %s OR s.registration_number ILIKE %s)"
-            )
-            params.extend([f"%{query}%", sid_val, f"%{query}%",
-                            f"%{query}%", f"%{query}%", f"%{query}%"])
-        except ValueError:
-            conditions.append(
-                "(s.name ILIKE %s OR s.phone ILIKE %s "
-                "OR s.student_class ILIKE %s OR s.section ILIKE %s OR s.registration_number ILIKE %s)"
-            )
-            params.extend([f"%{query}%", f"%{query}%",
-                            f"%{query}%", f"%{query}%", f"%{query}%"])
-
     if student_class:
         conditions.append("s.student_class = %s")
         params.append(student_class)
@@ -295,62 +531,110 @@ def api_students_search():
         conditions.append("s.gender = %s")
         params.append(gender)
 
-    where = (" AND " + " AND ".join(conditions)) if conditions else ""
-
-    sql = f"""
-        SELECT s.*,
-               CASE WHEN hr.hr_count > 0 THEN 1 ELSE 0 END AS is_examined,
-               hr.examined_categories,
-               hr.latest_record_json
-        FROM Students s
-        LEFT JOIN (
-            SELECT student_id,
-                   COUNT(*) AS hr_count,
-                   STRING_AGG(DISTINCT category, ',') AS examined_categories,
-                   (
-                       SELECT json_data
-                       FROM Health_Records hr2
-                       WHERE hr2.student_id = Health_Records.student_id
-                       ORDER BY timestamp DESC LIMIT 1
-                   ) AS latest_record_json
-            FROM Health_Records
-            GROUP BY student_id
-        ) hr ON s.student_id = hr.student_id
-        WHERE 1=1 {where}
-        ORDER BY s.name
-    """
-
-    with get_db_conn() as conn:
-        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        cur.execute(sql, params)
-        rows = cur.fetchall()
-
-    results = rows_to_list(rows)
-
-    # Post-process for assessment parsing
-    for r in results:
-        r['assessment'] = ''
-        json_str = r.get('latest_record_json') or r.get('latest_assessment')
-        if json_str:
-            try:
-                d = json.loads(json_str)
-                r['assessment'] = d.get('status', '') or d.get('assessment', '')
-            except Exception:
-                pass
-
-    # Post-filter
     if examined == '1':
-        results = [r for r in results if r.get('is_examined')]
+        conditions.append("ses.record_count > 0")
     elif examined == '0':
-        results = [r for r in results if not r.get('is_examined')]
-
+        conditions.append("ses.student_id IS NULL")
     if referred == '1':
-        results = [r for r in results if r.get('assessment') == 'R']
-
+        conditions.append("ses.latest_status = 'R'")
     if assessment:
-        results = [r for r in results if r.get('assessment') == assessment]
+        conditions.append("ses.latest_status = %s")
+        params.append(assessment)
+
+    if fields:
+        wanted = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in wanted if f not in SEARCH_FIELDS]
+        if unknown:
+            return jsonify({"success": False, "message": f"Unknown fields: {', '.join(unknown)}"}), 400
+        for required in ("name", "student_id"):
+            if required not in wanted:
+                wanted.insert(0, required)
+    else:
+        wanted = list(SEARCH_FIELDS)
+    select = ", ".join(f"{SEARCH_FIELDS[f]} AS {f}" for f in wanted)
+    hr_join = (
+        "LEFT JOIN Health_Records hr ON hr.record_id = ses.latest_record_id"
+        if "latest_record_json" in wanted else ""
+    )
 
-    return jsonify(results)
+    page_size = None
+    if paged:
+        try:
+            page_size = min(max(int(limit or SEARCH_PAGE_DEFAULT), 1), SEARCH_PAGE_MAX)
+        except ValueError:
+            return jsonify({"success": False, "message": "limit must be a number"}), 400
+        if cursor and query:
+            return jsonify({"success": False, "message": "cursor is not supported with a text query"}), 400
+        if cursor:
+            try:
+                after_name, after_id = _decode_search_cursor(cursor)
+            except Exception:
+                return jsonify({"success": False, "message": "Invalid cursor"}), 400
+            conditions.append("(s.name, s.student_id) > (%s, %s)")
+            params.extend([after_name, after_id])
+
+    def build_sql(extra_cond="", extra_params=(), order_sql="", order_params=()):
+        conds = conditions + ([extra_cond] if extra_cond else [])
+        where = (" AND " + " AND ".join(conds)) if conds else ""
+        all_params = params + list(extra_params) + list(order_params)
+        limit_sql = ""
+        if page_size:
+            limit_sql = "LIMIT %s"
+            all_params.append(page_size + 1)
+        sql = f"""
+            SELECT {select}
+            FROM Students s
+            LEFT JOIN Student_Exam_Summary ses
+                   ON ses.student_id = s.student_id AND ses.event_id = s.event_id
+            {hr_join}
+            WHERE 1=1 {where}
+            ORDER BY {order_sql}s.name, s.student_id
+            {limit_sql}
+        """
+        return sql, all_params
+
+    with get_db_read_conn() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        rows = []
+
+        # Fast path: an exact student_id / registration_number hit is served
+        # straight from the primary key / registration_number index.
+        if query and " " not in query and any(c.isdigit() for c in query):
+            exact = "s.registration_number = %s"
+            exact_params = [query]
+            if query.isdigit():
+                exact = f"(s.student_id = %s OR {exact})"
+                exact_params.insert(0, int(query))
+            cur.execute(*build_sql(exact, exact_params))
+            rows = cur.fetchall()
+
+        if query and not rows:
+            q = query.lower()
+            cur.execute(
+                "SET LOCAL pg_trgm.word_similarity_threshold = %s",
+                (SEARCH_SIMILARITY_THRESHOLD,),
+            )
+            cur.execute(*build_sql(
+                f"({STUDENT_SEARCH_TEXT_SQL} LIKE %s OR %s <%% {STUDENT_SEARCH_TEXT_SQL})",
+                [f"%{q}%", q],
+                f"word_similarity(%s, {STUDENT_SEARCH_TEXT_SQL}) DESC, ",
+                [q],
+            ))
+            rows = cur.fetchall()
+        elif not query:
+            cur.execute(*build_sql())
+            rows = cur.fetchall()
+
+    results = rows_to_list(rows)
+    if not paged:
+        return jsonify(results)
+
+    next_cursor = None
+    if len(results) > page_size:
+        results = results[:page_size]
+        if not query:
+            next_cursor = _encode_search_cursor(results[-1])
+    return jsonify({"students": results, "next_cursor": next_cursor})
 
 
 @bp.route("/api/students/<int:student_id>/status", methods=["PUT"])
@@ -359,11 +643,8 @@ def api_update_student_status(student_id):
     data = request.get_json(force=True)
     new_status = data.get("status", "Pending Examination")
     with get_db_conn() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            "UPDATE Students SET status = %s WHERE student_id = %s",
-            (new_status, student_id)
-        )
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        update_student_status(cur, student_id, new_status)
         conn.commit()
     return jsonify({"success": True})
 
@@ -381,72 +662,46 @@ def api_student_by_id(student_id):
 def api_update_student(student_id):
     """Update student demographics (used by teacher/admin for general info autosave)."""
     data = request.get_json(force=True)
-    allowed = [
-        "name", "age", "dob", "gender", "student_class", "section",
-        "blood_group", "father_name", "phone", "mother_name",
-        "mother_occupation", "father_occupation", "address", "pincode",
-        "registration_number",
-    ]
-    fields = []
-    params = []
-    for field in allowed:
-        if field in data:
-            fields.append(f"{field} = %s")
-            params.append(data[field])
-    if not fields:
-        return jsonify({"success": False, "message": "No fields"}), 400
-    params.append(student_id)
-
     with get_db_conn() as conn:
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        cur.execute(
-            f"UPDATE Students SET {', '.join(fields)} WHERE student_id = %s",
-            params,
-        )
+        try:
+            student = update_student(cur, student_id, data)
+        except ValueError as exc:
+            return jsonify({"success": False, "message": str(exc)}), 400
         conn.commit()
-        cur.execute("SELECT * FROM Students WHERE student_id = %s", (student_id,))
-        student = cur.fetchone()
 
     log_audit(data.get("user_id", "teacher"), "UPDATE_STUDENT",
               f"Updated student {student_id}")
     return jsonify({"success": True, "student": row_to_dict(student)})
 
 
+# Student_General_Info columns as returned to clients: symptoms_json keeps its
+# legacy text form and ``symptoms`` is the decoded JSONB list.
+GENERAL_INFO_SELECT = (
+    "id, student_id, event_id, height, weight, bmi, "
+    "symptoms_json::text AS symptoms_json, "
+    "CASE WHEN jsonb_typeof(symptoms_json) = 'array' THEN symptoms_json "
+    "ELSE '[]'::jsonb END AS symptoms, "
+    "filled_by, updated_at"
+)
+
+# Health_Records.json_data as legacy text plus the decoded object.
+RECORD_JSON_SELECT = (
+    "hr.json_data::text AS json_data, "
+    "CASE WHEN jsonb_typeof(hr.json_data) = 'object' THEN hr.json_data "
+    "ELSE '{}'::jsonb END AS parsed_data"
+)
+
+
 @bp.route("/api/students/<int:student_id>/general-info", methods=["PUT"])
 def api_upsert_general_info(student_id):
     """Upsert vitals + symptoms for a student (autosave endpoint)."""
     data = request.get_json(force=True)
-    event_id = data.get("event_id", 1)
-    height = data.get("height", "")
-    weight = data.get("weight", "")
-    bmi = data.get("bmi", "")
-    symptoms_json = json.dumps(data.get("symptoms", []))
     filled_by = data.get("filled_by", "")
-    ts = datetime.utcnow().isoformat()
 
     with get_db_conn() as conn:
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        cur.execute(
-            "SELECT id FROM Student_General_Info "
-            "WHERE student_id = %s AND event_id = %s",
-            (student_id, event_id),
-        )
-        existing = cur.fetchone()
-
-        if existing:
-            cur.execute(
-                "UPDATE Student_General_Info "
-                "SET height=%s, weight=%s, bmi=%s, symptoms_json=%s, filled_by=%s, updated_at=%s "
-                "WHERE id = %s",
-                (height, weight, bmi, symptoms_json, filled_by, ts, existing["id"]),
-            )
-        else:
-            cur.execute(
-                "INSERT INTO Student_General_Info "
-                "(student_id, event_id, height, weight, bmi, symptoms_json, filled_by, updated_at) "
-                "VALUES (%s,%s,%s,%s,%s,%s,%s,%s)",
-                (student_id, event_id, height, weight, bmi, symptoms_json, filled_by, ts),
-            )
+        upsert_general_info(cur, student_id, data)
         conn.commit()
 
     log_audit(filled_by, "UPDATE_GENERAL_INFO",
@@ -461,19 +716,14 @@ def api_get_general_info(student_id):
     with get_db_conn() as conn:
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
         cur.execute(
-            "SELECT * FROM Student_General_Info "
+            f"SELECT {GENERAL_INFO_SELECT} FROM Student_General_Info "
             "WHERE student_id = %s AND event_id = %s",
             (student_id, int(event_id)),
         )
         row = cur.fetchone()
 
     if row:
-        d = row_to_dict(row)
-        try:
-            d["symptoms"] = json.loads(d.get("symptoms_json", "[]"))
-        except Exception:
-            d["symptoms"] = []
-        return jsonify(d)
+        return jsonify(row_to_dict(row))
     return jsonify({"height": "", "weight": "", "bmi": "", "symptoms": []})
 
 
@@ -488,145 +738,279 @@ def api_student_all_records(student_id):
         student = cur.fetchone()
 
         cur.execute(
-            "SELECT * FROM Student_General_Info "
+            f"SELECT {GENERAL_INFO_SELECT} FROM Student_General_Info "
             "WHERE student_id = %s AND event_id = %s",
             (student_id, int(event_id)),
         )
         gen = cur.fetchone()
 
         cur.execute(
-            "SELECT category, json_data, timestamp, doctor_id "
-            "FROM Health_Records WHERE student_id = %s AND event_id = %s "
-            "ORDER BY timestamp DESC",
+            f"SELECT hr.category, {RECORD_JSON_SELECT}, hr.timestamp, hr.doctor_id "
+            "FROM Health_Records hr WHERE hr.student_id = %s AND hr.event_id = %s "
+            "ORDER BY hr.timestamp DESC",
             (student_id, int(event_id)),
         )
         records = cur.fetchall()
 
+    return jsonify({
+        "student": row_to_dict(student),
+        "general_info": _general_info_dict(gen),
+        "records": rows_to_list(records),
+    })
+
+
+def _general_info_dict(gen):
+    """General info row as a dict with symptoms flattened to a list of names."""
     gen_dict = row_to_dict(gen) if gen else {}
     if gen_dict:
+        clean_sym = []
+        for item in gen_dict["symptoms"]:
+            if isinstance(item, dict) and "name" in item:
+                clean_sym.append(item["name"])
+            elif isinstance(item, str):
+                clean_sym.append(item)
+        gen_dict["symptoms"] = clean_sym
+    return gen_dict
+
+
+@bp.route("/api/events/<int:event_id>/roster-records", methods=["GET", "POST"])
+def api_event_roster_records(event_id):
+    """All-records for many students of an event in three set-based queries.
+
+    Filters (all optional) come from the query string, or from a JSON body on
+    POST for long id lists: student_ids (list, or comma separated), student_class,
+    section, examined=1 (only students with at least one record). The response
+    is NDJSON with one {student, general_info, records} line per student --
+    the same shape as /api/students/<id>/all-records.
+    """
+    filters = (request.get_json(silent=True) or {}) if request.method == "POST" else request.args
+    conditions = ["s.event_id = %s"]
+    params = [event_id]
+    raw_ids = filters.get("student_ids") or []
+    if isinstance(raw_ids, str):
+        raw_ids = [x for x in raw_ids.split(",") if x.strip()]
+    if raw_ids:
         try:
-            raw_sym = json.loads(gen_dict.get("symptoms_json", "[]"))
-            clean_sym = []
-            if isinstance(raw_sym, list):
-                for item in raw_sym:
-                    if isinstance(item, dict) and "name" in item:
-                        clean_sym.append(item["name"])
-                    elif isinstance(item, str):
-                        clean_sym.append(item)
-            gen_dict["symptoms"] = clean_sym
-        except Exception:
-            gen_dict["symptoms"] = []
-
-    records_list = []
-    for r in records:
-        rd = row_to_dict(r)
-        try:
-            parsed = json.loads(rd.get("json_data", "{}"))
-            rd["parsed_data"] = parsed
-        except Exception:
-            rd["parsed_data"] = {}
-            
-        records_list.append(rd)
+            student_ids = [int(x) for x in raw_ids]
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "message": "student_ids must be integers"}), 400
+        conditions.append("s.student_id = ANY(%s)")
+        params.append(student_ids)
+    for arg, col in (("student_class", "s.student_class"), ("section", "s.section")):
+        value = str(filters.get(arg) or "").strip()
+        if value:
+            conditions.append(f"{col} = %s")
+            params.append(value)
+    if str(filters.get("examined", "")) == "1":
+        conditions.append(
+            "EXISTS (SELECT 1 FROM Health_Records x "
+            "WHERE x.student_id = s.student_id AND x.event_id = s.event_id)"
+        )
+
+    with get_db_conn() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute(
+            f"SELECT s.* FROM Students s WHERE {' AND '.join(conditions)} ORDER BY s.student_id",
+            params,
+        )
+        students = cur.fetchall()
+        ids = [st["student_id"] for st in students]
+
+        cur.execute(
+            f"SELECT {GENERAL_INFO_SELECT} FROM Student_General_Info "
+            "WHERE event_id = %s AND student_id = ANY(%s)",
+            (event_id, ids),
+        )
+        general_by_student = {g["student_id"]: g for g in cur.fetchall()}
+
+        cur.execute(
+            f"SELECT hr.student_id, hr.category, {RECORD_JSON_SELECT}, hr.timestamp, hr.doctor_id "
+            "FROM Health_Records hr WHERE hr.event_id = %s AND hr.student_id = ANY(%s) "
+            "ORDER BY hr.student_id, hr.timestamp DESC",
+            (event_id, ids),
+        )
+        records_by_student = {}
+        for rec in cur.fetchall():
+            records_by_student.setdefault(rec.pop("student_id"), []).append(dict(rec))
+
+    dumps = current_app.json.dumps
+
+    def generate():
+        for st in students:
+            sid = st["student_id"]
+            yield dumps({
+                "student": row_to_dict(st),
+                "general_info": _general_info_dict(general_by_student.get(sid)),
+                "records": records_by_student.get(sid, []),
+            }) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+@bp.route("/api/events/<int:event_id>/changes")
+def api_event_changes(event_id):
+    """Students, general info, exam records and deletions changed since a cursor.
+
+    Without ``since`` every row of the event is returned (full sync). Pass the
+    returned ``cursor`` as ``since`` next time. Delivery is at-least-once: a
+    row may be sent again, so clients upsert by key (student_id, or
+    student_id + category for records) and apply everything in change_seq
+    order, deletions included.
+    """
+    raw_since = request.args.get("since", "").strip()
+    try:
+        since = int(raw_since) if raw_since else None
+    except ValueError:
+        return jsonify({"success": False, "message": "since must be a cursor returned by this endpoint"}), 400
+
+    where = "event_id = %s" + (" AND change_seq >= %s" if since is not None else "")
+    params = (event_id, since) if since is not None else (event_id,)
+
+    with get_db_conn() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        # Taken first: every transaction older than this xmin has committed
+        # (or aborted) and is visible to the queries below, so resuming from it
+        # can never skip a write that was still in flight.
+        cur.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint AS cursor")
+        cursor = cur.fetchone()["cursor"]
+
+        cur.execute(f"SELECT * FROM Students WHERE {where} ORDER BY change_seq, student_id", params)
+        students = cur.fetchall()
+
+        cur.execute(
+            f"SELECT {GENERAL_INFO_SELECT}, change_seq FROM Student_General_Info "
+            f"WHERE {where} ORDER BY change_seq, student_id",
+            params,
+        )
+        general_info = [_general_info_dict(g) for g in cur.fetchall()]
+
+        cur.execute(
+            f"SELECT hr.student_id, hr.category, {RECORD_JSON_SELECT}, hr.timestamp, "
+            f"hr.doctor_id, hr.change_seq FROM Health_Records hr "
+            f"WHERE {where} ORDER BY hr.change_seq, hr.student_id",
+            params,
+        )
+        records = cur.fetchall()
+
+        deleted = []
+        if since is not None:
+            cur.execute(
+                "SELECT table_name, student_id, category, change_seq FROM Change_Tombstones "
+                f"WHERE {where} ORDER BY change_seq",
+                params,
+            )
+            deleted = cur.fetchall()
 
     return jsonify({
-        "student": row_to_dict(student),
-        "general_info": gen_dict,
-        "records": records_list,
+        "cursor": cursor,
+        "full": since is None,
+        "students": rows_to_list(students),
+        "general_info": general_info,
+        "records": rows_to_list(records),
+        "deleted": rows_to_list(deleted),
     })
 
 
 # ---- Previous Records (cross-camp) ----
 @bp.route("/api/students/previous-records")
 def api_student_previous_records():
-    """Get health records from OTHER camps for a student identified by school_id + registration_number.
+    """Get health records from OTHER camps for the same person (Student_Identity).
 
-    This allows doctors and school POCs to see a student's examination history across
-    different camp events at the same school.
+    The person is identified by student_id, or by school_id + registration_number
+    for older clients. This allows doctors and school POCs to see a student's
+    examination history across different camp events at the same school.
     """
+    student_id = request.args.get("student_id", "").strip()
     school_id = request.args.get("school_id", "").strip()
     registration_number = request.args.get("registration_number", "").strip()
     current_event_id = request.args.get("current_event_id", "").strip()
 
-    if not school_id or not registration_number:
-        return jsonify({"records": [], "message": "school_id and registration_number are required"})
+    if not student_id and (not school_id or not registration_number):
+        return jsonify({"records": [], "message": "student_id, or school_id and registration_number, are required"})
+
+    if student_id:
+        identity_sql = "SELECT identity_id FROM Students WHERE student_id = %s"
+        identity_params = [int(student_id)]
+    else:
+        identity_sql = (
+            "SELECT identity_id FROM Student_Identity WHERE school_id = %s "
+            "AND identity_key = 'reg:' || normalize_registration_number(%s)"
+        )
+        identity_params = [int(school_id), registration_number]
 
     with get_db_conn() as conn:
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-        # Find all student rows with the same registration_number in events linked to the same school
+        # Every other per-camp row of the same person
         exclude_event = int(current_event_id) if current_event_id else 0
-        cur.execute("""
+        exclude_student = int(student_id) if student_id else 0
+        cur.execute(f"""
             SELECT s.student_id, s.name, s.event_id, s.student_class, s.section,
                    s.age, s.gender, s.registration_number,
                    e.school_name, e.start_date, e.end_date
             FROM Students s
             JOIN Events e ON s.event_id = e.event_id
-            WHERE s.registration_number = %s
-              AND e.school_id = %s
+            WHERE s.identity_id = ({identity_sql})
+              AND s.student_id != %s
               AND (%s = 0 OR s.event_id != %s)
             ORDER BY e.start_date DESC
-        """, (registration_number, int(school_id), exclude_event, exclude_event))
+        """, identity_params + [exclude_student, exclude_event, exclude_event])
         matching_students = cur.fetchall()
 
-    if not matching_students:
-        return jsonify({"records": [], "events": []})
+        if not matching_students:
+            return jsonify({"records": [], "events": []})
+
+        student_ids = [stu["student_id"] for stu in matching_students]
+
+        # Records and general info for every matched student, one query each
+        cur.execute(f"""
+            SELECT hr.student_id, hr.record_id, hr.category, {RECORD_JSON_SELECT},
+                   hr.timestamp, hr.doctor_id, hr.event_id
+            FROM Health_Records hr
+            WHERE hr.student_id = ANY(%s)
+            ORDER BY hr.student_id, hr.timestamp DESC
+        """, (student_ids,))
+        records_by_student = {}
+        for r in cur.fetchall():
+            records_by_student.setdefault(r.pop("student_id"), []).append(r)
+
+        cur.execute(f"""
+            SELECT DISTINCT ON (student_id) {GENERAL_INFO_SELECT}
+            FROM Student_General_Info
+            WHERE student_id = ANY(%s)
+            ORDER BY student_id, id
+        """, (student_ids,))
+        general_by_student = {g["student_id"]: g for g in cur.fetchall()}
 
     events_seen = {}
     all_records = []
 
-    with get_db_conn() as conn:
-        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-        for stu in matching_students:
-            stu_dict = row_to_dict(stu)
-            sid = stu_dict["student_id"]
-            eid = stu_dict["event_id"]
-
-            if eid not in events_seen:
-                events_seen[eid] = {
-                    "event_id": eid,
-                    "school_name": stu_dict.get("school_name", ""),
-                    "start_date": stu_dict.get("start_date", ""),
-                    "end_date": stu_dict.get("end_date", ""),
-                    "student_class": stu_dict.get("student_class", ""),
-                    "section": stu_dict.get("section", ""),
-                }
-
-            # Get health records for this student
-            cur.execute("""
-                SELECT hr.record_id, hr.category, hr.json_data, hr.timestamp, hr.doctor_id,
-                       hr.event_id
-                FROM Health_Records hr
-                WHERE hr.student_id = %s
-                ORDER BY hr.timestamp DESC
-            """, (sid,))
-            records = cur.fetchall()
-
-            for r in records:
-                rd = row_to_dict(r)
-                try:
-                    rd["parsed_data"] = json.loads(rd.get("json_data", "{}"))
-                except Exception:
-                    rd["parsed_data"] = {}
-                rd["event_school_name"] = stu_dict.get("school_name", "")
-                rd["event_start_date"] = stu_dict.get("start_date", "")
-                rd["student_name"] = stu_dict.get("name", "")
-                rd["student_class"] = stu_dict.get("student_class", "")
-                all_records.append(rd)
-
-            # Also get general info for this student
-            cur.execute("""
-                SELECT * FROM Student_General_Info
-                WHERE student_id = %s
-            """, (sid,))
-            gen = cur.fetchone()
-            if gen:
-                gen_dict = row_to_dict(gen)
-                try:
-                    gen_dict["symptoms"] = json.loads(gen_dict.get("symptoms_json", "[]"))
-                except Exception:
-                    gen_dict["symptoms"] = []
-                events_seen[eid]["general_info"] = gen_dict
+    for stu in matching_students:
+        stu_dict = row_to_dict(stu)
+        sid = stu_dict["student_id"]
+        eid = stu_dict["event_id"]
+
+        if eid not in events_seen:
+            events_seen[eid] = {
+                "event_id": eid,
+                "school_name": stu_dict.get("school_name", ""),
+                "start_date": stu_dict.get("start_date", ""),
+                "end_date": stu_dict.get("end_date", ""),
+                "student_class": stu_dict.get("student_class", ""),
+                "section": stu_dict.get("section", ""),
+            }
+
+        for r in records_by_student.get(sid, []):
+            rd = row_to_dict(r)
+            rd["event_school_name"] = stu_dict.get("school_name", "")
+            rd["event_start_date"] = stu_dict.get("start_date", "")
+            rd["student_name"] = stu_dict.get("name", "")
+            rd["student_class"] = stu_dict.get("student_class", "")
+            all_records.append(rd)
+
+        gen = general_by_student.get(sid)
+        if gen:
+            events_seen[eid]["general_info"] = row_to_dict(gen)
 
     return jsonify({
         "records": all_records,
@@ -0,0 +1,272 @@
+import os
+import logging
+from datetime import datetime, timezone
+
+from flask import Blueprint, request, jsonify, current_app
+import psycopg2
+import psycopg2.extras
+
+from app.db import get_db_conn
+from app.helpers import row_to_dict, to_json_text
+from app.services import realtime
+from app.services.audit import log_audit
+from app.services.event_stats import refresh_student_counters
+from app.services.student_writes import (
+    create_student, update_student, update_student_status, upsert_general_info,
+    check_exam_access, save_exam, StaleExamError,
+)
+
+logger = logging.getLogger('aiims.sync')
+bp = Blueprint('sync', __name__)
+
+SYNC_MAX_BATCH = int(os.environ.get("SYNC_MAX_BATCH", "200"))
+
+MUTATION_TYPES = ("student_create", "student_update", "general_info", "exam_save", "status")
+
+
+class SyncItemError(Exception):
+    """A mutation that cannot be applied; reported for that item only."""
+
+
+class SyncConflict(Exception):
+    """A mutation older than the stored data; reported with the stored state."""
+
+    def __init__(self, message, **details):
+        super().__init__(message)
+        self.details = details
+
+
+def _student_id(item, refs):
+    """Server student id of a mutation: ``student_id``, or ``student_ref`` naming
+    the ``ref`` of a student_create earlier in this batch (or a replayed one)."""
+    if item.get("student_ref") is not None:
+        if item["student_ref"] not in refs:
+            raise SyncItemError(f"Unknown student_ref {item['student_ref']!r}")
+        return refs[item["student_ref"]]
+    try:
+        return int(item["student_id"])
+    except (KeyError, TypeError, ValueError):
+        raise SyncItemError("student_id or student_ref is required")
+
+
+def _exam_timestamp(value):
+    """Canonical save time of a synced exam: the client's, clamped to now.
+
+    A tablet with its clock ahead would otherwise store a time no later save
+    could beat, locking the record against every stale-exam check.
+    """
+    now = datetime.utcnow()
+    if value in (None, ""):
+        return now.isoformat()
+    text = str(value).strip()
+    if text.endswith(("Z", "z")):
+        text = text[:-1] + "+00:00"
+    try:
+        ts = datetime.fromisoformat(text)
+    except ValueError:
+        raise SyncItemError(f"Invalid exam timestamp {value!r}")
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(ts, now).isoformat()
+
+
+def _authorize(mutations):
+    """Exam access errors by mutation index, resolved before any transaction.
+
+    get_user_role checks out its own connection, so roles are looked up here
+    rather than while a mutation's locks are held.
+    """
+    denied, checked = {}, {}
+    for i, item in enumerate(mutations):
+        data = item.get("data")
+        if item["type"] != "exam_save" or not isinstance(data, dict):
+            continue
+        pair = (str(data.get("doctor_id", "doctor")), str(data.get("specialist_category", "FullExam")))
+        if pair not in checked:
+            try:
+                check_exam_access(*pair)
+                checked[pair] = None
+            except PermissionError as exc:
+                checked[pair] = str(exc)
+        if checked[pair]:
+            denied[i] = checked[pair]
+    return denied
+
+
+def _apply(cur, item, refs, emits, access_error=None):
+    """Apply one mutation inside the item's savepoint; returns its result dict.
+
+    Event counters are not refreshed here but once for the whole batch.
+    """
+    kind = item["type"]
+    data = item.get("data") or {}
+    if not isinstance(data, dict):
+        raise SyncItemError("data must be an object")
+
+    if kind == "student_create":
+        try:
+            student = create_student(cur, data, refresh_counters=False)
+        except ValueError as exc:
+            raise SyncItemError(str(exc))
+        emits.append(("student_created", {
+            "student_id": student["student_id"], "event_id": student["event_id"],
+            "name": student["name"], "student": row_to_dict(student),
+        }, {"event_id": student["event_id"], "key": student["student_id"]}))
+        return {"student_id": student["student_id"], "student": row_to_dict(student)}
+
+    student_id = _student_id(item, refs)
+    if kind == "student_update":
+        try:
+            student = update_student(cur, student_id, data, refresh_counters=False)
+        except ValueError as exc:
+            raise SyncItemError(str(exc))
+        if student is None:
+            raise SyncItemError(f"Student {student_id} not found")
+        return {"student_id": student_id, "student": row_to_dict(student)}
+
+    if kind == "status":
+        update_student_status(cur, student_id, data.get("status", "Pending Examination"),
+                              refresh_counters=False)
+        return {"student_id": student_id}
+
+    if kind == "general_info":
+        upsert_general_info(cur, student_id, data)
+        return {"student_id": student_id}
+
+    # exam_save
+    if access_error:
+        raise SyncItemError(access_error)
+    event_id = data.get("event_id", data.get("camp_id", 1))
+    doctor_id = data.get("doctor_id", "doctor")
+    category = data.get("specialist_category", "FullExam")
+    exam_data = data.get("exam_data", {})
+    # Keep the client's save time so a late replay does not look newer
+    ts = _exam_timestamp(data.get("timestamp"))
+    json_str = to_json_text(exam_data)
+    try:
+        record_id = save_exam(cur, student_id, event_id, doctor_id, category, json_str, ts,
+                              refresh_counters=False)
+    except StaleExamError as exc:
+        raise SyncConflict(str(exc), student_id=student_id, record_id=exc.record_id,
+                           stored_timestamp=exc.stored_timestamp)
+    emits.append(("exam_saved", {
+        "student_id": student_id, "event_id": event_id,
+        "category": category, "doctor_id": doctor_id,
+        "record": {
+            "record_id": record_id, "category": category, "json_data": json_str,
+            "parsed_data": exam_data if isinstance(exam_data, dict) else {},
+            "timestamp": ts, "doctor_id": doctor_id,
+        },
+    }, {"event_id": event_id, "student_id": student_id, "key": category}))
+    return {"student_id": student_id, "record_id": record_id}
+
+
+@bp.route("/api/sync", methods=["POST"])
+def api_sync():
+    """Apply an ordered batch of offline mutations in one transaction.
+
+    Body: {"user_id": ..., "mutations": [{"key", "type", "data", "student_id" |
+    "student_ref", "ref"}]}. ``key`` is a client idempotency key, scoped to
+    ``user_id``: a replayed key is not applied again but answered with its
+    stored result (status "duplicate"). ``ref`` on a student_create lets
+    later items of the batch name that student via ``student_ref`` before it
+    has a server id. An exam older than the stored one is reported as status
+    "conflict" and not applied; any other failure of an item is reported as
+    status "error". Each item runs in a savepoint, so a rejected item is
+    rolled back without undoing the others. The event counters of every
+    touched student are refreshed once, after the last item, in the same
+    transaction.
+    """
+    data = request.get_json(force=True)
+    mutations = data.get("mutations")
+    if not isinstance(mutations, list) or not mutations:
+        return jsonify({"success": False, "message": "mutations must be a non-empty list"}), 400
+    if len(mutations) > SYNC_MAX_BATCH:
+        return jsonify({"success": False,
+                        "message": f"At most {SYNC_MAX_BATCH} mutations per batch"}), 413
+    for i, item in enumerate(mutations):
+        if not isinstance(item, dict) or not str(item.get("key") or "").strip():
+            return jsonify({"success": False, "message": f"Mutation {i} needs a key"}), 400
+        if item.get("type") not in MUTATION_TYPES:
+            return jsonify({"success": False,
+                            "message": f"Mutation {i} has unknown type {item.get('type')!r}"}), 400
+
+    user_id = str(data.get("user_id") or "")
+    denied = _authorize(mutations)
+    dumps = current_app.json.dumps
+    now = datetime.utcnow().isoformat()
+    results, refs, emits, touched = [], {}, [], set()
+    applied = duplicates = conflicts = failed = 0
+
+    with get_db_conn() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        for i, item in enumerate(mutations):
+            key = str(item["key"]).strip()
+            cur.execute("SAVEPOINT sync_item")
+            try:
+                # Claim the key; a concurrent replay of the same key waits here
+                # until this batch commits, then sees it as a duplicate.
+                cur.execute(
+                    "INSERT INTO Sync_Idempotency (user_id, idempotency_key, mutation_type, created_at) "
+                    "VALUES (%s, %s, %s, %s) ON CONFLICT (user_id, idempotency_key) DO NOTHING "
+                    "RETURNING idempotency_key",
+                    (user_id, key, item["type"], now),
+                )
+                if cur.fetchone() is None:
+                    cur.execute(
+                        "SELECT result FROM Sync_Idempotency WHERE user_id = %s AND idempotency_key = %s",
+                        (user_id, key),
+                    )
+                    result = {**(cur.fetchone()["result"] or {}), "key": key, "status": "duplicate"}
+                    duplicates += 1
+                else:
+                    item_emits = []
+                    result = _apply(cur, item, refs, item_emits, denied.get(i))
+                    cur.execute(
+                        "UPDATE Sync_Idempotency SET result = %s::jsonb "
+                        "WHERE user_id = %s AND idempotency_key = %s",
+                        (dumps(result), user_id, key),
+                    )
+                    touched.add(result["student_id"])
+                    result = {**result, "key": key, "status": "applied"}
+                    emits.extend(item_emits)
+                    applied += 1
+                cur.execute("RELEASE SAVEPOINT sync_item")
+            except SyncConflict as exc:
+                cur.execute("ROLLBACK TO SAVEPOINT sync_item")
+                result = {**exc.details, "key": key, "status": "conflict", "message": str(exc)}
+                conflicts += 1
+            except SyncItemError as exc:
+                cur.execute("ROLLBACK TO SAVEPOINT sync_item")
+                result = {"key": key, "status": "error", "message": str(exc)}
+                failed += 1
+            except Exception as exc:
+                cur.execute("ROLLBACK TO SAVEPOINT sync_item")
+                if isinstance(exc, psycopg2.Error):
+                    logger.error(f"Sync mutation {key} ({item['type']}) failed: {exc}")
+                    message = "Save failed, please retry"
+                else:
+                    logger.exception(f"Sync mutation {key} ({item['type']}) is malformed")
+                    message = "Invalid mutation"
+                result = {"key": key, "status": "error", "message": message}
+                failed += 1
+            if item["type"] == "student_create" and item.get("ref") is not None and "student_id" in result:
+                refs[item["ref"]] = result["student_id"]
+            results.append(result)
+
+        try:
+            if touched:
+                refresh_student_counters(cur, sorted(touched))
+            conn.commit()
+        except psycopg2.Error as exc:
+            conn.rollback()
+            logger.error(f"Sync batch of {len(mutations)} mutations failed to commit: {exc}")
+            return jsonify({"success": False, "message": "Sync failed, please retry"}), 500
+
+    log_audit(user_id or "sync", "SYNC_BATCH",
+              f"Synced {len(mutations)} mutations: {applied} applied, "
+              f"{duplicates} duplicate, {conflicts} conflict, {failed} failed")
+    for name, payload, target in emits:
+        realtime.emit(name, payload, **target)
+
+    return jsonify({"success": True, "results": results})
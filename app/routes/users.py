@@ -9,6 +9,9 @@ from app.config import Config
 from app.helpers import row_to_dict, rows_to_list, generate_username, generate_password, user_public
 from app.services.audit import log_audit
 from app.services.email import send_email_async
+from app.services.user_roles import invalidate_user_role
+from app.services.versions import bump_versions
+from app.services.cache import invalidate
 
 logger = logging.getLogger('aiims.users')
 bp = Blueprint('users', __name__)
@@ -70,8 +73,17 @@ def api_change_display_name():
         if old_user:
             cur.execute("DELETE FROM Users WHERE username = %s", (old_username,))
 
+        # Staff lists and school POCs show the username
+        cur.execute(
+            "SELECT DISTINCT event_id FROM Event_Volunteers WHERE username = %s", (new_username,)
+        )
+        staff_events = [f"event:{r['event_id']}" for r in cur.fetchall()]
+        bump_versions(cur, "schools", *staff_events)
         conn.commit()
 
+    invalidate_user_role(old_username)
+    invalidate("schools", *staff_events)
+
     # Update session
     sess_user['username'] = new_username
     session['user'] = sess_user
@@ -214,9 +226,13 @@ def api_register_user():
                  poc_designation, poc_phone, poc_email, now),
             )
             school_id = cur.fetchone()["school_id"]
+            bump_versions(cur, "schools")
 
         conn.commit()
 
+    if school_id:
+        invalidate("schools")
+
     log_audit(admin_user, "REGISTER_USER",
               f"Registered {role} user: {username} ({name}, {email})")
 
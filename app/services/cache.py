@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, request
+
+logger = logging.getLogger('aiims.cache')
+
+# Optional: redis for a cache tier shared by all gunicorn workers
+try:
+    import redis
+    HAS_REDIS = True
+except ImportError:
+    HAS_REDIS = False
+    redis = None
+
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "30"))
+
+
+class LocalLRU:
+    """In-process LRU with per-entry expiry."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (value, expires_at)
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            if hit[1] <= now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return hit[0]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ResponseCache:
+    """Two-tier (local LRU + optional Redis) cache with tag-based invalidation.
+
+    Every entry records the version of each of its tags when it was stored;
+    ``invalidate(tag)`` bumps the tag version, so older entries stop matching.
+    With Redis the tag versions live there and invalidation reaches every
+    worker; without it they are per-process and other workers hear about
+    writes from the change bus, or catch up when their entries expire
+    (RESPONSE_CACHE_TTL).
+    """
+
+    def __init__(self, maxsize=RESPONSE_CACHE_SIZE, redis_client=None, prefix="aiims:cache:"):
+        self.local = LocalLRU(maxsize)
+        self.redis = redis_client
+        self.prefix = prefix
+        self._tag_lock = threading.Lock()
+        self._tags = {}
+        self.hits_local = 0
+        self.hits_redis = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def _tag_versions(self, tags):
+        if self.redis is not None:
+            try:
+                values = self.redis.mget([f"{self.prefix}tag:{t}" for t in tags])
+                return {t: int(v or 0) for t, v in zip(tags, values)}
+            except Exception:
+                self.errors += 1
+                logger.warning("Redis cache tier unavailable; using local tag versions", exc_info=True)
+        with self._tag_lock:
+            return {t: self._tags.get(t, 0) for t in tags}
+
+    def get(self, key, tags):
+        """Return (value or None, current tag versions)."""
+        versions = self._tag_versions(tags) if tags else {}
+        entry = self.local.get(key)
+        if entry is not None and entry["tags"] == versions:
+            self.hits_local += 1
+            return entry["value"], versions
+        if self.redis is not None:
+            try:
+                raw = self.redis.get(self.prefix + key)
+                ttl = max(self.redis.pttl(self.prefix + key) / 1000.0, 1.0) if raw else 0
+            except Exception:
+                self.errors += 1
+                raw = None
+            if raw is not None:
+                entry = json.loads(raw)
+                if entry["tags"] == versions:
+                    self.local.set(key, entry, ttl)
+                    self.hits_redis += 1
+                    return entry["value"], versions
+        self.misses += 1
+        return None, versions
+
+    def set(self, key, value, versions, ttl):
+        """Store ``value`` under the tag versions returned by the preceding get()."""
+        entry = {"tags": versions, "value": value}
+        self.local.set(key, entry, ttl)
+        if self.redis is not None:
+            try:
+                self.redis.set(self.prefix + key, json.dumps(entry), px=int(ttl * 1000))
+            except Exception:
+                self.errors += 1
+        self.stores += 1
+
+    def invalidate(self, *tags, local_only=False):
+        """Make every entry carrying one of ``tags`` stale. Call after commit.
+
+        ``local_only`` skips the shared Redis versions, for changes another
+        worker has already invalidated there.
+        """
+        if not tags:
+            return
+        self.invalidations += 1
+        with self._tag_lock:
+            for t in tags:
+                self._tags[t] = self._tags.get(t, 0) + 1
+        if self.redis is not None and not local_only:
+            try:
+                pipe = self.redis.pipeline()
+                for t in tags:
+                    pipe.incr(f"{self.prefix}tag:{t}")
+                pipe.execute()
+            except Exception:
+                self.errors += 1
+                logger.warning(f"Redis cache invalidation failed for {tags}", exc_info=True)
+
+    def stats(self):
+        return {
+            "local_entries": len(self.local),
+            "hits_local": self.hits_local,
+            "hits_redis": self.hits_redis,
+            "misses": self.misses,
+            "stores": self.stores,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+            "redis": self.redis is not None,
+        }
+
+
+_cache = ResponseCache()
+
+
+def init_cache(redis_client=None):
+    """Install the shared cache; uses REDIS_URL for the second tier when set.
+
+    Tests can pass a fake Redis client, or nothing for a local-only cache.
+    """
+    global _cache
+    if redis_client is None and HAS_REDIS and os.environ.get("REDIS_URL"):
+        redis_client = redis.from_url(os.environ["REDIS_URL"])
+    _cache = ResponseCache(redis_client=redis_client)
+    return _cache
+
+
+def get_cache():
+    return _cache
+
+
+def invalidate(*tags):
+    _cache.invalidate(*tags)
+
+
+def cached(*tags, ttl=None):
+    """Cache a GET view's JSON body, keyed by path + query string.
+
+    ``tags`` may reference view kwargs, e.g. 'event:{event_id}'. Only 200
+    responses are stored; write paths call ``invalidate`` with the same tags.
+    Under ``@versioned`` the key also carries the resource version, so a write
+    committed by any worker retires the body even when this worker's tag
+    versions never heard of it (no Redis, no change-bus trigger).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = _cache
+            key = f"resp:{request.full_path}"
+            if g.get("resource_version") is not None:
+                key += f"@{g.resource_version}"
+            entry_tags = [t.format(**kwargs) for t in tags]
+            # Tag versions are read before the view runs, so a write that
+            # lands mid-query leaves the stored entry already stale.
+            body, versions = cache.get(key, entry_tags)
+            if body is not None:
+                return current_app.response_class(body, mimetype="application/json")
+
+            response = view(*args, **kwargs)
+            if (not isinstance(response, tuple) and response.status_code == 200
+                    and response.mimetype == "application/json"):
+                cache.set(key, response.get_data(as_text=True), versions,
+                          ttl if ttl is not None else RESPONSE_CACHE_TTL)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,180 @@
+import os
+import json
+import select
+import logging
+import threading
+
+import psycopg2
+import psycopg2.extensions
+
+from app.db import origin_id
+from app.services import realtime
+from app.services.cache import get_cache
+
+logger = logging.getLogger('aiims.change_bus')
+
+# Filled by the statement-level triggers in migrations a4b5c6d7e8f9 / e8f9a0b1c2d3:
+#   {"table": "students", "op": "INSERT", "event_id": 7, "count": 3, "ids": [...],
+#    "origin": <application_name of the writing connection, see app.db.origin_id>}
+CHANNEL = "aiims_changes"
+
+# Cache tags made stale by a change to each table (see @cached in the routes).
+_CACHE_TAGS = {
+    "events": ("events", "event:{event_id}"),
+    "event_volunteers": ("event:{event_id}",),
+}
+
+
+def cache_tags(change):
+    """Response-cache tags affected by one change payload."""
+    if change.get("event_id") is None:
+        return ()
+    return tuple(t.format(event_id=change["event_id"]) for t in _CACHE_TAGS.get(change.get("table"), ()))
+
+
+def relay_messages(change):
+    """(name, payload, realtime.emit kwargs) for the client messages a change implies.
+
+    Rebuilt from the compact payload, so they carry ids but not the row
+    data; clients refetch what they show when ``student`` / ``record`` is
+    absent.
+    """
+    event_id = change.get("event_id")
+    if event_id is None:
+        return []
+    table, op = change.get("table"), change.get("op")
+    ids = [int(i) for i in change.get("ids") or ()]
+    if table == "students" and op == "INSERT":
+        if change.get("count") == 1 and ids:
+            return [("student_created", {"student_id": ids[0], "event_id": event_id},
+                     {"event_id": event_id, "key": ids[0]})]
+        return [("students_bulk_created", {"event_id": event_id, "count": change.get("count", 0)},
+                 {"event_id": event_id, "accumulate": ("count",)})]
+    if table == "health_records" and op in ("INSERT", "UPDATE"):
+        return [("exam_saved", {"student_id": student_id, "event_id": event_id},
+                 {"event_id": event_id, "student_id": student_id})
+                for student_id in ids]
+    return []
+
+
+class ChangeListener:
+    """Per-worker LISTEN loop on a dedicated autocommit connection.
+
+    Each change is applied to this worker's response cache. With
+    ``relay_events`` (Socket.IO without a Redis message queue, so a worker's
+    emits only reach its own clients) changes written by other workers are
+    also turned into room-scoped messages and queued on the coalescing
+    realtime emitter; the writing worker has already sent its own, richer
+    ones. Every worker runs its own listener, so none of this relies on
+    Redis. The connection is re-opened with backoff if the database goes
+    away; changes committed while disconnected are covered by the cache TTL.
+    """
+
+    def __init__(self, dsn, relay_events=False, poll_timeout=5.0):
+        self.dsn = dsn
+        self.relay_events = relay_events
+        self.poll_timeout = poll_timeout
+        self.received = 0
+        self.relayed = 0
+        self.errors = 0
+        self.reconnects = 0
+        self.connected = False
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def ensure_started(self):
+        """Start the listener thread once per process (threads do not survive fork)."""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="change-bus", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {CHANNEL}")
+        return conn
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = self._connect()
+                self.connected = True
+                backoff = 1.0
+                logger.info(f"Listening for database changes on '{CHANNEL}'")
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], self.poll_timeout) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.dispatch(conn.notifies.pop(0).payload)
+            except Exception:
+                self.errors += 1
+                logger.exception(f"Change listener lost its connection; retrying in {backoff:.0f}s")
+            finally:
+                self.connected = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except psycopg2.Error:
+                        pass
+            if self._stop.wait(backoff):
+                break
+            backoff = min(backoff * 2, 30.0)
+            self.reconnects += 1
+
+    def dispatch(self, payload):
+        try:
+            change = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Ignoring malformed change payload: {payload[:200]}")
+            return
+        self.received += 1
+
+        tags = cache_tags(change)
+        if tags:
+            # The writing worker already bumped the shared (Redis) tag versions.
+            get_cache().invalidate(*tags, local_only=True)
+
+        if self.relay_events and change.get("origin") != origin_id():
+            for name, message, target in relay_messages(change):
+                realtime.emit(name, message, **target)
+                self.relayed += 1
+
+    def stats(self):
+        return {"connected": self.connected, "received": self.received,
+                "relayed": self.relayed, "errors": self.errors,
+                "reconnects": self.reconnects}
+
+
+_listener = None
+
+
+def init_change_bus(app, relay_events=False):
+    """Run a change listener in each worker, started by its first request.
+
+    ``relay_events`` makes it relay other workers' writes to this worker's
+    Socket.IO clients. Disabled with CHANGE_BUS_ENABLED=0 or when
+    DATABASE_URL is not set.
+    """
+    global _listener
+    dsn = app.config.get("DATABASE_URL")
+    if not dsn or os.environ.get("CHANGE_BUS_ENABLED", "1") == "0":
+        logger.info("Change bus disabled.")
+        return None
+    _listener = ChangeListener(dsn, relay_events)
+    app.before_request(_listener.ensure_started)
+    return _listener
+
+
+def change_bus_stats():
+    """Listener counters, or {} if the bus is disabled."""
+    return _listener.stats() if _listener else {}
@@ -1,12 +1,16 @@
 import smtplib
 import os
 import logging
+import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger('aiims.email')
 executor = ThreadPoolExecutor(max_workers=2)
+_results = {"sent": 0, "failed": 0, "skipped": 0}
+_pending = 0
+_pending_lock = threading.Lock()
 
 def _send_email_sync(to_email: str, subject: str, body_html: str):
     """"Synchronous email send using SMTP_PASSWORD env var."""
@@ -14,6 +18,7 @@ def _send_email_sync(to_email: str, subject: str, body_html: str):
     sender = os.environ.get('SMTP_EMAIL', '')
     if not smtp_pass or not sender:
         logger.warning(f"Email skipped (no SMTP credentials). To: {to_email}, Subject: {subject}")
+        _results["skipped"] += 1
         return False
         
     try:
@@ -26,11 +31,25 @@ def _send_email_sync(to_email: str, subject: str, body_html: str):
             server.login(sender, smtp_pass)
             server.send_message(msg)
         logger.info(f"Email sent to {to_email}: {subject}")
+        _results["sent"] += 1
         return True
     except Exception:
         logger.exception(f"Email sending failed to {to_email}")
+        _results["failed"] += 1
         return False
 
 def send_email_async(to_email: str, subject: str, body_html: str):
     """Sends email in background thread."""
-    executor.submit(_send_email_sync, to_email, subject, body_html)
+    global _pending
+    with _pending_lock:
+        _pending += 1
+    executor.submit(_send_email_sync, to_email, subject, body_html).add_done_callback(_email_done)
+
+def _email_done(_future):
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+def email_stats():
+    """Emails submitted and not yet sent (queued or sending), and send outcomes so far."""
+    return {"queue_depth": _pending, **_results}
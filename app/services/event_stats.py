@@ -0,0 +1,286 @@
+import logging
+
+from app.services.versions import event_version_bump_sql
+
+logger = logging.getLogger('aiims.event_stats')
+
+# A cohort is one (event, class, section, gender) bucket of Event_Stat_Counters;
+# Event_Counters holds the per-event totals shown in the event listings.
+# Student_Stat_Contributions holds what each student currently adds to its
+# cohort. A write recomputes only the written students' contributions and
+# applies (new - old) to the counter rows, so concurrent writes to one event
+# only meet on the counter rows they actually change, and only briefly.
+
+# First key of the two-int pg_advisory_xact_lock form (the second is the
+# event id), so these locks never collide with other advisory lock users.
+# Writers take the counter lock shared; rebuild_event_counters takes it
+# exclusively so it never interleaves with deltas.
+COUNTER_LOCK_NAMESPACE = 7301
+VOLUNTEER_LOCK_NAMESPACE = 7302
+
+_CONTRIBUTION_SQL = """
+    SELECT s.student_id, s.event_id,
+           COALESCE(s.student_class, '') AS student_class,
+           COALESCE(s.section, '') AS section,
+           COALESCE(s.gender, '') AS gender,
+           CASE WHEN s.status = 'Absent' THEN 1 ELSE 0 END AS absent,
+           CASE WHEN d.records > 0 THEN 1 ELSE 0 END AS screened,
+           d.normal, d.observation, d.referred, d.dept_counts
+    FROM Students s
+    CROSS JOIN LATERAL (
+        SELECT COUNT(*) AS records,
+               COUNT(*) FILTER (WHERE hr.assessment_status = 'N') AS normal,
+               COUNT(*) FILTER (WHERE hr.assessment_status = 'O') AS observation,
+               COUNT(*) FILTER (WHERE hr.assessment_status = 'R') AS referred,
+               dept_counts_sum(jsonb_build_object(
+                   COALESCE(NULLIF(hr.category, ''), 'Other'), jsonb_build_object(
+                       'N', CASE WHEN hr.assessment_status = 'N' THEN 1 ELSE 0 END,
+                       'O', CASE WHEN hr.assessment_status = 'O' THEN 1 ELSE 0 END,
+                       'R', CASE WHEN hr.assessment_status = 'R' THEN 1 ELSE 0 END
+                   )
+               )) AS dept_counts
+        FROM Health_Records hr
+        WHERE hr.student_id = s.student_id AND hr.event_id = s.event_id
+    ) d
+    WHERE s.event_id IS NOT NULL AND ({students})
+"""
+
+_CONTRIBUTION_COLUMNS = (
+    "student_id, event_id, student_class, section, gender, absent, "
+    "screened, normal, observation, referred, dept_counts"
+)
+
+# Row-lock the students first (a concurrent write to the same student waits
+# here, before it reads anything), then take the events' counter locks shared.
+# Separate statements, so the delta below reads a snapshot taken after both.
+# FOR NO KEY UPDATE so the lock does not conflict with the KEY SHARE lock an
+# earlier Health_Records / Student_General_Info insert in the batch holds.
+_STUDENT_LOCK_SQL = """
+    SELECT 1 FROM Students
+    WHERE student_id = ANY(%(student_ids)s)
+    ORDER BY student_id
+    FOR NO KEY UPDATE;
+    SELECT pg_advisory_xact_lock_shared({namespace}, ev.event_id)
+    FROM (
+        SELECT event_id FROM Students
+        WHERE student_id = ANY(%(student_ids)s) AND event_id IS NOT NULL
+        UNION
+        SELECT event_id FROM Student_Stat_Contributions
+        WHERE student_id = ANY(%(student_ids)s)
+    ) ev
+    ORDER BY ev.event_id
+""".format(namespace=COUNTER_LOCK_NAMESPACE)
+
+# Replace the students' contributions and add (new - old) to every cohort and
+# event they were or are in. Cohorts whose delta is zero (e.g. re-saving an
+# exam with the same assessment) are not touched, and their event version is
+# not bumped. Counter rows are upserted in key order so two writes moving
+# students between the same cohorts cannot deadlock.
+_DELTA_SQL = """
+    WITH fresh AS (
+        {fresh}
+    ), old AS (
+        SELECT * FROM Student_Stat_Contributions
+        WHERE student_id = ANY(%(student_ids)s)
+    ), saved AS (
+        INSERT INTO Student_Stat_Contributions ({columns})
+        SELECT {columns} FROM fresh
+        ON CONFLICT (student_id) DO UPDATE SET
+            event_id = EXCLUDED.event_id,
+            student_class = EXCLUDED.student_class,
+            section = EXCLUDED.section,
+            gender = EXCLUDED.gender,
+            absent = EXCLUDED.absent,
+            screened = EXCLUDED.screened,
+            normal = EXCLUDED.normal,
+            observation = EXCLUDED.observation,
+            referred = EXCLUDED.referred,
+            dept_counts = EXCLUDED.dept_counts
+    ), gone AS (
+        DELETE FROM Student_Stat_Contributions
+        WHERE student_id = ANY(%(student_ids)s)
+          AND student_id NOT IN (SELECT student_id FROM fresh)
+    ), delta AS (
+        SELECT event_id, student_class, section, gender,
+               SUM(n) AS total_students, SUM(absent) AS absent, SUM(screened) AS screened,
+               SUM(normal) AS normal, SUM(observation) AS observation, SUM(referred) AS referred,
+               dept_counts_sum(dept_counts) AS dept_counts
+        FROM (
+            SELECT event_id, student_class, section, gender, 1 AS n, absent, screened,
+                   normal, observation, referred, dept_counts
+            FROM fresh
+            UNION ALL
+            SELECT event_id, student_class, section, gender, -1, -absent, -screened,
+                   -normal, -observation, -referred, dept_counts_neg(dept_counts)
+            FROM old
+        ) x
+        GROUP BY event_id, student_class, section, gender
+        HAVING SUM(n) <> 0 OR SUM(absent) <> 0 OR SUM(screened) <> 0 OR SUM(normal) <> 0
+            OR SUM(observation) <> 0 OR SUM(referred) <> 0
+            OR dept_counts_sum(dept_counts) <> '{{}}'::jsonb
+    ), event_totals AS (
+        INSERT INTO Event_Counters (event_id, student_count, screened_count)
+        SELECT event_id, SUM(total_students), SUM(screened)
+        FROM delta
+        GROUP BY event_id
+        HAVING SUM(total_students) <> 0 OR SUM(screened) <> 0
+        ORDER BY event_id
+        ON CONFLICT (event_id) DO UPDATE SET
+            student_count = Event_Counters.student_count + EXCLUDED.student_count,
+            screened_count = Event_Counters.screened_count + EXCLUDED.screened_count
+    ), bumped AS (
+        {bump}
+    )
+    INSERT INTO Event_Stat_Counters
+        (event_id, student_class, section, gender, total_students, absent,
+         screened, normal, observation, referred, dept_counts)
+    SELECT event_id, student_class, section, gender, total_students, absent,
+           screened, normal, observation, referred, dept_counts
+    FROM delta
+    ORDER BY event_id, student_class, section, gender
+    ON CONFLICT (event_id, student_class, section, gender) DO UPDATE SET
+        total_students = Event_Stat_Counters.total_students + EXCLUDED.total_students,
+        absent = Event_Stat_Counters.absent + EXCLUDED.absent,
+        screened = Event_Stat_Counters.screened + EXCLUDED.screened,
+        normal = Event_Stat_Counters.normal + EXCLUDED.normal,
+        observation = Event_Stat_Counters.observation + EXCLUDED.observation,
+        referred = Event_Stat_Counters.referred + EXCLUDED.referred,
+        dept_counts = dept_counts_add(Event_Stat_Counters.dept_counts, EXCLUDED.dept_counts)
+""".format(
+    fresh=_CONTRIBUTION_SQL.format(students="s.student_id = ANY(%(student_ids)s)"),
+    columns=_CONTRIBUTION_COLUMNS,
+    bump=event_version_bump_sql("SELECT event_id FROM delta"),
+)
+
+# Serialises writers of one event's Event_Counters.volunteer_count.
+_LOCK_SQL = """
+    SELECT pg_advisory_xact_lock({namespace}, ev.event_id)
+    FROM (SELECT DISTINCT event_id FROM ({{events}}) e) ev
+    ORDER BY ev.event_id
+"""
+
+# Rolls the cohorts of each event up into its Event_Counters row (rebuild only).
+_EVENT_ROLLUP_SQL = """
+    INSERT INTO Event_Counters (event_id, student_count, screened_count)
+    SELECT ev.event_id,
+           COALESCE(SUM(esc.total_students), 0),
+           COALESCE(SUM(esc.screened), 0)
+    FROM (SELECT DISTINCT event_id FROM ({events}) e) ev
+    LEFT JOIN Event_Stat_Counters esc ON esc.event_id = ev.event_id
+    GROUP BY ev.event_id
+    ON CONFLICT (event_id) DO UPDATE SET
+        student_count = EXCLUDED.student_count,
+        screened_count = EXCLUDED.screened_count
+"""
+
+_VOLUNTEER_COUNT_SQL = """
+    INSERT INTO Event_Counters (event_id, volunteer_count)
+    SELECT ev.event_id,
+           (SELECT COUNT(*) FROM Event_Volunteers v
+            WHERE v.event_id = ev.event_id AND v.active = 1)
+    FROM (SELECT DISTINCT event_id FROM ({events}) e) ev
+    ON CONFLICT (event_id) DO UPDATE SET
+        volunteer_count = EXCLUDED.volunteer_count
+"""
+
+_EVENT_IDS_SQL = "SELECT event_id FROM Events WHERE event_id = ANY(%(event_ids)s)"
+
+VOLUNTEER_COUNTS_REFRESH_SQL = (
+    _LOCK_SQL.format(namespace=VOLUNTEER_LOCK_NAMESPACE).format(events=_EVENT_IDS_SQL) + ";\n"
+    + _VOLUNTEER_COUNT_SQL.format(events=_EVENT_IDS_SQL) + ";\n"
+    + event_version_bump_sql(_EVENT_IDS_SQL)
+)
+
+
+# Appended to write batches (e.g. the exam save), so the counters are
+# maintained without extra round trips. Takes %(student_ids)s.
+STUDENT_COUNTERS_REFRESH_SQL = _STUDENT_LOCK_SQL + ";\n" + _DELTA_SQL
+
+
+def refresh_student_counters(cur, student_ids):
+    """Apply the counter deltas of the given students' latest writes.
+
+    Covers creates, demographic moves between cohorts (the old cohort comes
+    from the stored contribution), status changes and exam saves. Also bumps
+    the versions of events whose counts changed. Runs on the caller's
+    cursor, after the write and before its commit.
+    """
+    if not student_ids:
+        return
+    cur.execute(STUDENT_COUNTERS_REFRESH_SQL, {"student_ids": sorted(set(student_ids))})
+
+
+def refresh_volunteer_counts(cur, event_ids):
+    """Recompute Event_Counters.volunteer_count after Event_Volunteers changed."""
+    if not event_ids:
+        return
+    cur.execute(VOLUNTEER_COUNTS_REFRESH_SQL, {"event_ids": list(event_ids)})
+
+
+def rebuild_event_counters(cur, event_id=None):
+    """Rebuild contributions, Event_Stat_Counters and Event_Counters from scratch for one event, or all events."""
+    params = {"event_id": event_id}
+    scope = "%(event_id)s::int IS NULL OR event_id = %(event_id)s::int"
+    events_sql = f"SELECT event_id FROM Events WHERE {scope}"
+    for namespace in (COUNTER_LOCK_NAMESPACE, VOLUNTEER_LOCK_NAMESPACE):
+        cur.execute(_LOCK_SQL.format(namespace=namespace).format(events=events_sql), params)
+    cur.execute(
+        f"DELETE FROM Student_Stat_Contributions WHERE {scope};"
+        f"DELETE FROM Event_Stat_Counters WHERE {scope};"
+        f"DELETE FROM Event_Counters WHERE {scope}",
+        params,
+    )
+    cur.execute(
+        f"INSERT INTO Student_Stat_Contributions ({_CONTRIBUTION_COLUMNS}) "
+        + _CONTRIBUTION_SQL.format(students="%(event_id)s::int IS NULL OR s.event_id = %(event_id)s::int")
+        + " ON CONFLICT (student_id) DO UPDATE SET "
+        + ", ".join(f"{c} = EXCLUDED.{c}" for c in _CONTRIBUTION_COLUMNS.split(", ")[1:]),
+        params,
+    )
+    cur.execute(f"""
+        INSERT INTO Event_Stat_Counters
+            (event_id, student_class, section, gender, total_students, absent,
+             screened, normal, observation, referred, dept_counts)
+        SELECT event_id, student_class, section, gender, COUNT(*), SUM(absent),
+               SUM(screened), SUM(normal), SUM(observation), SUM(referred),
+               dept_counts_sum(dept_counts)
+        FROM Student_Stat_Contributions
+        WHERE {scope}
+        GROUP BY event_id, student_class, section, gender
+    """, params)
+    cur.execute(_EVENT_ROLLUP_SQL.format(events=events_sql), params)
+    cur.execute(_VOLUNTEER_COUNT_SQL.format(events=events_sql), params)
+    cur.execute(event_version_bump_sql(events_sql), params)
+
+
+def read_event_stats(cur, event_id, student_class="", section="", gender=""):
+    """Sum the counters of the matching cohorts into the /stats summary shape."""
+    conditions = ["event_id = %s"]
+    params = [event_id]
+    if student_class:
+        conditions.append("student_class = %s")
+        params.append(student_class)
+    if section:
+        conditions.append("section = %s")
+        params.append(section)
+    if gender:
+        conditions.append("gender = %s")
+        params.append(gender)
+
+    cur.execute(
+        "SELECT total_students, absent, screened, normal, observation, referred, dept_counts "
+        f"FROM Event_Stat_Counters WHERE {' AND '.join(conditions)}",
+        params,
+    )
+    totals = {"total_students": 0, "screened": 0, "normal": 0,
+              "observation": 0, "referred": 0, "absent": 0}
+    dept_breakdown = {}
+    for row in cur.fetchall():
+        for key in totals:
+            totals[key] += row[key] or 0
+        for cat, counts in (row["dept_counts"] or {}).items():
+            bucket = dept_breakdown.setdefault(cat, {"N": 0, "O": 0, "R": 0})
+            for k in ("N", "O", "R"):
+                bucket[k] += counts.get(k, 0)
+    totals["dept_breakdown"] = dept_breakdown
+    return totals
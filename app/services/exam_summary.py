@@ -0,0 +1,48 @@
+import logging
+
+logger = logging.getLogger('aiims.exam_summary')
+
+# Recomputes the Student_Exam_Summary row for one (student_id, event_id). The
+# student row lock serialises concurrent refreshes so none writes a stale snapshot.
+# FOR NO KEY UPDATE, not FOR UPDATE: the caller's Health_Records insert already
+# holds the FK's KEY SHARE lock on this row, which FOR UPDATE would conflict
+# with (two first exams for one student would deadlock).
+EXAM_SUMMARY_REFRESH_SQL = """
+    SELECT 1 FROM Students WHERE student_id = %(student_id)s FOR NO KEY UPDATE;
+    INSERT INTO Student_Exam_Summary
+        (student_id, event_id, examined_categories, record_count,
+         latest_record_id, latest_status, latest_timestamp)
+    SELECT agg.student_id, agg.event_id, agg.examined_categories, agg.record_count,
+           latest.record_id, latest.assessment_status,
+           latest.timestamp
+    FROM (
+        SELECT student_id, event_id,
+               STRING_AGG(DISTINCT category, ',') AS examined_categories,
+               COUNT(*) AS record_count
+        FROM Health_Records
+        WHERE student_id = %(student_id)s AND event_id = %(event_id)s
+        GROUP BY student_id, event_id
+    ) agg
+    JOIN LATERAL (
+        SELECT record_id, assessment_status, timestamp
+        FROM Health_Records
+        WHERE student_id = agg.student_id AND event_id = agg.event_id
+        ORDER BY timestamp DESC, record_id DESC
+        LIMIT 1
+    ) latest ON TRUE
+    ON CONFLICT (student_id, event_id) DO UPDATE SET
+        examined_categories = EXCLUDED.examined_categories,
+        record_count = EXCLUDED.record_count,
+        latest_record_id = EXCLUDED.latest_record_id,
+        latest_status = EXCLUDED.latest_status,
+        latest_timestamp = EXCLUDED.latest_timestamp
+"""
+
+
+def refresh_exam_summary(cur, student_id, event_id):
+    """Recompute the Student_Exam_Summary row for one student + event.
+
+    Runs on the caller's cursor so it commits (or rolls back) together with the
+    Health_Records write that triggered it.
+    """
+    cur.execute(EXAM_SUMMARY_REFRESH_SQL, {"student_id": student_id, "event_id": event_id})
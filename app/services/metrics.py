@@ -0,0 +1,298 @@
+import os
+import json
+import time
+import bisect
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger('aiims.metrics')
+
+# Each gunicorn worker keeps its metrics in memory and writes a snapshot to
+# METRICS_DIR every METRICS_FLUSH_SECONDS (and just before serving a scrape).
+# /metrics merges every worker's snapshot: counters and histograms are summed
+# over all files, including those of workers that have exited, so totals never
+# go backwards; gauges only count workers that are still alive. Files are named
+# <pid>-<process start time>, so a pid reused after a restart is not mistaken
+# for the old worker, and gunicorn.conf.py clears the directory when the
+# master starts.
+METRICS_DIR = os.environ.get("METRICS_DIR") or os.path.join(tempfile.gettempdir(), "aiims-metrics")
+METRICS_FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", "5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    "aiims_http_request_duration_seconds": ("histogram", "Request latency by endpoint, method and status."),
+    "aiims_db_pool_connections": ("gauge", "Open database connections by pool and state."),
+    "aiims_db_pool_max_connections": ("gauge", "Configured maximum connections, summed over live workers."),
+    "aiims_db_pool_waiters": ("gauge", "Requests waiting for a free database connection."),
+    "aiims_db_pool_checkouts_total": ("counter", "Database connection checkouts."),
+    "aiims_db_pool_timeouts_total": ("counter", "Checkouts that timed out (served as 503)."),
+    "aiims_db_pool_discarded_total": ("counter", "Broken or expired connections discarded."),
+    "aiims_db_pool_wait_seconds_total": ("counter", "Time spent waiting for a connection."),
+    "aiims_db_replica_healthy": ("gauge", "Workers currently routing reads to the replica."),
+    "aiims_db_replica_lag_seconds": ("gauge", "Highest replica replay lag seen by a worker."),
+    "aiims_db_replica_reads_total": ("counter", "Reads served by the replica."),
+    "aiims_db_replica_failovers_total": ("counter", "Replica checkouts that fell back to the primary."),
+    "aiims_cache_requests_total": ("counter", "Response cache lookups by result."),
+    "aiims_cache_hit_ratio": ("gauge", "Share of response cache lookups served from cache."),
+    "aiims_cache_invalidations_total": ("counter", "Response cache tag invalidations."),
+    "aiims_cache_errors_total": ("counter", "Redis errors in the response cache."),
+    "aiims_socketio_connections": ("gauge", "Connected Socket.IO clients."),
+    "aiims_socketio_rooms": ("gauge", "Socket.IO rooms with at least one subscriber."),
+    "aiims_realtime_queue_depth": ("gauge", "Socket.IO messages waiting to be sent."),
+    "aiims_realtime_messages_total": ("counter", "Socket.IO messages by outcome."),
+    "aiims_email_queue_depth": ("gauge", "Emails waiting for a sender thread."),
+    "aiims_emails_total": ("counter", "Emails by outcome."),
+    "aiims_change_bus_connected": ("gauge", "Workers listening for database change notifications."),
+    "aiims_change_bus_notifications_total": ("counter", "Database change notifications received."),
+}
+
+
+class RequestHistogram:
+    """Per-process request latency histograms, keyed by (endpoint, method, status)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}   # key -> [count per bucket (+Inf last), sum]
+
+    def observe(self, endpoint, method, status, seconds):
+        key = (endpoint, method, str(status))
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return [[*key, list(counts), total] for key, (counts, total) in self._series.items()]
+
+
+request_latency = RequestHistogram()
+
+
+def _process_samples():
+    """(name, labels, value) for this worker's pool, cache, Socket.IO, email and bus state."""
+    from app.db import pool_stats
+    from app.services.cache import get_cache
+    from app.services.change_bus import change_bus_stats
+    from app.services.email import email_stats
+    from app.services.realtime import realtime_stats
+
+    samples = []
+
+    def pool(name, stats):
+        labels = {"pool": name}
+        samples.extend([
+            ("aiims_db_pool_connections", {**labels, "state": "in_use"}, stats["in_use"]),
+            ("aiims_db_pool_connections", {**labels, "state": "idle"}, stats["idle"]),
+            ("aiims_db_pool_max_connections", labels, stats["max"]),
+            ("aiims_db_pool_waiters", labels, stats["waiters"]),
+            ("aiims_db_pool_checkouts_total", labels, stats["checkouts"]),
+            ("aiims_db_pool_timeouts_total", labels, stats["timeouts"]),
+            ("aiims_db_pool_discarded_total", labels, stats["discarded"]),
+            ("aiims_db_pool_wait_seconds_total", labels, stats["wait_seconds_total"]),
+        ])
+
+    stats = pool_stats()
+    if stats:
+        pool("primary", stats)
+        replica = stats.get("replica")
+        if replica:
+            pool("replica", replica["pool"])
+            samples.extend([
+                ("aiims_db_replica_healthy", {}, int(replica["healthy"])),
+                ("aiims_db_replica_lag_seconds", {}, replica["lag_seconds"]),
+                ("aiims_db_replica_reads_total", {}, replica["reads"]),
+                ("aiims_db_replica_failovers_total", {}, replica["failovers"]),
+            ])
+
+    cache = get_cache().stats()
+    samples.extend([
+        ("aiims_cache_requests_total", {"result": "hit_local"}, cache["hits_local"]),
+        ("aiims_cache_requests_total", {"result": "hit_redis"}, cache["hits_redis"]),
+        ("aiims_cache_requests_total", {"result": "miss"}, cache["misses"]),
+        ("aiims_cache_invalidations_total", {}, cache["invalidations"]),
+        ("aiims_cache_errors_total", {}, cache["errors"]),
+    ])
+
+    rt = realtime_stats()
+    samples.extend([
+        ("aiims_socketio_connections", {}, rt["connections"]),
+        ("aiims_socketio_rooms", {}, rt["rooms"]),
+    ])
+    emitter = rt.get("emitter")
+    if emitter:
+        samples.append(("aiims_realtime_queue_depth", {}, emitter["depth"]))
+        for result in ("sent", "dropped", "coalesced", "errors"):
+            samples.append(("aiims_realtime_messages_total", {"result": result}, emitter[result]))
+
+    email = email_stats()
+    samples.append(("aiims_email_queue_depth", {}, email["queue_depth"]))
+    for result in ("sent", "failed", "skipped"):
+        samples.append(("aiims_emails_total", {"result": result}, email[result]))
+
+    bus = change_bus_stats()
+    if bus:
+        samples.extend([
+            ("aiims_change_bus_connected", {}, int(bus["connected"])),
+            ("aiims_change_bus_notifications_total", {}, bus["received"]),
+        ])
+    return samples
+
+
+def _start_time(pid):
+    """Start time of ``pid`` in clock ticks since boot, or None without /proc."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # Field 22; the command name (field 2) may contain spaces.
+            return f.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+
+
+def clear_snapshots(directory=METRICS_DIR):
+    """Delete every worker snapshot; run by the gunicorn master before forking."""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.endswith((".json", ".tmp")):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+class MetricsStore:
+    """Writes this worker's snapshot to METRICS_DIR and merges all of them."""
+
+    def __init__(self, directory=METRICS_DIR, flush_seconds=METRICS_FLUSH_SECONDS):
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self._pid = None
+        self._path = None
+
+    def ensure_started(self):
+        """Start the flush thread once per process (threads do not survive fork)."""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        os.makedirs(self.directory, exist_ok=True)
+        # pid + process start time, so a reused pid never overwrites (or
+        # passes for) an exited worker
+        start = _start_time(self._pid) or str(int(time.time() * 1000))
+        self._path = os.path.join(self.directory, f"{self._pid}-{start}.json")
+        threading.Thread(target=self._run, name="metrics-flush", daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Could not write metrics snapshot")
+
+    def flush(self):
+        self.ensure_started()
+        snapshot = {"requests": request_latency.snapshot(), "samples": _process_samples()}
+        tmp = f"{self._path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, self._path)
+
+    @staticmethod
+    def _alive(pid, start):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        current = _start_time(pid)
+        return current is None or current == start
+
+    def collect(self):
+        """Merged (histograms, counters, gauges) across every worker's snapshot."""
+        histograms, counters, gauges = {}, {}, {}
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            pid, start = name[:-len(".json")].split("-", 1)
+            alive = self._alive(int(pid), start)
+            for endpoint, method, status, counts, total in snapshot["requests"]:
+                merged = histograms.setdefault((endpoint, method, status), [[0] * len(counts), 0.0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+            for metric, labels, value in snapshot["samples"]:
+                key = (metric, tuple(sorted(labels.items())))
+                if HELP[metric][0] == "counter":
+                    counters[key] = counters.get(key, 0) + value
+                elif alive:
+                    if metric == "aiims_db_replica_lag_seconds":
+                        gauges[key] = max(gauges.get(key, 0), value)
+                    else:
+                        gauges[key] = gauges.get(key, 0) + value
+        return histograms, counters, gauges
+
+
+store = MetricsStore()
+
+
+def observe_request(endpoint, method, status, seconds):
+    """Record one request; called from after_request, so kept to a locked increment."""
+    store.ensure_started()
+    request_latency.observe(endpoint, method, status, seconds)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render():
+    """All workers' metrics in the Prometheus text exposition format (0.0.4)."""
+    store.flush()
+    histograms, counters, gauges = store.collect()
+
+    hits = sum(v for (m, labels), v in counters.items()
+               if m == "aiims_cache_requests_total" and dict(labels)["result"] != "miss")
+    lookups = sum(v for (m, _), v in counters.items() if m == "aiims_cache_requests_total")
+    gauges[("aiims_cache_hit_ratio", ())] = hits / lookups if lookups else 0.0
+
+    lines = []
+    name = "aiims_http_request_duration_seconds"
+    lines += [f"# HELP {name} {HELP[name][1]}", f"# TYPE {name} histogram"]
+    for (endpoint, method, status), (counts, total) in sorted(histograms.items()):
+        base = [("endpoint", endpoint), ("method", method), ("status", status)]
+        cumulative = 0
+        for le, count in zip([*LATENCY_BUCKETS, "+Inf"], counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(base + [('le', le)])} {cumulative}")
+        lines.append(f"{name}_sum{_labels(base)} {total}")
+        lines.append(f"{name}_count{_labels(base)} {cumulative}")
+
+    series = {}
+    for (metric, labels), value in [*counters.items(), *gauges.items()]:
+        series.setdefault(metric, []).append((labels, value))
+    for metric in sorted(series):
+        kind, help_text = HELP[metric]
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        for labels, value in sorted(series[metric]):
+            lines.append(f"{metric}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,245 @@
+import os
+import time
+import queue
+import logging
+import threading
+from collections import defaultdict, OrderedDict
+
+from flask import request
+
+logger = logging.getLogger('aiims.realtime')
+
+REALTIME_COALESCE_MS = float(os.environ.get("REALTIME_COALESCE_MS", "250"))
+REALTIME_QUEUE_SIZE = int(os.environ.get("REALTIME_QUEUE_SIZE", "1000"))
+
+# Clients join one room per camp they are looking at, plus one per student
+# whose records are open, by emitting
+#   socket.emit('subscribe', {event_id: 7, student_id: 42})
+# Server emits target those rooms, so a save at one camp only reaches that
+# camp's devices.
+
+
+def event_room(event_id):
+    return f"event:{int(event_id)}"
+
+
+def student_room(student_id):
+    return f"student:{int(student_id)}"
+
+
+class SubscriptionRegistry:
+    """Connected clients (sids) of this worker and the rooms each has joined."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connected = set()
+        self._rooms = defaultdict(set)      # sid -> rooms
+        self._members = defaultdict(int)    # room -> subscriber count
+
+    def connect(self, sid):
+        with self._lock:
+            self._connected.add(sid)
+
+    def disconnect(self, sid):
+        self.remove(sid)
+        with self._lock:
+            self._connected.discard(sid)
+
+    def add(self, sid, rooms):
+        with self._lock:
+            new = set(rooms) - self._rooms[sid]
+            self._rooms[sid] |= new
+            for room in new:
+                self._members[room] += 1
+        return new
+
+    def remove(self, sid, rooms=None):
+        """Forget ``rooms`` for ``sid`` (all of them when None); returns the rooms removed."""
+        with self._lock:
+            current = self._rooms.get(sid, set())
+            gone = current if rooms is None else current & set(rooms)
+            for room in gone:
+                self._members[room] -= 1
+                if self._members[room] <= 0:
+                    del self._members[room]
+            remaining = current - gone
+            if remaining:
+                self._rooms[sid] = remaining
+            else:
+                self._rooms.pop(sid, None)
+        return gone
+
+    def rooms_for(self, sid):
+        with self._lock:
+            return set(self._rooms.get(sid, ()))
+
+    def stats(self):
+        with self._lock:
+            return {"connections": len(self._connected), "clients": len(self._rooms),
+                    "rooms": len(self._members), "subscriptions": sum(self._members.values())}
+
+
+registry = SubscriptionRegistry()
+
+
+def _requested_rooms(data):
+    data = data if isinstance(data, dict) else {}
+    rooms = []
+    try:
+        if data.get("event_id") is not None:
+            rooms.append(event_room(data["event_id"]))
+        if data.get("student_id") is not None:
+            rooms.append(student_room(data["student_id"]))
+    except (TypeError, ValueError):
+        return None
+    return rooms
+
+
+class RealtimeEmitter:
+    """Bounded in-process queue of outgoing messages, drained by a daemon thread.
+
+    Request handlers only enqueue, so their latency never depends on the
+    Socket.IO message queue (Redis). Messages with the same name, rooms and
+    ``key`` that arrive within ``window`` seconds are merged into one: later
+    payload fields win, ``accumulate`` fields are summed and ``coalesced``
+    counts the merged messages. When the queue is full, new messages are
+    dropped and counted rather than blocking the request.
+    """
+
+    def __init__(self, socketio, window=REALTIME_COALESCE_MS / 1000.0, maxsize=REALTIME_QUEUE_SIZE):
+        self.socketio = socketio
+        self.window = window
+        self._queue = queue.Queue(maxsize)
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.queued = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.sent = 0
+        self.errors = 0
+
+    def _ensure_started(self):
+        # The drain thread is started in the process that emits (after fork).
+        # A plain thread, not socketio.start_background_task: with
+        # async_mode='eventlet' under sync gunicorn workers (no monkey
+        # patching) a green thread is never scheduled.
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = queue.Queue(self._queue.maxsize)
+                threading.Thread(target=self._run, name="realtime-emitter", daemon=True).start()
+
+    def put(self, name, payload, rooms, key=None, accumulate=()):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((name, tuple(rooms), key, dict(payload), tuple(accumulate)))
+            self.queued += 1
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Realtime queue full; dropped {name} for {rooms}")
+
+    def _merge(self, pending, item):
+        name, rooms, key, payload, accumulate = item
+        slot = (name, rooms, key)
+        if slot not in pending:
+            pending[slot] = payload
+            return
+        merged = {**pending[slot], **payload}
+        for field in accumulate:
+            merged[field] = pending[slot].get(field, 0) + payload.get(field, 0)
+        merged["coalesced"] = pending[slot].get("coalesced", 1) + 1
+        pending[slot] = merged
+        self.coalesced += 1
+
+    def _run(self):
+        q = self._queue
+        while True:
+            pending = OrderedDict()
+            self._merge(pending, q.get())
+            deadline = time.monotonic() + self.window
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    self._merge(pending, q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            for (name, rooms, _), payload in pending.items():
+                try:
+                    self.socketio.emit(name, payload, to=list(rooms))
+                    self.sent += 1
+                except Exception:
+                    self.errors += 1
+                    logger.exception(f"Realtime emit of {name} failed")
+
+    def stats(self):
+        return {"queued": self.queued, "dropped": self.dropped, "coalesced": self.coalesced,
+                "sent": self.sent, "errors": self.errors, "depth": self._queue.qsize()}
+
+
+_emitter = None
+
+
+def register_realtime(socketio):
+    """Install the connection and subscription handlers and the emitter for ``socketio``."""
+    from flask_socketio import join_room, leave_room
+
+    global _emitter
+    _emitter = RealtimeEmitter(socketio)
+
+    @socketio.on("subscribe")
+    def handle_subscribe(data):
+        rooms = _requested_rooms(data)
+        if rooms is None:
+            return {"success": False, "message": "event_id and student_id must be integers"}
+        for room in registry.add(request.sid, rooms):
+            join_room(room)
+        return {"success": True, "rooms": sorted(registry.rooms_for(request.sid))}
+
+    @socketio.on("unsubscribe")
+    def handle_unsubscribe(data):
+        rooms = _requested_rooms(data)
+        if rooms is None:
+            return {"success": False, "message": "event_id and student_id must be integers"}
+        for room in registry.remove(request.sid, rooms):
+            leave_room(room)
+        return {"success": True, "rooms": sorted(registry.rooms_for(request.sid))}
+
+    @socketio.on("connect")
+    def handle_connect():
+        registry.connect(request.sid)
+        logger.info("[socket.io] Client connected")
+
+    @socketio.on("disconnect")
+    def handle_disconnect():
+        # Socket.IO leaves the rooms itself; only the registry needs clearing.
+        registry.disconnect(request.sid)
+        logger.info("[socket.io] Client disconnected")
+
+
+def emit(name, payload, event_id=None, student_id=None, key=None, accumulate=()):
+    """Queue ``name`` for the rooms of ``event_id`` and/or ``student_id``.
+
+    Returns immediately; see RealtimeEmitter for coalescing (``key``,
+    ``accumulate``). A client subscribed to both rooms receives the message
+    once. Does nothing when Socket.IO is not installed or no room is given.
+    """
+    rooms = []
+    if event_id is not None:
+        rooms.append(event_room(event_id))
+    if student_id is not None:
+        rooms.append(student_room(student_id))
+    if _emitter is None or not rooms:
+        return
+    _emitter.put(name, payload, rooms, key=key, accumulate=accumulate)
+
+
+def realtime_stats():
+    """Subscription and emitter counters for this worker."""
+    stats = registry.stats()
+    if _emitter is not None:
+        stats["emitter"] = _emitter.stats()
+    return stats
@@ -0,0 +1,41 @@
+import logging
+
+logger = logging.getLogger('aiims.student_identity')
+
+# Links Students rows to their canonical Student_Identity (one per person and
+# school; see student_identity_key() in the add_student_identity migration).
+# Two statements so the UPDATE's fresh snapshot sees identities a concurrent
+# writer committed while our INSERT waited on the unique key.
+STUDENT_IDENTITY_ASSIGN_SQL = """
+    INSERT INTO Student_Identity (school_id, identity_key, created_at)
+    SELECT DISTINCT e.school_id,
+           student_identity_key(s.student_id, e.school_id, s.registration_number,
+                                s.name, s.dob, s.father_name),
+           to_char(now() AT TIME ZONE 'utc', 'YYYY-MM-DD"T"HH24:MI:SS')
+    FROM Students s JOIN Events e ON e.event_id = s.event_id
+    WHERE s.student_id = ANY(%(student_ids)s)
+    ON CONFLICT (school_id, identity_key) DO NOTHING;
+
+    UPDATE Students s SET identity_id = si.identity_id
+    FROM Events e, Student_Identity si
+    WHERE e.event_id = s.event_id
+      AND si.school_id IS NOT DISTINCT FROM e.school_id
+      AND si.identity_key = student_identity_key(
+            s.student_id, e.school_id, s.registration_number,
+            s.name, s.dob, s.father_name)
+      AND s.student_id = ANY(%(student_ids)s)
+      AND s.identity_id IS DISTINCT FROM si.identity_id
+"""
+
+# Student fields that feed the identity key; editing any of them re-links.
+IDENTITY_FIELDS = ("registration_number", "name", "dob", "father_name")
+
+
+def assign_student_identities(cur, student_ids):
+    """Create or look up the Student_Identity of each student and link it.
+
+    Runs on the caller's cursor, after the insert/update and before its commit.
+    """
+    if not student_ids:
+        return
+    cur.execute(STUDENT_IDENTITY_ASSIGN_SQL, {"student_ids": list(student_ids)})
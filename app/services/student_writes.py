@@ -0,0 +1,199 @@
+import json
+import random
+import string
+import logging
+from datetime import datetime
+
+from app.services.event_stats import refresh_student_counters, STUDENT_COUNTERS_REFRESH_SQL
+from app.services.exam_summary import EXAM_SUMMARY_REFRESH_SQL
+from app.services.student_identity import assign_student_identities, IDENTITY_FIELDS
+from app.services.user_roles import get_user_role
+
+logger = logging.getLogger('aiims.student_writes')
+
+# Student, general-info and exam writes shared by the single-item endpoints
+# and the /api/sync batch endpoint. Each runs on the caller's RealDictCursor
+# and leaves the commit (and audit logging / realtime emits) to the caller.
+
+STUDENT_CREATE_FIELDS = (
+    "event_id", "name", "age", "dob", "gender", "student_class", "section",
+    "blood_group", "father_name", "phone", "qr_code_hash", "added_by", "status",
+    "mother_name", "mother_occupation", "father_occupation", "address", "pincode",
+    "registration_number",
+)
+
+STUDENT_UPDATE_FIELDS = (
+    "name", "age", "dob", "gender", "student_class", "section",
+    "blood_group", "father_name", "phone", "mother_name",
+    "mother_occupation", "father_occupation", "address", "pincode",
+    "registration_number",
+)
+
+# Upsert the exam (unless the stored one is newer), write its audit row,
+# refresh the student's exam summary and read back the record -- sent as
+# one batch, with the event counters refreshed in between unless deferred.
+_SAVE_EXAM_WRITE_SQL = """
+    WITH saved AS (
+        INSERT INTO Health_Records
+            (student_id, event_id, doctor_id, category, json_data, timestamp)
+        VALUES (%(student_id)s, %(event_id)s, %(doctor_id)s, %(category)s, %(json_data)s, %(ts)s)
+        ON CONFLICT (student_id, event_id, category) DO UPDATE SET
+            json_data = EXCLUDED.json_data,
+            timestamp = EXCLUDED.timestamp,
+            doctor_id = EXCLUDED.doctor_id
+        WHERE Health_Records.timestamp IS NULL OR Health_Records.timestamp <= EXCLUDED.timestamp
+        RETURNING record_id
+    )
+    INSERT INTO Audit_Logs (timestamp, user_id, action, details)
+    SELECT %(ts)s, %(doctor_id)s, 'SAVE_EXAM', %(details)s FROM saved;
+""" + EXAM_SUMMARY_REFRESH_SQL
+
+_SAVE_EXAM_RESULT_SQL = """
+    SELECT record_id, timestamp FROM Health_Records
+    WHERE student_id = %(student_id)s AND event_id = %(event_id)s AND category = %(category)s;
+"""
+
+SAVE_EXAM_SQL = (_SAVE_EXAM_WRITE_SQL + ";\n" + STUDENT_COUNTERS_REFRESH_SQL + ";\n"
+                 + _SAVE_EXAM_RESULT_SQL)
+
+SAVE_EXAM_DEFERRED_SQL = _SAVE_EXAM_WRITE_SQL + ";\n" + _SAVE_EXAM_RESULT_SQL
+
+
+class StaleExamError(Exception):
+    """The stored exam is newer than the one being saved, which was not applied."""
+
+    def __init__(self, record_id, stored_timestamp):
+        super().__init__(f"A newer exam (saved {stored_timestamp}) is already stored")
+        self.record_id = record_id
+        self.stored_timestamp = stored_timestamp
+
+
+def create_student(cur, data, refresh_counters=True):
+    """Insert one student from request ``data``; returns the new Students row.
+
+    Raises ValueError when the name is missing. ``refresh_counters=False``
+    leaves the event counters to a later refresh_student_counters call.
+    """
+    name = data.get("name", "").strip()
+    if not name:
+        raise ValueError("Name is required")
+    user_id = data.get("user_id", "")
+    values = {
+        "event_id": data.get("event_id", 1),
+        "name": name,
+        "age": data.get("age"),
+        "dob": data.get("dob", ""),
+        "gender": data.get("gender", ""),
+        "student_class": data.get("student_class", ""),
+        "section": data.get("section", ""),
+        "blood_group": data.get("blood_group", ""),
+        "father_name": data.get("father_name", ""),
+        "phone": data.get("phone", ""),
+        "qr_code_hash": "".join(random.choices(string.ascii_lowercase + string.digits, k=13)),
+        "added_by": data.get("added_by", user_id or ""),
+        "status": data.get("status", "Pending Examination"),
+        "mother_name": data.get("mother_name", ""),
+        "mother_occupation": data.get("mother_occupation", ""),
+        "father_occupation": data.get("father_occupation", ""),
+        "address": data.get("address", ""),
+        "pincode": data.get("pincode", ""),
+        "registration_number": data.get("registration_number", "").strip(),
+    }
+    cur.execute(
+        f"INSERT INTO Students ({', '.join(STUDENT_CREATE_FIELDS)}) "
+        f"VALUES ({', '.join(['%s'] * len(STUDENT_CREATE_FIELDS))}) RETURNING student_id",
+        [values[f] for f in STUDENT_CREATE_FIELDS],
+    )
+    new_id = cur.fetchone()["student_id"]
+    assign_student_identities(cur, [new_id])
+    if refresh_counters:
+        refresh_student_counters(cur, [new_id])
+    cur.execute("SELECT * FROM Students WHERE student_id = %s", (new_id,))
+    return cur.fetchone()
+
+
+def update_student(cur, student_id, data, refresh_counters=True):
+    """Apply the demographic fields present in ``data``; returns the updated row.
+
+    Raises ValueError when ``data`` holds none of STUDENT_UPDATE_FIELDS.
+    """
+    fields = [f for f in STUDENT_UPDATE_FIELDS if f in data]
+    if not fields:
+        raise ValueError("No fields")
+    cur.execute(
+        f"UPDATE Students SET {', '.join(f'{f} = %s' for f in fields)} WHERE student_id = %s",
+        [data[f] for f in fields] + [student_id],
+    )
+    if any(field in data for field in IDENTITY_FIELDS):
+        assign_student_identities(cur, [student_id])
+    if refresh_counters:
+        refresh_student_counters(cur, [student_id])
+    cur.execute("SELECT * FROM Students WHERE student_id = %s", (student_id,))
+    return cur.fetchone()
+
+
+def update_student_status(cur, student_id, status, refresh_counters=True):
+    cur.execute("UPDATE Students SET status = %s WHERE student_id = %s", (status, student_id))
+    if refresh_counters:
+        refresh_student_counters(cur, [student_id])
+
+
+def upsert_general_info(cur, student_id, data):
+    """Insert or update the student's vitals + symptoms for ``data['event_id']``."""
+    event_id = data.get("event_id", 1)
+    height = data.get("height", "")
+    weight = data.get("weight", "")
+    bmi = data.get("bmi", "")
+    symptoms_json = json.dumps(data.get("symptoms", []))
+    filled_by = data.get("filled_by", "")
+    ts = datetime.utcnow().isoformat()
+
+    cur.execute(
+        "SELECT id FROM Student_General_Info "
+        "WHERE student_id = %s AND event_id = %s",
+        (student_id, event_id),
+    )
+    existing = cur.fetchone()
+
+    if existing:
+        cur.execute(
+            "UPDATE Student_General_Info "
+            "SET height=%s, weight=%s, bmi=%s, symptoms_json=%s, filled_by=%s, updated_at=%s "
+            "WHERE id = %s",
+            (height, weight, bmi, symptoms_json, filled_by, ts, existing["id"]),
+        )
+    else:
+        cur.execute(
+            "INSERT INTO Student_General_Info "
+            "(student_id, event_id, height, weight, bmi, symptoms_json, filled_by, updated_at) "
+            "VALUES (%s,%s,%s,%s,%s,%s,%s,%s)",
+            (student_id, event_id, height, weight, bmi, symptoms_json, filled_by, ts),
+        )
+
+
+def check_exam_access(doctor_id, category):
+    """Raise PermissionError unless ``doctor_id``'s role may save ``category`` exams."""
+    if category != "FullExam":
+        user_role = get_user_role(doctor_id)
+        if user_role and user_role != category and user_role != "Admin":
+            raise PermissionError(
+                f"Access denied: your role ({user_role}) cannot save {category} records."
+            )
+
+
+def save_exam(cur, student_id, event_id, doctor_id, category, json_str, ts, refresh_counters=True):
+    """Upsert one specialist exam (with audit row and counters); returns its record_id.
+
+    Raises StaleExamError, leaving the stored exam untouched, when that exam
+    is newer than ``ts`` (e.g. a late offline replay).
+    """
+    cur.execute(SAVE_EXAM_SQL if refresh_counters else SAVE_EXAM_DEFERRED_SQL, {
+        "student_id": student_id, "event_id": event_id,
+        "doctor_id": doctor_id, "category": category,
+        "json_data": json_str, "ts": ts, "student_ids": [student_id],
+        "details": f"Saved {category} exam for student {student_id}",
+    })
+    row = cur.fetchone()
+    if row["timestamp"] != ts:
+        raise StaleExamError(row["record_id"], row["timestamp"])
+    return row["record_id"]
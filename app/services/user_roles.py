@@ -0,0 +1,40 @@
+import os
+import time
+import logging
+import threading
+
+from app.db import get_db_cursor
+
+logger = logging.getLogger('aiims.user_roles')
+
+ROLE_CACHE_TTL = float(os.environ.get("ROLE_CACHE_TTL", "60"))
+
+_lock = threading.Lock()
+_roles = {}  # username -> (role or None, expires_at)
+
+
+def get_user_role(username: str):
+    """Return the user's role, served from a short-TTL in-process cache.
+
+    Unknown users are cached as None so repeated lookups stay cheap too.
+    """
+    now = time.monotonic()
+    with _lock:
+        hit = _roles.get(username)
+    if hit and hit[1] > now:
+        return hit[0]
+
+    with get_db_cursor() as cur:
+        cur.execute("SELECT role FROM Users WHERE username = %s", (username,))
+        row = cur.fetchone()
+    role = row["role"] if row else None
+
+    with _lock:
+        _roles[username] = (role, now + ROLE_CACHE_TTL)
+    return role
+
+
+def invalidate_user_role(username: str):
+    """Drop a cached role after the user is renamed or deleted."""
+    with _lock:
+        _roles.pop(username, None)
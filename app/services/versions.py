@@ -0,0 +1,93 @@
+import hashlib
+import logging
+from datetime import date
+from functools import wraps
+
+from flask import current_app, g, request
+
+from app.db import get_db_cursor
+
+logger = logging.getLogger('aiims.versions')
+
+# Resource_Versions holds one monotonically increasing counter per resource:
+#   'events'         -- the Events rows themselves
+#   'event:<id>'     -- anything shown in one event's stats/listing counts
+#   'schools', 'camp_requests'
+# Write paths bump the counters in their own transaction; conditional GETs
+# hash them into a strong ETag.
+
+_BUMP_SQL = """
+    INSERT INTO Resource_Versions (resource, version)
+    SELECT r, 1 FROM ({resources}) b(r)
+    ORDER BY r
+    ON CONFLICT (resource) DO UPDATE SET version = Resource_Versions.version + 1
+"""
+
+
+def event_version_bump_sql(events_sql):
+    """Bump 'event:<id>' for every event id selected by ``events_sql``.
+
+    Appended to the counter refresh batches so student, exam and volunteer
+    writes are covered without extra round trips.
+    """
+    return _BUMP_SQL.format(
+        resources=f"SELECT DISTINCT 'event:' || ev.event_id FROM ({events_sql}) ev"
+    )
+
+
+def bump_versions(cur, *resources):
+    """Bump the given resource counters on the caller's cursor (before its commit)."""
+    if not resources:
+        return
+    cur.execute(_BUMP_SQL.format(resources="SELECT unnest(%s::text[])"), (list(resources),))
+
+
+def current_version(resources):
+    """Combined version of ``resources``; a trailing '*' matches a prefix."""
+    exact = [r for r in resources if not r.endswith("*")]
+    prefixes = [r[:-1].replace("%", r"\%") + "%" for r in resources if r.endswith("*")]
+    with get_db_cursor() as cur:
+        cur.execute(
+            "SELECT COALESCE(SUM(version), 0) AS version, COUNT(*) AS n FROM Resource_Versions "
+            "WHERE resource = ANY(%s) OR resource LIKE ANY(%s)",
+            (exact, prefixes),
+        )
+        row = cur.fetchone()
+    return f"{row['version']}.{row['n']}"
+
+
+def versioned(*resources, daily=False):
+    """Serve the view with a strong ETag derived from resource versions.
+
+    ``resources`` may reference view kwargs, e.g. 'event:{event_id}'. A
+    matching If-None-Match returns 304 before the view runs. ``daily`` mixes
+    in today's date for responses that depend on CURRENT_DATE.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                version = current_version([r.format(**kwargs) for r in resources])
+            except Exception:
+                logger.exception("Resource version lookup failed; serving without ETag")
+                return view(*args, **kwargs)
+
+            # Lets a @cached view below key its body on this version too.
+            g.resource_version = version
+            basis = f"{request.full_path}|{version}"
+            if daily:
+                basis += f"|{date.today().isoformat()}"
+            etag = hashlib.sha1(basis.encode()).hexdigest()
+
+            if etag in request.if_none_match:
+                response = current_app.response_class(status=304)
+            else:
+                response = view(*args, **kwargs)
+                if isinstance(response, tuple):
+                    return response
+            if response.status_code in (200, 304):
+                response.set_etag(etag)
+                response.headers["Cache-Control"] = "no-cache"
+            return response
+        return wrapper
+    return decorator
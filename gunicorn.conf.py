@@ -0,0 +1,11 @@
+# Loaded by gunicorn from the working directory; command-line flags still win.
+
+
+def on_starting(server):
+    """Drop metrics snapshots of a previous run before any worker is forked.
+
+    METRICS_DIR may outlive the container's processes (e.g. a bind-mounted
+    /tmp across `docker restart`), and their pids are reused.
+    """
+    from app.services.metrics import clear_snapshots
+    clear_snapshots()
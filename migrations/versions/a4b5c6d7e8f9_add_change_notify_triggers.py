@@ -0,0 +1,95 @@
+"""add_change_notify_triggers
+
+Revision ID: a4b5c6d7e8f9
+Revises: f3a4b5c6d7e8
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4b5c6d7e8f9'
+down_revision: Union[str, Sequence[str], None] = 'f3a4b5c6d7e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (table, column identifying the changed row)
+TABLES = [
+    ("Students", "student_id"),
+    ("Health_Records", "student_id"),
+    ("Student_General_Info", "student_id"),
+    ("Event_Volunteers", "username"),
+    ("Events", "event_id"),
+]
+
+
+def upgrade() -> None:
+    """NOTIFY 'aiims_changes' with one compact JSON payload per statement and event.
+
+    Payload: {"table", "op", "event_id", "count", "ids"} with at most 100 ids,
+    well under the 8000-byte NOTIFY limit. Statement-level triggers keep a
+    bulk insert to one notification per event.
+    """
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_change() RETURNS trigger AS $$
+        DECLARE
+            id_col TEXT := TG_ARGV[0];
+            src TEXT;
+            r RECORD;
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                src := format('SELECT event_id, %I::text AS id FROM new_rows', id_col);
+            ELSIF TG_OP = 'DELETE' THEN
+                src := format('SELECT event_id, %I::text AS id FROM old_rows', id_col);
+            ELSE
+                -- Both sides, so a row moved to another event notifies both events
+                src := format('SELECT event_id, %I::text AS id FROM new_rows '
+                              'UNION SELECT event_id, %I::text AS id FROM old_rows', id_col, id_col);
+            END IF;
+            FOR r IN EXECUTE
+                'SELECT event_id, COUNT(*) AS n, (array_agg(id ORDER BY id))[1:100] AS ids '
+                'FROM (' || src || ') c GROUP BY event_id'
+            LOOP
+                PERFORM pg_notify('aiims_changes', json_build_object(
+                    'table', lower(TG_TABLE_NAME), 'op', TG_OP,
+                    'event_id', r.event_id, 'count', r.n, 'ids', r.ids)::text);
+            END LOOP;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    for table, id_col in TABLES:
+        name = table.lower()
+        op.execute(f"""
+            DROP TRIGGER IF EXISTS {name}_notify_insert ON {table};
+            CREATE TRIGGER {name}_notify_insert AFTER INSERT ON {table}
+                REFERENCING NEW TABLE AS new_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION notify_change('{id_col}');
+
+            DROP TRIGGER IF EXISTS {name}_notify_update ON {table};
+            CREATE TRIGGER {name}_notify_update AFTER UPDATE ON {table}
+                REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION notify_change('{id_col}');
+
+            DROP TRIGGER IF EXISTS {name}_notify_delete ON {table};
+            CREATE TRIGGER {name}_notify_delete AFTER DELETE ON {table}
+                REFERENCING OLD TABLE AS old_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION notify_change('{id_col}');
+        """)
+
+
+def downgrade() -> None:
+    """Drop the change notification triggers."""
+    for table, _ in TABLES:
+        name = table.lower()
+        op.execute(f"""
+            DROP TRIGGER IF EXISTS {name}_notify_insert ON {table};
+            DROP TRIGGER IF EXISTS {name}_notify_update ON {table};
+            DROP TRIGGER IF EXISTS {name}_notify_delete ON {table};
+        """)
+    op.execute("DROP FUNCTION IF EXISTS notify_change();")
@@ -0,0 +1,115 @@
+"""convert_json_columns_to_jsonb
+
+Revision ID: a8b9c0d1e2f3
+Revises: f7a8b9c0d1e2
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8b9c0d1e2f3'
+down_revision: Union[str, Sequence[str], None] = 'f7a8b9c0d1e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 5000
+
+# (table, primary key, TEXT column, JSONB default)
+COLUMNS = [
+    ("Health_Records", "record_id", "json_data", None),
+    ("Student_General_Info", "id", "symptoms_json", "'[]'::jsonb"),
+]
+
+
+def _to_jsonb(expr):
+    # Unparsable legacy text is kept as a JSON string rather than dropped.
+    return f"(CASE WHEN {expr} IS JSON THEN {expr}::jsonb ELSE to_jsonb({expr}) END)"
+
+
+def _convert_column(table, pk, col, default):
+    tmp = f"{col}_jsonb"
+    func = f"sync_{table.lower()}_{col}_jsonb"
+
+    # Shadow column kept in sync by a trigger while existing rows are backfilled.
+    op.execute(f"""
+        ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {tmp} JSONB;
+
+        CREATE OR REPLACE FUNCTION {func}() RETURNS trigger AS $$
+        BEGIN
+            NEW.{tmp} := {_to_jsonb('NEW.' + col)};
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS {func} ON {table};
+        CREATE TRIGGER {func} BEFORE INSERT OR UPDATE OF {col} ON {table}
+            FOR EACH ROW EXECUTE FUNCTION {func}();
+    """)
+
+    # Backfill in committed batches so a live camp is never blocked for long.
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        while True:
+            result = bind.execute(sa.text(f"""
+                UPDATE {table} SET {tmp} = {_to_jsonb(col)}
+                WHERE {pk} IN (
+                    SELECT {pk} FROM {table}
+                    WHERE {tmp} IS NULL AND {col} IS NOT NULL
+                    LIMIT :batch
+                )
+            """), {"batch": BATCH_SIZE})
+            if result.rowcount == 0:
+                break
+
+    op.execute(f"""
+        LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE;
+        UPDATE {table} SET {tmp} = {_to_jsonb(col)} WHERE {tmp} IS NULL AND {col} IS NOT NULL;
+        DROP TRIGGER IF EXISTS {func} ON {table};
+        DROP FUNCTION IF EXISTS {func}();
+        ALTER TABLE {table} DROP COLUMN {col};
+        ALTER TABLE {table} RENAME COLUMN {tmp} TO {col};
+    """)
+    if default:
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN {col} SET DEFAULT {default}")
+
+
+def upgrade() -> None:
+    """Convert Health_Records.json_data and Student_General_Info.symptoms_json to JSONB.
+
+    Also adds Health_Records.assessment_status, generated from the record's
+    status/assessment key, so filters and aggregates stay in Postgres.
+    """
+    for table, pk, col, default in COLUMNS:
+        _convert_column(table, pk, col, default)
+
+    op.execute("""
+        ALTER TABLE Health_Records ADD COLUMN IF NOT EXISTS assessment_status TEXT
+            GENERATED ALWAYS AS (
+                CASE WHEN jsonb_typeof(json_data) = 'object' THEN
+                     COALESCE(NULLIF(json_data ->> 'status', ''), json_data ->> 'assessment', '')
+                ELSE '' END
+            ) STORED;
+    """)
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_health_records_event_status "
+            "ON Health_Records(event_id, assessment_status)"
+        )
+
+
+def downgrade() -> None:
+    """Convert the JSONB columns back to TEXT."""
+    op.execute("""
+        DROP INDEX IF EXISTS idx_health_records_event_status;
+        ALTER TABLE Health_Records DROP COLUMN IF EXISTS assessment_status;
+        ALTER TABLE Health_Records ALTER COLUMN json_data TYPE TEXT USING json_data::text;
+        ALTER TABLE Student_General_Info ALTER COLUMN symptoms_json DROP DEFAULT;
+        ALTER TABLE Student_General_Info ALTER COLUMN symptoms_json TYPE TEXT USING symptoms_json::text;
+        ALTER TABLE Student_General_Info ALTER COLUMN symptoms_json SET DEFAULT '[]';
+    """)
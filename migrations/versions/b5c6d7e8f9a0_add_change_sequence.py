@@ -0,0 +1,115 @@
+"""add_change_sequence
+
+Revision ID: b5c6d7e8f9a0
+Revises: a4b5c6d7e8f9
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5c6d7e8f9a0'
+down_revision: Union[str, Sequence[str], None] = 'a4b5c6d7e8f9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (table, tombstone key columns besides student_id)
+TABLES = [
+    ("Students", None),
+    ("Student_General_Info", None),
+    ("Health_Records", "category"),
+]
+
+
+def upgrade() -> None:
+    """Stamp student, general-info and exam rows with the writing transaction id.
+
+    change_seq is pg_current_xact_id() (64-bit, never wraps), so it grows
+    monotonically and the change feed can derive a cursor that never skips a
+    transaction still in flight. Deletes leave a row in Change_Tombstones.
+    Existing rows keep change_seq 0 and are only sent by a full sync.
+    """
+    op.execute("""
+        CREATE OR REPLACE FUNCTION stamp_change_seq() RETURNS trigger AS $$
+        BEGIN
+            NEW.change_seq := pg_current_xact_id()::text::bigint;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE TABLE IF NOT EXISTS Change_Tombstones (
+            change_seq BIGINT NOT NULL,
+            table_name TEXT NOT NULL,
+            event_id INTEGER,
+            student_id INTEGER,
+            category TEXT
+        );
+
+        CREATE OR REPLACE FUNCTION record_tombstone() RETURNS trigger AS $$
+        BEGIN
+            -- Separate statements: only Health_Records has a category column
+            IF TG_ARGV[0] = 'category' THEN
+                INSERT INTO Change_Tombstones (change_seq, table_name, event_id, student_id, category)
+                SELECT pg_current_xact_id()::text::bigint, lower(TG_TABLE_NAME),
+                       o.event_id, o.student_id, o.category
+                FROM old_rows o;
+            ELSE
+                INSERT INTO Change_Tombstones (change_seq, table_name, event_id, student_id)
+                SELECT pg_current_xact_id()::text::bigint, lower(TG_TABLE_NAME),
+                       o.event_id, o.student_id
+                FROM old_rows o;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    for table, key in TABLES:
+        name = table.lower()
+        # A constant default is metadata-only: no table rewrite.
+        op.execute(f"""
+            ALTER TABLE {table} ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT 0;
+
+            DROP TRIGGER IF EXISTS {name}_stamp_change_seq ON {table};
+            CREATE TRIGGER {name}_stamp_change_seq BEFORE INSERT OR UPDATE ON {table}
+                FOR EACH ROW EXECUTE FUNCTION stamp_change_seq();
+
+            DROP TRIGGER IF EXISTS {name}_tombstone ON {table};
+            CREATE TRIGGER {name}_tombstone AFTER DELETE ON {table}
+                REFERENCING OLD TABLE AS old_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION record_tombstone('{key or ''}');
+        """)
+
+    with op.get_context().autocommit_block():
+        for table, _ in TABLES:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_{table.lower()}_event_change_seq "
+                f"ON {table}(event_id, change_seq)"
+            )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_change_tombstones_event_seq "
+            "ON Change_Tombstones(event_id, change_seq)"
+        )
+
+
+def downgrade() -> None:
+    """Drop the change sequence columns, triggers and tombstones."""
+    with op.get_context().autocommit_block():
+        for table, _ in TABLES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS idx_{table.lower()}_event_change_seq")
+    for table, _ in TABLES:
+        name = table.lower()
+        op.execute(f"""
+            DROP TRIGGER IF EXISTS {name}_stamp_change_seq ON {table};
+            DROP TRIGGER IF EXISTS {name}_tombstone ON {table};
+            ALTER TABLE {table} DROP COLUMN IF EXISTS change_seq;
+        """)
+    op.execute("""
+        DROP TABLE IF EXISTS Change_Tombstones;
+        DROP FUNCTION IF EXISTS record_tombstone();
+        DROP FUNCTION IF EXISTS stamp_change_seq();
+    """)
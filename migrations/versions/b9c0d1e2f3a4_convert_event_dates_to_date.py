@@ -0,0 +1,142 @@
+"""convert_event_dates_to_date
+
+Revision ID: b9c0d1e2f3a4
+Revises: a8b9c0d1e2f3
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+import logging
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9c0d1e2f3a4'
+down_revision: Union[str, Sequence[str], None] = 'a8b9c0d1e2f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 1000
+
+# (table, primary key, TEXT date column)
+COLUMNS = [
+    ("Events", "event_id", "start_date"),
+    ("Events", "event_id", "end_date"),
+    ("Camp_Requests", "request_id", "preferred_date"),
+]
+
+
+def _normalize_date(raw):
+    """Frozen copy of app.helpers.normalize_date as of this revision."""
+    raw = (raw or '').strip()
+    if not raw:
+        return None
+    for sep in ('-', '/'):
+        parts = raw.split(sep)
+        if len(parts) == 3:
+            a, b, c = parts
+            if len(a) <= 2 and len(b) <= 2 and len(c) == 4:
+                try:
+                    if int(b) > 12:
+                        return f"{c}-{a.zfill(2)}-{b.zfill(2)}"
+                    return f"{c}-{b.zfill(2)}-{a.zfill(2)}"
+                except ValueError:
+                    pass
+    return raw
+
+
+def _parse(raw):
+    """DATE for ``raw``, or None when it is blank or cannot be parsed."""
+    iso = _normalize_date(raw)
+    if not iso:
+        return None
+    try:
+        return date.fromisoformat(iso)
+    except ValueError:
+        return None
+
+
+def _convert_column(bind, table, pk, col):
+    tmp = f"{col}_date"
+    # Text that is not blank but cannot be parsed is kept here, never dropped.
+    legacy = f"{col}_legacy_text"
+    op.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {tmp} DATE")
+
+    # Walk the table by primary key, normalising each batch once in Python.
+    unparsable = 0
+    last_id = 0
+    while True:
+        rows = bind.execute(sa.text(f"""
+            SELECT {pk} AS id, {col} AS raw FROM {table}
+            WHERE {pk} > :last_id ORDER BY {pk} LIMIT :batch
+        """), {"last_id": last_id, "batch": BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+        updates, failed = [], []
+        for r in rows:
+            value = _parse(r.raw)
+            if value is not None:
+                updates.append({"id": r.id, "value": value})
+            elif (r.raw or "").strip():
+                failed.append({"id": r.id, "raw": r.raw})
+                logger.warning(f"{table}.{col} of {pk}={r.id}: cannot parse {r.raw!r}; "
+                               f"kept in {legacy}")
+        if updates:
+            bind.execute(
+                sa.text(f"UPDATE {table} SET {tmp} = :value WHERE {pk} = :id"),
+                updates,
+            )
+        if failed:
+            op.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {legacy} TEXT")
+            bind.execute(
+                sa.text(f"UPDATE {table} SET {legacy} = :raw WHERE {pk} = :id"),
+                failed,
+            )
+            unparsable += len(failed)
+        last_id = rows[-1].id
+
+    if unparsable:
+        logger.warning(f"{unparsable} {table}.{col} values could not be parsed as dates; "
+                       f"they are NULL in {col} and kept verbatim in {legacy}")
+
+    op.execute(f"""
+        ALTER TABLE {table} DROP COLUMN {col};
+        ALTER TABLE {table} RENAME COLUMN {tmp} TO {col};
+    """)
+
+
+def upgrade() -> None:
+    """Convert Events.start_date/end_date and Camp_Requests.preferred_date to DATE.
+
+    Camp status is then computed in SQL, so Events gets an index on its date
+    range for the active-camp listing.
+    """
+    bind = op.get_bind()
+    # Event tables are small; hold writers off so no row escapes the backfill.
+    op.execute("LOCK TABLE Events, Camp_Requests IN SHARE ROW EXCLUSIVE MODE")
+    for table, pk, col in COLUMNS:
+        _convert_column(bind, table, pk, col)
+
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_events_dates ON Events(end_date, start_date);
+    """)
+
+
+def downgrade() -> None:
+    """Convert the DATE columns back to TEXT, restoring any unparsable originals."""
+    op.execute("DROP INDEX IF EXISTS idx_events_dates")
+    inspector = sa.inspect(op.get_bind())
+    for table, pk, col in COLUMNS:
+        legacy = f"{col}_legacy_text"
+        existing = {c["name"] for c in inspector.get_columns(table.lower())}
+        restore = f"COALESCE({col}::text, {legacy}, '')" if legacy in existing else f"COALESCE({col}::text, '')"
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN {col} TYPE TEXT USING {restore}")
+        if legacy in existing:
+            op.execute(f"ALTER TABLE {table} DROP COLUMN {legacy}")
+    op.execute("ALTER TABLE Events ALTER COLUMN end_date SET DEFAULT ''")
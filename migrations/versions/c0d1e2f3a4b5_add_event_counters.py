@@ -0,0 +1,51 @@
+"""add_event_counters
+
+Revision ID: c0d1e2f3a4b5
+Revises: b9c0d1e2f3a4
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c0d1e2f3a4b5'
+down_revision: Union[str, Sequence[str], None] = 'b9c0d1e2f3a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create Event_Counters (one row per event) and backfill it."""
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS Event_Counters (
+            event_id INTEGER PRIMARY KEY,
+            student_count INTEGER NOT NULL DEFAULT 0,
+            screened_count INTEGER NOT NULL DEFAULT 0,
+            volunteer_count INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY(event_id) REFERENCES Events(event_id)
+        );
+    """)
+
+    op.execute("""
+        INSERT INTO Event_Counters (event_id, student_count, screened_count, volunteer_count)
+        SELECT e.event_id,
+               COALESCE((SELECT SUM(esc.total_students) FROM Event_Stat_Counters esc
+                         WHERE esc.event_id = e.event_id), 0),
+               COALESCE((SELECT SUM(esc.screened) FROM Event_Stat_Counters esc
+                         WHERE esc.event_id = e.event_id), 0),
+               (SELECT COUNT(*) FROM Event_Volunteers v
+                WHERE v.event_id = e.event_id AND v.active = 1)
+        FROM Events e
+        ON CONFLICT (event_id) DO NOTHING;
+    """)
+
+
+def downgrade() -> None:
+    """Drop Event_Counters."""
+    op.execute("""
+        DROP TABLE IF EXISTS Event_Counters;
+    """)
@@ -0,0 +1,74 @@
+"""add_student_exam_summary
+
+Revision ID: c4d5e6f7a8b9
+Revises: b3c4d5e6f7g8
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d5e6f7a8b9'
+down_revision: Union[str, Sequence[str], None] = 'b3c4d5e6f7g8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create Student_Exam_Summary (one row per student + event) and backfill it."""
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS Student_Exam_Summary (
+            student_id INTEGER NOT NULL,
+            event_id INTEGER NOT NULL,
+            examined_categories TEXT DEFAULT '',
+            record_count INTEGER DEFAULT 0,
+            latest_record_id INTEGER,
+            latest_status TEXT DEFAULT '',
+            latest_timestamp TEXT,
+            PRIMARY KEY (student_id, event_id),
+            FOREIGN KEY(student_id) REFERENCES Students(student_id),
+            FOREIGN KEY(event_id) REFERENCES Events(event_id)
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_exam_summary_event_status
+            ON Student_Exam_Summary(event_id, latest_status);
+    """)
+
+    op.execute("""
+        INSERT INTO Student_Exam_Summary
+            (student_id, event_id, examined_categories, record_count,
+             latest_record_id, latest_status, latest_timestamp)
+        SELECT agg.student_id, agg.event_id, agg.examined_categories, agg.record_count,
+               latest.record_id,
+               CASE WHEN latest.json_data IS JSON OBJECT THEN
+                    COALESCE(NULLIF(latest.json_data::json ->> 'status', ''),
+                             latest.json_data::json ->> 'assessment', '')
+               ELSE '' END,
+               latest.timestamp
+        FROM (
+            SELECT student_id, event_id,
+                   STRING_AGG(DISTINCT category, ',') AS examined_categories,
+                   COUNT(*) AS record_count
+            FROM Health_Records
+            WHERE student_id IS NOT NULL AND event_id IS NOT NULL
+            GROUP BY student_id, event_id
+        ) agg
+        JOIN (
+            SELECT DISTINCT ON (student_id, event_id)
+                   student_id, event_id, record_id, json_data, timestamp
+            FROM Health_Records
+            ORDER BY student_id, event_id, timestamp DESC, record_id DESC
+        ) latest ON latest.student_id = agg.student_id AND latest.event_id = agg.event_id
+        ON CONFLICT (student_id, event_id) DO NOTHING;
+    """)
+
+
+def downgrade() -> None:
+    """Drop Student_Exam_Summary."""
+    op.execute("""
+        DROP TABLE IF EXISTS Student_Exam_Summary;
+    """)
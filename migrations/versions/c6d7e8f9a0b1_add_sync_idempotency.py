@@ -0,0 +1,44 @@
+"""add_sync_idempotency
+
+Revision ID: c6d7e8f9a0b1
+Revises: b5c6d7e8f9a0
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6d7e8f9a0b1'
+down_revision: Union[str, Sequence[str], None] = 'b5c6d7e8f9a0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create Sync_Idempotency: the stored result of every applied /api/sync mutation.
+
+    Keys are scoped to the syncing user, so one user's key never answers
+    another user's mutation.
+    """
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS Sync_Idempotency (
+            user_id TEXT NOT NULL DEFAULT '',
+            idempotency_key TEXT NOT NULL,
+            mutation_type TEXT NOT NULL,
+            result JSONB,
+            created_at TEXT NOT NULL,
+            PRIMARY KEY (user_id, idempotency_key)
+        );
+        CREATE INDEX IF NOT EXISTS idx_sync_idempotency_created_at ON Sync_Idempotency(created_at);
+    """)
+
+
+def downgrade() -> None:
+    """Drop Sync_Idempotency."""
+    op.execute("""
+        DROP TABLE IF EXISTS Sync_Idempotency;
+    """)
@@ -0,0 +1,42 @@
+"""add_students_registration_event_index
+
+Revision ID: d1e2f3a4b5c6
+Revises: c0d1e2f3a4b5
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1e2f3a4b5c6'
+down_revision: Union[str, Sequence[str], None] = 'c0d1e2f3a4b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Replace the registration_number index with (registration_number, event_id).
+
+    Serves the cross-camp previous-records lookup; the composite index still
+    covers plain registration_number lookups, so the old one is dropped.
+    """
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_students_registration_event "
+            "ON Students(registration_number, event_id)"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_students_registration_number")
+
+
+def downgrade() -> None:
+    """Restore the single-column registration_number index."""
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_students_registration_number "
+            "ON Students(registration_number)"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_students_registration_event")
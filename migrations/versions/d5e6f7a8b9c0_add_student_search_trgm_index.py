@@ -0,0 +1,47 @@
+"""add_student_search_trgm_index
+
+Revision ID: d5e6f7a8b9c0
+Revises: c4d5e6f7a8b9
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5e6f7a8b9c0'
+down_revision: Union[str, Sequence[str], None] = 'c4d5e6f7a8b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Enable pg_trgm and index the normalised student search text.
+
+    The indexed expression must match STUDENT_SEARCH_TEXT_SQL in
+    app/routes/students.py.
+    """
+    op.execute("""
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+        CREATE INDEX IF NOT EXISTS idx_students_search_trgm ON Students USING gin (
+            lower(coalesce(name, '') || ' ' || coalesce(registration_number, '') || ' ' ||
+                  coalesce(phone, '') || ' ' || coalesce(student_class, '') || ' ' ||
+                  coalesce(section, ''))
+            gin_trgm_ops
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_students_registration_number
+            ON Students(registration_number);
+    """)
+
+
+def downgrade() -> None:
+    """Drop the student search indexes (pg_trgm is left installed)."""
+    op.execute("""
+        DROP INDEX IF EXISTS idx_students_search_trgm;
+        DROP INDEX IF EXISTS idx_students_registration_number;
+    """)
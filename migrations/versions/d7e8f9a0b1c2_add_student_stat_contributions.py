@@ -0,0 +1,115 @@
+"""add_student_stat_contributions
+
+Revision ID: d7e8f9a0b1c2
+Revises: c6d7e8f9a0b1
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7e8f9a0b1c2'
+down_revision: Union[str, Sequence[str], None] = 'c6d7e8f9a0b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create Student_Stat_Contributions and the dept_counts arithmetic, and backfill it.
+
+    Each row is what one student currently adds to its Event_Stat_Counters
+    cohort, so a write can apply (new - old) to the counters instead of
+    recomputing the whole cohort.
+    """
+    op.execute("""
+        CREATE OR REPLACE FUNCTION dept_counts_add(a JSONB, b JSONB) RETURNS JSONB
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT COALESCE(jsonb_object_agg(k, jsonb_build_object('N', n, 'O', o, 'R', r)), '{}'::jsonb)
+            FROM (
+                SELECT k, SUM(n) AS n, SUM(o) AS o, SUM(r) AS r
+                FROM (
+                    SELECT key AS k, (value ->> 'N')::int AS n, (value ->> 'O')::int AS o,
+                           (value ->> 'R')::int AS r
+                    FROM jsonb_each(COALESCE(a, '{}'::jsonb))
+                    UNION ALL
+                    SELECT key, (value ->> 'N')::int, (value ->> 'O')::int, (value ->> 'R')::int
+                    FROM jsonb_each(COALESCE(b, '{}'::jsonb))
+                ) x
+                GROUP BY k
+                HAVING SUM(n) <> 0 OR SUM(o) <> 0 OR SUM(r) <> 0
+            ) y
+        $$;
+
+        CREATE OR REPLACE FUNCTION dept_counts_neg(a JSONB) RETURNS JSONB
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT COALESCE(jsonb_object_agg(key, jsonb_build_object(
+                       'N', -(value ->> 'N')::int, 'O', -(value ->> 'O')::int, 'R', -(value ->> 'R')::int
+                   )), '{}'::jsonb)
+            FROM jsonb_each(COALESCE(a, '{}'::jsonb))
+        $$;
+
+        CREATE OR REPLACE AGGREGATE dept_counts_sum(JSONB) (
+            SFUNC = dept_counts_add,
+            STYPE = JSONB,
+            INITCOND = '{}'
+        );
+
+        CREATE TABLE IF NOT EXISTS Student_Stat_Contributions (
+            student_id INTEGER PRIMARY KEY,
+            event_id INTEGER NOT NULL,
+            student_class TEXT NOT NULL DEFAULT '',
+            section TEXT NOT NULL DEFAULT '',
+            gender TEXT NOT NULL DEFAULT '',
+            absent INTEGER NOT NULL DEFAULT 0,
+            screened INTEGER NOT NULL DEFAULT 0,
+            normal INTEGER NOT NULL DEFAULT 0,
+            observation INTEGER NOT NULL DEFAULT 0,
+            referred INTEGER NOT NULL DEFAULT 0,
+            dept_counts JSONB NOT NULL DEFAULT '{}'::jsonb
+        );
+        CREATE INDEX IF NOT EXISTS idx_student_stat_contributions_event
+            ON Student_Stat_Contributions(event_id);
+    """)
+
+    op.execute("""
+        INSERT INTO Student_Stat_Contributions
+            (student_id, event_id, student_class, section, gender, absent,
+             screened, normal, observation, referred, dept_counts)
+        SELECT s.student_id, s.event_id,
+               COALESCE(s.student_class, ''), COALESCE(s.section, ''), COALESCE(s.gender, ''),
+               CASE WHEN s.status = 'Absent' THEN 1 ELSE 0 END,
+               CASE WHEN d.records > 0 THEN 1 ELSE 0 END,
+               d.normal, d.observation, d.referred, d.dept_counts
+        FROM Students s
+        CROSS JOIN LATERAL (
+            SELECT COUNT(*) AS records,
+                   COUNT(*) FILTER (WHERE hr.assessment_status = 'N') AS normal,
+                   COUNT(*) FILTER (WHERE hr.assessment_status = 'O') AS observation,
+                   COUNT(*) FILTER (WHERE hr.assessment_status = 'R') AS referred,
+                   dept_counts_sum(jsonb_build_object(
+                       COALESCE(NULLIF(hr.category, ''), 'Other'), jsonb_build_object(
+                           'N', CASE WHEN hr.assessment_status = 'N' THEN 1 ELSE 0 END,
+                           'O', CASE WHEN hr.assessment_status = 'O' THEN 1 ELSE 0 END,
+                           'R', CASE WHEN hr.assessment_status = 'R' THEN 1 ELSE 0 END
+                       )
+                   )) AS dept_counts
+            FROM Health_Records hr
+            WHERE hr.student_id = s.student_id AND hr.event_id = s.event_id
+        ) d
+        WHERE s.event_id IS NOT NULL
+        ON CONFLICT (student_id) DO NOTHING;
+    """)
+
+
+def downgrade() -> None:
+    """Drop Student_Stat_Contributions and the dept_counts functions."""
+    op.execute("""
+        DROP TABLE IF EXISTS Student_Stat_Contributions;
+        DROP AGGREGATE IF EXISTS dept_counts_sum(JSONB);
+        DROP FUNCTION IF EXISTS dept_counts_neg(JSONB);
+        DROP FUNCTION IF EXISTS dept_counts_add(JSONB, JSONB);
+    """)
@@ -0,0 +1,112 @@
+"""add_student_identity
+
+Revision ID: e2f3a4b5c6d7
+Revises: d1e2f3a4b5c6
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2f3a4b5c6d7'
+down_revision: Union[str, Sequence[str], None] = 'd1e2f3a4b5c6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    """Create Student_Identity and link every Students row to one canonical person.
+
+    A person is keyed per school by their normalised registration number or,
+    when that is blank, by name + date of birth + father's name. Students of
+    events without a school get an identity of their own.
+    """
+    op.execute("""
+        CREATE OR REPLACE FUNCTION normalize_registration_number(raw TEXT) RETURNS TEXT AS $$
+            SELECT lower(regexp_replace(COALESCE(raw, ''), '[^A-Za-z0-9]', '', 'g'))
+        $$ LANGUAGE sql IMMUTABLE;
+
+        CREATE OR REPLACE FUNCTION student_identity_key(
+            student_id INTEGER, school_id INTEGER, registration_number TEXT,
+            name TEXT, dob TEXT, father_name TEXT
+        ) RETURNS TEXT AS $$
+            SELECT CASE
+                WHEN school_id IS NULL THEN 'student:' || student_id
+                WHEN normalize_registration_number(registration_number) <> ''
+                    THEN 'reg:' || normalize_registration_number(registration_number)
+                ELSE 'name:' || lower(regexp_replace(btrim(COALESCE(name, '')), '\\s+', ' ', 'g'))
+                     || '|' || btrim(COALESCE(dob, ''))
+                     || '|' || lower(regexp_replace(btrim(COALESCE(father_name, '')), '\\s+', ' ', 'g'))
+            END
+        $$ LANGUAGE sql IMMUTABLE;
+
+        CREATE TABLE IF NOT EXISTS Student_Identity (
+            identity_id SERIAL PRIMARY KEY,
+            school_id INTEGER,
+            identity_key TEXT NOT NULL,
+            created_at TEXT,
+            UNIQUE NULLS NOT DISTINCT (school_id, identity_key)
+        );
+
+        ALTER TABLE Students ADD COLUMN IF NOT EXISTS identity_id INTEGER
+            REFERENCES Student_Identity(identity_id);
+    """)
+
+    # One-off backfill in committed batches so a live camp is never blocked for long.
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        last_id = 0
+        while True:
+            max_id = bind.execute(sa.text("""
+                SELECT MAX(student_id) FROM (
+                    SELECT student_id FROM Students WHERE student_id > :last_id
+                    ORDER BY student_id LIMIT :batch
+                ) b
+            """), {"last_id": last_id, "batch": BATCH_SIZE}).scalar()
+            if max_id is None:
+                break
+            bind.execute(sa.text("""
+                INSERT INTO Student_Identity (school_id, identity_key, created_at)
+                SELECT DISTINCT e.school_id,
+                       student_identity_key(s.student_id, e.school_id, s.registration_number,
+                                            s.name, s.dob, s.father_name),
+                       to_char(now() AT TIME ZONE 'utc', 'YYYY-MM-DD"T"HH24:MI:SS')
+                FROM Students s JOIN Events e ON e.event_id = s.event_id
+                WHERE s.student_id > :last_id AND s.student_id <= :max_id
+                ON CONFLICT (school_id, identity_key) DO NOTHING
+            """), {"last_id": last_id, "max_id": max_id})
+            bind.execute(sa.text("""
+                UPDATE Students s SET identity_id = si.identity_id
+                FROM Events e, Student_Identity si
+                WHERE e.event_id = s.event_id
+                  AND si.school_id IS NOT DISTINCT FROM e.school_id
+                  AND si.identity_key = student_identity_key(
+                        s.student_id, e.school_id, s.registration_number,
+                        s.name, s.dob, s.father_name)
+                  AND s.student_id > :last_id AND s.student_id <= :max_id
+                  AND s.identity_id IS DISTINCT FROM si.identity_id
+            """), {"last_id": last_id, "max_id": max_id})
+            last_id = max_id
+
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_students_identity "
+            "ON Students(identity_id, event_id)"
+        )
+
+
+def downgrade() -> None:
+    """Drop Student_Identity and the Students.identity_id link."""
+    op.execute("""
+        DROP INDEX IF EXISTS idx_students_identity;
+        ALTER TABLE Students DROP COLUMN IF EXISTS identity_id;
+        DROP TABLE IF EXISTS Student_Identity;
+        DROP FUNCTION IF EXISTS student_identity_key(INTEGER, INTEGER, TEXT, TEXT, TEXT, TEXT);
+        DROP FUNCTION IF EXISTS normalize_registration_number(TEXT);
+    """)
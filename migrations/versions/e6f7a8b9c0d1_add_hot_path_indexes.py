@@ -0,0 +1,174 @@
+"""add_hot_path_indexes
+
+Revision ID: e6f7a8b9c0d1
+Revises: d5e6f7a8b9c0
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6f7a8b9c0d1'
+down_revision: Union[str, Sequence[str], None] = 'd5e6f7a8b9c0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ("idx_students_event_name", "Students(event_id, name, student_id)"),
+    ("idx_health_records_event_student", "Health_Records(event_id, student_id)"),
+    ("idx_event_volunteers_username", "Event_Volunteers(username)"),
+    ("idx_schools_poc_username", "Schools(poc_username)"),
+    ("idx_events_school_id", "Events(school_id)"),
+    ("idx_camp_requests_status", "Camp_Requests(status, created_at)"),
+    ("idx_audit_logs_timestamp", "Audit_Logs(timestamp DESC)"),
+]
+
+
+# Unique key of an exam upsert. Rows with a NULL key column never conflict
+# in a unique index, so only fully keyed rows are deduplicated.
+DEDUP_SQL = """
+    WITH ranked AS (
+        SELECT record_id,
+               row_number() OVER (
+                   PARTITION BY student_id, event_id, category
+                   ORDER BY COALESCE(timestamp, '') DESC, record_id DESC
+               ) AS rn
+        FROM Health_Records
+        WHERE student_id IS NOT NULL AND event_id IS NOT NULL AND category IS NOT NULL
+    ), removed AS (
+        DELETE FROM Health_Records hr
+        USING ranked r
+        WHERE hr.record_id = r.record_id AND r.rn > 1
+        RETURNING hr.*
+    )
+    INSERT INTO Health_Records_Dedup_Archive
+    SELECT removed.*, now() FROM removed
+"""
+
+BUILD_ATTEMPTS = 3
+
+
+def _dedup(bind):
+    # Duplicates are moved to the archive table, never just deleted.
+    archived = bind.execute(sa.text(DEDUP_SQL)).rowcount
+    if archived:
+        logger.warning(
+            f"Archived {archived} duplicate Health_Records rows "
+            "(kept the newest per student, event and category) in Health_Records_Dedup_Archive"
+        )
+
+
+def _drop_invalid_exam_index(bind):
+    # A failed CONCURRENTLY build leaves an INVALID index that IF NOT EXISTS would skip.
+    invalid = bind.execute(sa.text("""
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = 'uq_health_records_exam' AND NOT i.indisvalid
+    """)).first()
+    if invalid:
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS uq_health_records_exam")
+
+
+def upgrade() -> None:
+    """Add indexes for dashboard predicates and a unique key for exam upserts.
+
+    Indexes are built CONCURRENTLY (outside a transaction) so a live camp
+    keeps writing while they build. The exam key must be unique first: older
+    duplicates are archived, and if a camp writes a new duplicate while the
+    unique index builds, the build is retried after another pass.
+    """
+    bind = op.get_bind()
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS Health_Records_Dedup_Archive AS
+        SELECT *, now() AS archived_at FROM Health_Records WITH NO DATA;
+    """)
+
+    with op.get_context().autocommit_block():
+        for name, target in INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {target}")
+
+        for attempt in range(1, BUILD_ATTEMPTS + 1):
+            _dedup(bind)
+            _drop_invalid_exam_index(bind)
+            try:
+                op.execute(
+                    "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_health_records_exam "
+                    "ON Health_Records(student_id, event_id, category)"
+                )
+                break
+            except sa.exc.IntegrityError:
+                if attempt == BUILD_ATTEMPTS:
+                    _drop_invalid_exam_index(bind)
+                    raise
+                logger.warning("Duplicate exam written during the unique index build; retrying")
+
+    op.execute("""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint WHERE conname = 'uq_health_records_exam'
+            ) THEN
+                ALTER TABLE Health_Records
+                    ADD CONSTRAINT uq_health_records_exam UNIQUE USING INDEX uq_health_records_exam;
+            END IF;
+        END $$;
+    """)
+    # The dedup keeps non-NULL timestamps first, the summary's latest record
+    # sorts NULLs first (plain DESC), so the archived rows may have been some
+    # summaries' latest. Recompute them with the ordering of
+    # app.services.exam_summary.EXAM_SUMMARY_REFRESH_SQL.
+    op.execute("""
+        UPDATE Student_Exam_Summary ses
+        SET examined_categories = c.examined_categories,
+            record_count = c.record_count,
+            latest_record_id = c.latest_record_id,
+            latest_status = c.latest_status,
+            latest_timestamp = c.latest_timestamp
+        FROM (
+            SELECT agg.student_id, agg.event_id, agg.examined_categories, agg.record_count,
+                   latest.record_id AS latest_record_id,
+                   latest.assessment_status AS latest_status,
+                   latest.timestamp AS latest_timestamp
+            FROM (
+                SELECT student_id, event_id,
+                       STRING_AGG(DISTINCT category, ',') AS examined_categories,
+                       COUNT(*) AS record_count
+                FROM Health_Records
+                WHERE student_id IN (SELECT student_id FROM Health_Records_Dedup_Archive)
+                GROUP BY student_id, event_id
+            ) agg
+            JOIN LATERAL (
+                SELECT record_id, assessment_status, timestamp
+                FROM Health_Records
+                WHERE student_id = agg.student_id AND event_id = agg.event_id
+                ORDER BY timestamp DESC, record_id DESC
+                LIMIT 1
+            ) latest ON TRUE
+        ) c
+        WHERE ses.student_id = c.student_id
+          AND ses.event_id = c.event_id
+          AND (ses.record_count, ses.latest_record_id, ses.examined_categories)
+              IS DISTINCT FROM (c.record_count, c.latest_record_id, c.examined_categories);
+    """)
+
+
+def downgrade() -> None:
+    """Drop the hot-path indexes and the exam upsert constraint.
+
+    Health_Records_Dedup_Archive is kept: it holds the only copy of the
+    archived duplicates.
+    """
+    op.execute("""
+        ALTER TABLE Health_Records DROP CONSTRAINT IF EXISTS uq_health_records_exam;
+    """)
+    with op.get_context().autocommit_block():
+        for name, _ in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
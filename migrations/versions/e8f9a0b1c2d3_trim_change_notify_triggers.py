@@ -0,0 +1,92 @@
+"""trim_change_notify_triggers
+
+Revision ID: e8f9a0b1c2d3
+Revises: d7e8f9a0b1c2
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8f9a0b1c2d3'
+down_revision: Union[str, Sequence[str], None] = 'd7e8f9a0b1c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# notify_change() from a4b5c6d7e8f9; {origin} adds fields to the payload.
+NOTIFY_FUNCTION = """
+    CREATE OR REPLACE FUNCTION notify_change() RETURNS trigger AS $$
+    DECLARE
+        id_col TEXT := TG_ARGV[0];
+        src TEXT;
+        r RECORD;
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            src := format('SELECT event_id, %I::text AS id FROM new_rows', id_col);
+        ELSIF TG_OP = 'DELETE' THEN
+            src := format('SELECT event_id, %I::text AS id FROM old_rows', id_col);
+        ELSE
+            -- Both sides, so a row moved to another event notifies both events
+            src := format('SELECT event_id, %I::text AS id FROM new_rows '
+                          'UNION SELECT event_id, %I::text AS id FROM old_rows', id_col, id_col);
+        END IF;
+        FOR r IN EXECUTE
+            'SELECT event_id, COUNT(*) AS n, (array_agg(id ORDER BY id))[1:100] AS ids '
+            'FROM (' || src || ') c GROUP BY event_id'
+        LOOP
+            PERFORM pg_notify('aiims_changes', json_build_object(
+                'table', lower(TG_TABLE_NAME), 'op', TG_OP,
+                'event_id', r.event_id, 'count', r.n, 'ids', r.ids{origin})::text);
+        END LOOP;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+# (table, id column, trigger op) with no listener-side consumer: every NOTIFY
+# costs a plpgsql call and the commit-time notify queue lock.
+UNUSED_TRIGGERS = [
+    ("Students", "student_id", "update"),
+    ("Students", "student_id", "delete"),
+    ("Health_Records", "student_id", "delete"),
+    ("Student_General_Info", "student_id", "insert"),
+    ("Student_General_Info", "student_id", "update"),
+    ("Student_General_Info", "student_id", "delete"),
+]
+
+_REFERENCING = {
+    "insert": "REFERENCING NEW TABLE AS new_rows",
+    "update": "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+    "delete": "REFERENCING OLD TABLE AS old_rows",
+}
+
+
+def upgrade() -> None:
+    """Tag change payloads with the writer and drop the triggers nothing consumes.
+
+    ``origin`` is the writing connection's application_name, which the pool
+    sets per worker process, so a worker can skip relaying its own writes.
+    """
+    op.execute(NOTIFY_FUNCTION.format(
+        origin=", 'origin', current_setting('application_name', true)"
+    ))
+    for table, _, trigger_op in UNUSED_TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {table.lower()}_notify_{trigger_op} ON {table}")
+
+
+def downgrade() -> None:
+    """Restore the untagged payload and the dropped triggers."""
+    op.execute(NOTIFY_FUNCTION.format(origin=""))
+    for table, id_col, trigger_op in UNUSED_TRIGGERS:
+        name = f"{table.lower()}_notify_{trigger_op}"
+        op.execute(f"""
+            DROP TRIGGER IF EXISTS {name} ON {table};
+            CREATE TRIGGER {name} AFTER {trigger_op.upper()} ON {table}
+                {_REFERENCING[trigger_op]}
+                FOR EACH STATEMENT EXECUTE FUNCTION notify_change('{id_col}');
+        """)
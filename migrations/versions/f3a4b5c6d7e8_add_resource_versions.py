@@ -0,0 +1,35 @@
+"""add_resource_versions
+
+Revision ID: f3a4b5c6d7e8
+Revises: e2f3a4b5c6d7
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a4b5c6d7e8'
+down_revision: Union[str, Sequence[str], None] = 'e2f3a4b5c6d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create Resource_Versions (one change counter per cacheable resource)."""
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS Resource_Versions (
+            resource TEXT PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 1
+        );
+    """)
+
+
+def downgrade() -> None:
+    """Drop Resource_Versions."""
+    op.execute("""
+        DROP TABLE IF EXISTS Resource_Versions;
+    """)
@@ -0,0 +1,110 @@
+"""add_event_stat_counters
+
+Revision ID: f7a8b9c0d1e2
+Revises: e6f7a8b9c0d1
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7a8b9c0d1e2'
+down_revision: Union[str, Sequence[str], None] = 'e6f7a8b9c0d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create Event_Stat_Counters (one row per event/class/section/gender) and backfill it."""
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS Event_Stat_Counters (
+            event_id INTEGER NOT NULL,
+            student_class TEXT NOT NULL DEFAULT '',
+            section TEXT NOT NULL DEFAULT '',
+            gender TEXT NOT NULL DEFAULT '',
+            total_students INTEGER NOT NULL DEFAULT 0,
+            absent INTEGER NOT NULL DEFAULT 0,
+            screened INTEGER NOT NULL DEFAULT 0,
+            normal INTEGER NOT NULL DEFAULT 0,
+            observation INTEGER NOT NULL DEFAULT 0,
+            referred INTEGER NOT NULL DEFAULT 0,
+            dept_counts JSONB NOT NULL DEFAULT '{}'::jsonb,
+            PRIMARY KEY (event_id, student_class, section, gender),
+            FOREIGN KEY(event_id) REFERENCES Events(event_id)
+        );
+    """)
+
+    op.execute("""
+        INSERT INTO Event_Stat_Counters
+            (event_id, student_class, section, gender, total_students, absent,
+             screened, normal, observation, referred, dept_counts)
+        SELECT c.event_id, c.student_class, c.section, c.gender,
+               st.total_students, st.absent, scr.screened,
+               dept.normal, dept.observation, dept.referred, dept.dept_counts
+        FROM (
+            SELECT DISTINCT event_id,
+                   COALESCE(student_class, '') AS student_class,
+                   COALESCE(section, '') AS section,
+                   COALESCE(gender, '') AS gender
+            FROM Students
+            WHERE event_id IS NOT NULL
+        ) c
+        CROSS JOIN LATERAL (
+            SELECT COUNT(*) AS total_students,
+                   COUNT(*) FILTER (WHERE s.status = 'Absent') AS absent
+            FROM Students s
+            WHERE s.event_id = c.event_id
+              AND COALESCE(s.student_class, '') = c.student_class
+              AND COALESCE(s.section, '') = c.section
+              AND COALESCE(s.gender, '') = c.gender
+        ) st
+        CROSS JOIN LATERAL (
+            SELECT COUNT(DISTINCT hr.student_id) AS screened
+            FROM Health_Records hr
+            JOIN Students s ON s.student_id = hr.student_id
+            WHERE hr.event_id = c.event_id
+              AND s.event_id = c.event_id
+              AND COALESCE(s.student_class, '') = c.student_class
+              AND COALESCE(s.section, '') = c.section
+              AND COALESCE(s.gender, '') = c.gender
+        ) scr
+        CROSS JOIN LATERAL (
+            SELECT COALESCE(SUM(d.n), 0) AS normal,
+                   COALESCE(SUM(d.o), 0) AS observation,
+                   COALESCE(SUM(d.r), 0) AS referred,
+                   COALESCE(jsonb_object_agg(d.category, jsonb_build_object('N', d.n, 'O', d.o, 'R', d.r)),
+                            '{}'::jsonb) AS dept_counts
+            FROM (
+                SELECT COALESCE(NULLIF(hr.category, ''), 'Other') AS category,
+                       COUNT(*) FILTER (WHERE a.status = 'N') AS n,
+                       COUNT(*) FILTER (WHERE a.status = 'O') AS o,
+                       COUNT(*) FILTER (WHERE a.status = 'R') AS r
+                FROM Health_Records hr
+                JOIN Students s ON s.student_id = hr.student_id
+                CROSS JOIN LATERAL (
+                    SELECT CASE WHEN hr.json_data IS JSON OBJECT THEN
+                                COALESCE(NULLIF(hr.json_data::json ->> 'status', ''),
+                                         hr.json_data::json ->> 'assessment', '')
+                           ELSE '' END AS status
+                ) a
+                WHERE hr.event_id = c.event_id
+                  AND s.event_id = c.event_id
+                  AND COALESCE(s.student_class, '') = c.student_class
+                  AND COALESCE(s.section, '') = c.section
+                  AND COALESCE(s.gender, '') = c.gender
+                GROUP BY 1
+            ) d
+        ) dept
+        ON CONFLICT (event_id, student_class, section, gender) DO NOTHING;
+    """)
+
+
+def downgrade() -> None:
+    """Drop Event_Stat_Counters."""
+    op.execute("""
+        DROP TABLE IF EXISTS Event_Stat_Counters;
+    """)
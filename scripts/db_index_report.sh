@@ -0,0 +1,40 @@
+#!/bin/bash
+if [ -z "$DATABASE_URL" ]; then
+  echo "Error: DATABASE_URL environment variable is not set."
+  exit 1
+fi
+
+echo "== Index usage (pg_stat_user_indexes) =="
+psql "$DATABASE_URL" -P pager=off -c "
+SELECT s.relname AS table_name,
+       s.indexrelname AS index_name,
+       s.idx_scan AS scans,
+       s.idx_tup_read AS tuples_read,
+       s.idx_tup_fetch AS tuples_fetched,
+       pg_size_pretty(pg_relation_size(s.indexrelid)) AS index_size,
+       pg_size_pretty(pg_relation_size(s.relid)) AS table_size,
+       CASE WHEN s.idx_scan = 0 AND NOT i.indisunique AND NOT i.indisprimary
+            THEN 'UNUSED' ELSE '' END AS note,
+       CASE WHEN NOT i.indisvalid THEN 'INVALID (rebuild)' ELSE '' END AS validity
+FROM pg_stat_user_indexes s
+JOIN pg_index i ON i.indexrelid = s.indexrelid
+ORDER BY s.idx_scan ASC, pg_relation_size(s.indexrelid) DESC;
+"
+
+echo "== Btree bloat (pgstattuple) =="
+HAS_PGSTATTUPLE=$(psql "$DATABASE_URL" -tAc "SELECT 1 FROM pg_extension WHERE extname = 'pgstattuple'")
+if [ "$HAS_PGSTATTUPLE" != "1" ]; then
+  echo "pgstattuple is not installed; run 'CREATE EXTENSION pgstattuple;' to see leaf density."
+  exit 0
+fi
+psql "$DATABASE_URL" -P pager=off -c "
+SELECT c.relname AS index_name,
+       pg_size_pretty(pg_relation_size(c.oid)) AS index_size,
+       round(st.avg_leaf_density::numeric, 1) AS avg_leaf_density_pct,
+       round(st.leaf_fragmentation::numeric, 1) AS leaf_fragmentation_pct
+FROM pg_stat_user_indexes s
+JOIN pg_class c ON c.oid = s.indexrelid
+JOIN pg_am am ON am.oid = c.relam AND am.amname = 'btree'
+CROSS JOIN LATERAL pgstatindex(c.oid::regclass) st
+ORDER BY st.avg_leaf_density ASC;
+"
@@ -32,6 +32,42 @@ def init_db():
         # if the schema is not ready.
 
 
+def rebuild_counters(event_id=None):
+    """Recompute Student_Stat_Contributions, Event_Stat_Counters and Event_Counters from the source tables.
+
+    Repair command for drifted counters:
+        python -c "import server; server.rebuild_counters()"
+    """
+    from app.db import get_db_conn
+    from app.services.event_stats import rebuild_event_counters
+
+    scope = f"event {event_id}" if event_id is not None else "all events"
+    logger.info(f"Rebuilding event counters for {scope}...")
+    with get_db_conn() as conn:
+        cur = conn.cursor()
+        rebuild_event_counters(cur, event_id)
+        conn.commit()
+    logger.info("Event counters rebuilt.")
+
+
+def prune_sync_keys(days=30):
+    """Delete /api/sync idempotency keys older than ``days`` days.
+
+    Replays older than that would be applied again; run periodically:
+        python -c "import server; server.prune_sync_keys()"
+    """
+    from datetime import datetime, timedelta
+    from app.db import get_db_conn
+
+    cutoff = (datetime.utcnow() - timedelta(days=days)).isoformat()
+    with get_db_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM Sync_Idempotency WHERE created_at < %s", (cutoff,))
+        deleted = cur.rowcount
+        conn.commit()
+    logger.info(f"Pruned {deleted} sync idempotency keys older than {days} days.")
+
+
 if __name__ == "__main__":
     PORT = int(os.environ.get("PORT", 3000))
     
@@ -8,6 +8,7 @@ import {
 } from 'lucide-react';
 import AnalyticsPanel, { DepartmentBreakdownChart } from './components/AnalyticsCharts';
 import { AddStudentModal, CSVUploadPanel } from './components/StudentModals';
+import { fetchEventRecords } from './lib/fetchEventRecords';
 
 type User = { username: string; role: string; name: string };
 
@@ -525,7 +526,10 @@ function EventExpandedPanel({ eventId, event, user, onRefresh }: {
       if (recSectionFilter) params.set('section', recSectionFilter);
       if (recGenderFilter) params.set('gender', recGenderFilter);
       const qs = params.toString();
-      fetch(`/api/events/${eventId}/stats${qs ? '?' + qs : ''}`).then(r => r.json()).then(setStats);
+      Promise.all([
+        fetch(`/api/events/${eventId}/stats${qs ? '?' + qs : ''}`).then(r => r.json()),
+        fetchEventRecords(eventId, params),
+      ]).then(([s, records]) => setStats({ ...s, records }));
     }
   }, [activeSection, eventId, recClassFilter, recSectionFilter, recGenderFilter]);
 
@@ -6,10 +6,7 @@ import {
   Users, CheckCircle, Loader2, ClipboardList, Printer, Trash2, PlusCircle, FileText, RefreshCw, History
 } from 'lucide-react';
 import GeneralInfoForm, { GeneralInfoSummary } from './GeneralInfoForm';
-
-// Socket.IO client (optional)
-let io: any = null;
-try { io = require('socket.io-client'); } catch { }
+import { subscribeRealtime, rosterNeedsRefetch, applyRosterDelta, RosterFilters } from './lib/realtime';
 
 // ── Types ──
 type User = { username: string; role: string; name: string; specialization?: string };
@@ -1356,21 +1353,19 @@ function OtherRecordsPanel({ studentId, eventId, currentCategory }: {
   }, [studentId, eventId]);
 
   // Also listen for real-time updates
-  useEffect(() => {
-    if (!io) return;
-    try {
-      const socket = io.connect(window.location.origin, { transports: ['websocket', 'polling'] });
-      socket.on('exam_saved', (data: any) => {
-        if (data.student_id === studentId || !data.student_id) {
-          fetch(`/api/students/${studentId}/all-records?event_id=${eventId}`)
-            .then(r => r.json())
-            .then(d => setRecords(d.records || []))
-            .catch(() => { });
-        }
-      });
-      return () => { socket.disconnect(); };
-    } catch { }
-  }, [studentId, eventId]);
+  useEffect(() => subscribeRealtime({ student_id: studentId }, {
+    exam_saved: (data: any) => {
+      if (data.record && data.student_id === studentId && Number(data.event_id) === Number(eventId)) {
+        // The message carries the saved record; replace that category in place.
+        setRecords(prev => [data.record, ...prev.filter(r => r.category !== data.record.category)]);
+      } else if (data.student_id === studentId || !data.student_id) {
+        fetch(`/api/students/${studentId}/all-records?event_id=${eventId}`)
+          .then(r => r.json())
+          .then(d => setRecords(d.records || []))
+          .catch(() => { });
+      }
+    },
+  }), [studentId, eventId]);
 
   const otherRecords = records.filter(r => r.category !== currentCategory);
   const evaluatedCount = otherRecords.length;
@@ -1457,13 +1452,12 @@ function PreviousEvaluationsModal({ student, schoolId, onClose }: {
   const [events, setEvents] = useState<any[]>([]);
 
   useEffect(() => {
-    if (!student.registration_number || !schoolId) {
+    if (!student.student_id) {
       setLoading(false);
       return;
     }
     const params = new URLSearchParams({
-      school_id: String(schoolId),
-      registration_number: student.registration_number,
+      student_id: String(student.student_id),
       current_event_id: String(student.event_id || ''),
     });
     fetch(`/api/students/previous-records?${params}`)
@@ -1674,20 +1668,26 @@ function ClinicalWorkflow({ user, campId, campName, campSchoolId, onBack }: {
   // Re-fetch when filters change
   useEffect(() => { doSearch(); }, [filterClass, filterSection, filterGender, filterExamined]);
 
-  // Real-time Socket.IO listener for live updates
+  // Real-time Socket.IO listener: patch the roster in place, refetch only
+  // when the message cannot be applied locally (e.g. a bulk upload)
+  const rosterRef = useRef({ doSearch, filters: {} as RosterFilters });
+  rosterRef.current = {
+    doSearch,
+    filters: { query: searchQuery, student_class: filterClass, section: filterSection, gender: filterGender, examined: filterExamined },
+  };
   useEffect(() => {
-    if (!io) return;
-    try {
-      const socket = io.connect(window.location.origin, { transports: ['websocket', 'polling'] });
-      const refresh = (data: any) => {
-        if (!data.event_id || data.event_id === campId) doSearch();
-      };
-      socket.on('student_created', refresh);
-      socket.on('students_bulk_created', refresh);
-      socket.on('exam_saved', refresh);
-      return () => { socket.disconnect(); };
-    } catch { }
-  }, [campId, doSearch]);
+    const handle = (name: string) => (data: any) => {
+      if (data.event_id && Number(data.event_id) !== Number(campId)) return;
+      const { doSearch, filters } = rosterRef.current;
+      if (rosterNeedsRefetch(name, data, filters)) doSearch();
+      else setSearchResults(prev => applyRosterDelta(prev, name, data, filters));
+    };
+    return subscribeRealtime({ event_id: campId }, {
+      student_created: handle('student_created'),
+      students_bulk_created: handle('students_bulk_created'),
+      exam_saved: handle('exam_saved'),
+    });
+  }, [campId]);
 
   // Load existing exam data when student selected
   const selectStudent = async (s: Student) => {
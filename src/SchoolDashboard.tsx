@@ -9,10 +9,9 @@ import {
 import GeneralInfoForm from './GeneralInfoForm';
 import AnalyticsPanel from './components/AnalyticsCharts';
 import { AddStudentModal, CSVUploadPanel } from './components/StudentModals';
-
-// Socket.IO client (optional)
-let io: any = null;
-try { io = require('socket.io-client'); } catch {}
+import { fetchEventRecords } from './lib/fetchEventRecords';
+import { fetchRosterRecords } from './lib/fetchRosterRecords';
+import { subscribeRealtime, rosterNeedsRefetch, applyRosterDelta, RosterFilters } from './lib/realtime';
 
 // â”€â”€ Types â”€â”€
 type User = { username: string; role: string; name: string };
@@ -532,19 +531,25 @@ function RosterManagement({ user, eventId, event }: { user: User; eventId: numbe
 
   useEffect(() => { fetchStudents(); }, [eventId, searchQuery, statusFilter, classFilter, sectionFilter, genderFilter]);
 
-  // Real-time Socket.IO listener for live roster updates
+  // Real-time Socket.IO listener: patch the roster in place, refetch only
+  // when the message cannot be applied locally (e.g. a bulk upload)
+  const rosterRef = useRef({ fetchStudents, filters: {} as RosterFilters });
+  rosterRef.current = {
+    fetchStudents,
+    filters: { query: searchQuery, student_class: classFilter, section: sectionFilter, gender: genderFilter, assessment: statusFilter },
+  };
   useEffect(() => {
-    if (!io) return;
-    try {
-      const socket = io.connect(window.location.origin, { transports: ['websocket', 'polling'] });
-      const refresh = (data: any) => {
-        if (!data.event_id || data.event_id === eventId) fetchStudents();
-      };
-      socket.on('student_created', refresh);
-      socket.on('students_bulk_created', refresh);
-      socket.on('exam_saved', refresh);
-      return () => { socket.disconnect(); };
-    } catch {}
+    const handle = (name: string) => (data: any) => {
+      if (data.event_id && Number(data.event_id) !== Number(eventId)) return;
+      const { fetchStudents, filters } = rosterRef.current;
+      if (rosterNeedsRefetch(name, data, filters)) fetchStudents();
+      else setStudents(prev => applyRosterDelta(prev, name, data, filters));
+    };
+    return subscribeRealtime({ event_id: eventId }, {
+      student_created: handle('student_created'),
+      students_bulk_created: handle('students_bulk_created'),
+      exam_saved: handle('exam_saved'),
+    });
   }, [eventId]);
 
   const toggleAbsent = async (studentId: number, currentStatus: string) => {
@@ -630,15 +635,14 @@ function RosterManagement({ user, eventId, event }: { user: User; eventId: numbe
     setBulkPrinting(true);
     try {
       const allDocs: { student: Student; record: any }[] = [];
-      for (const s of examinedStudentsList) {
-        const res = await fetch(`/api/students/${s.student_id}/all-records?event_id=${eventId}`);
-        const data = await res.json();
+      const roster = await fetchRosterRecords(eventId, examinedStudentsList.map(s => s.student_id));
+      for (const data of roster) {
         const docs = (data.records || []).filter((doc: any) => {
           const parsed = doc.parsed_data || {};
           return hasPrintableContent(parsed);
         });
         for (const doc of docs) {
-          allDocs.push({ student: data.student || s, record: doc });
+          allDocs.push({ student: data.student, record: doc });
         }
       }
       if (allDocs.length === 0) { setBulkPrinting(false); alert('No prescriptions or referrals with content to print.'); return; }
@@ -961,9 +965,11 @@ function ProgressTracking({ eventId }: { eventId: number }) {
     if (sectionFilter) params.set('section', sectionFilter);
     if (genderFilter) params.set('gender', genderFilter);
     const qs = params.toString();
-    fetch(`/api/events/${eventId}/stats${qs ? '?' + qs : ''}`)
-      .then(r => r.json())
-      .then(setStats)
+    Promise.all([
+      fetch(`/api/events/${eventId}/stats${qs ? '?' + qs : ''}`).then(r => r.json()),
+      fetchEventRecords(eventId, params),
+    ])
+      .then(([s, records]) => setStats({ ...s, records }))
       .catch(e => {
         console.error("Error fetching stats:", e);
         setStats({ total_students: 0, screened: 0, normal: 0, observation: 0, referred: 0, absent: 0, records: [], staff: [] });
@@ -1380,10 +1386,9 @@ function SchoolPreviousRecordsModal({ student, schoolId, eventId, onClose }: {
   const [events, setEvents] = useState<any[]>([]);
 
   useEffect(() => {
-    if (!student.registration_number || !schoolId) { setLoading(false); return; }
+    if (!student.student_id) { setLoading(false); return; }
     const params = new URLSearchParams({
-      school_id: String(schoolId),
-      registration_number: student.registration_number,
+      student_id: String(student.student_id),
       current_event_id: String(eventId),
     });
     fetch(`/api/students/previous-records?${params}`)
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { History, X, Loader2, AlertTriangle, ClipboardList, Calendar, Eye, Ear, Scan, Activity, Stethoscope } from 'lucide-react';
+import { subscribeRealtime } from '../lib/realtime';
 
 export interface SharedStudent {
   registration_number?: string;
@@ -320,21 +321,19 @@ export function OtherRecordsPanel({ studentId, eventId, currentCategory }: {
   }, [studentId, eventId]);
 
   // Also listen for real-time updates
-  useEffect(() => {
-    if (!io) return;
-    try {
-      const socket = io.connect(window.location.origin, { transports: ['websocket', 'polling'] });
-      socket.on('exam_saved', (data: any) => {
-        if (data.student_id === studentId || !data.student_id) {
-          fetch(`/api/students/${studentId}/all-records?event_id=${eventId}`)
-            .then(r => r.json())
-            .then(d => setRecords(d.records || []))
-            .catch(() => { });
-        }
-      });
-      return () => { socket.disconnect(); };
-    } catch { }
-  }, [studentId, eventId]);
+  useEffect(() => subscribeRealtime({ student_id: studentId }, {
+    exam_saved: (data: any) => {
+      if (data.record && data.student_id === studentId && Number(data.event_id) === Number(eventId)) {
+        // The message carries the saved record; replace that category in place.
+        setRecords(prev => [data.record, ...prev.filter(r => r.category !== data.record.category)]);
+      } else if (data.student_id === studentId || !data.student_id) {
+        fetch(`/api/students/${studentId}/all-records?event_id=${eventId}`)
+          .then(r => r.json())
+          .then(d => setRecords(d.records || []))
+          .catch(() => { });
+      }
+    },
+  }), [studentId, eventId]);
 
   const otherRecords = records.filter(r => r.category !== currentCategory);
   const evaluatedCount = otherRecords.length;
@@ -421,15 +420,11 @@ export function StudentHistoryModal({ student, schoolId, onClose }: {
   const [events, setEvents] = useState<any[]>([]);
 
   useEffect(() => {
-    if (!student.registration_number || !schoolId) {
+    if (!student.student_id) {
       setLoading(false);
       return;
     }
-    const params = new URLSearchParams({
-      school_id: String(schoolId),
-      registration_number: student.registration_number,
-      
-    });
+    const params = new URLSearchParams({ student_id: String(student.student_id) });
     fetch(`/api/students/previous-records?${params}`)
       .then(r => r.json())
       .then(data => {
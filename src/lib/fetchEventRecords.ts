@@ -0,0 +1,15 @@
+// Loads every health record of an event from the paginated /records endpoint.
+export async function fetchEventRecords(eventId: number, filters: URLSearchParams): Promise<any[]> {
+  const records: any[] = [];
+  let cursor: string | null = null;
+  do {
+    const params = new URLSearchParams(filters);
+    params.set('limit', '1000');
+    if (cursor) params.set('cursor', cursor);
+    const res = await fetch(`/api/events/${eventId}/records?${params}`);
+    const page = await res.json();
+    records.push(...(page.records || []));
+    cursor = page.next_cursor;
+  } while (cursor);
+  return records;
+}
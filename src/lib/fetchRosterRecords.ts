@@ -0,0 +1,11 @@
+// Loads {student, general_info, records} for many students of an event in one
+// request from the NDJSON /roster-records endpoint.
+export async function fetchRosterRecords(eventId: number, studentIds: number[]): Promise<any[]> {
+  const res = await fetch(`/api/events/${eventId}/roster-records`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ student_ids: studentIds }),
+  });
+  const text = await res.text();
+  return text.split('\n').filter(line => line.trim()).map(line => JSON.parse(line));
+}
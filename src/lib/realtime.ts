@@ -0,0 +1,69 @@
+// Socket.IO client (optional)
+let io: any = null;
+try { io = require('socket.io-client'); } catch { }
+
+type Rooms = { event_id?: number; student_id?: number };
+type Handlers = Record<string, (data: any) => void>;
+
+// Connects, joins the server-side rooms for one camp (and optionally one
+// student) and registers the handlers. Rooms are re-joined after a
+// reconnect. Returns a cleanup function for useEffect.
+export function subscribeRealtime(rooms: Rooms, handlers: Handlers): () => void {
+  if (!io) return () => { };
+  try {
+    const socket = io.connect(window.location.origin, { transports: ['websocket', 'polling'] });
+    socket.on('connect', () => socket.emit('subscribe', rooms));
+    Object.entries(handlers).forEach(([name, handler]) => socket.on(name, handler));
+    return () => { socket.disconnect(); };
+  } catch {
+    return () => { };
+  }
+}
+
+// ── Roster deltas ──
+// The camp rosters list /api/students/search rows, ordered by (name,
+// student_id). student_created and exam_saved carry enough to patch such a
+// list in place; only filters the client cannot evaluate need a refetch.
+
+export type RosterFilters = {
+  query?: string; student_class?: string; section?: string; gender?: string;
+  examined?: string; assessment?: string;
+};
+
+type RosterRow = { student_id: number; name: string };
+
+export function rosterNeedsRefetch(name: string, data: any, f: RosterFilters): boolean {
+  if (name === 'student_created') return !data.student || !!f.query;
+  if (name === 'exam_saved') return !data.record || !!f.examined || !!f.assessment;
+  return true;
+}
+
+const byNameThenId = (a: RosterRow, b: RosterRow) =>
+  (a.name || '').localeCompare(b.name || '') || a.student_id - b.student_id;
+
+// Call only when rosterNeedsRefetch() is false for the message.
+export function applyRosterDelta<T extends RosterRow>(list: T[], name: string, data: any, f: RosterFilters): T[] {
+  if (name === 'student_created') {
+    const s = data.student;
+    if ((f.student_class && s.student_class !== f.student_class)
+      || (f.section && s.section !== f.section)
+      || (f.gender && s.gender !== f.gender)
+      || list.some(row => row.student_id === s.student_id)) return list;
+    const row = { ...s, is_examined: 0, examined_categories: null, assessment: '' } as T;
+    return [...list, row].sort(byNameThenId);
+  }
+  // exam_saved: the saved record is the student's newest one
+  const id = Number(data.student_id);
+  const parsed = data.record.parsed_data || {};
+  return list.map(row => {
+    if (row.student_id !== id) return row;
+    const categories = new Set(String((row as any).examined_categories || '').split(',').filter(Boolean));
+    categories.add(data.category);
+    return {
+      ...row,
+      is_examined: 1,
+      examined_categories: Array.from(categories).sort().join(','),
+      assessment: parsed.status || parsed.assessment || '',
+    };
+  });
+}